@@ -0,0 +1,183 @@
+"""Headless batch analysis of many chat exports.
+
+Every input (a CSV export, a WhatsApp .txt export or a Facebook thread
+directory of message_N.json files) is auto-detected as WhatsApp or Facebook,
+stream-scored in a worker process, and written to its own ``<name>_scored.csv``
+shard (or a ``<name>_scored.results`` columnar store with ``--format results``). When all
+files are done a combined ``summary.csv`` (one row per file) and
+``top_suspicious.csv`` (the most suspicious rows across all files) are written
+to the output directory. Results stores given as inputs are summarized from
+their stored scores without scoring them again.
+
+    python batch_cli.py case_dir/ other_export.csv -o results/ -j 32
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from chat_core import make_score_cache
+from chat_stream import DEFAULT_CHUNK_SIZE, DEFAULT_TOP_N, stream_analyze, summarize_store
+from instrumentation import PipelineMetrics
+from results_store import RESULTS_SUFFIX, is_store_path
+from scorers import make_scorers_cache, parse_scorers
+
+SUMMARY_COLUMNS = ['file', 'platform', 'status', 'total_messages', 'suspicious_messages',
+                   'transaction_messages', 'location_messages', 'personal_info_messages',
+                   'senders', 'cache_hit_rate', 'seconds', 'shard', 'error']
+COUNT_COLUMNS = SUMMARY_COLUMNS[3:9]
+SHARD_SUFFIXES = {'csv': '.csv', 'results': RESULTS_SUFFIX}
+# File exports picked up inside directories, besides Facebook thread directories
+INPUT_PATTERNS = ['*.csv', '*.txt']
+
+
+def collect_inputs(paths, pattern=None):
+    """Expand directories into the exports below them, keeping order.
+
+    Without a pattern these are CSV and WhatsApp .txt files plus Facebook
+    thread directories holding message_N.json files, one input per thread.
+    """
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir() and not is_store_path(path):
+            if pattern is not None:
+                files.extend(sorted(p for p in path.rglob(pattern) if p.is_file()))
+                continue
+            found = {p for input_pattern in INPUT_PATTERNS for p in path.rglob(input_pattern) if p.is_file()}
+            found.update(p.parent for p in path.rglob('message_*.json') if p.is_file())
+            files.extend(sorted(found))
+        else:
+            files.append(path)
+    return files
+
+
+def shard_names(files, suffix='.csv'):
+    """Output shard name per input file, made unique when file names repeat"""
+    names, seen = [], {}
+    for path in files:
+        count = seen.get(path.stem, 0) + 1
+        seen[path.stem] = count
+        count_suffix = f"_{count}" if count > 1 else ""
+        names.append(f"{path.stem}{count_suffix}_scored{suffix}")
+    return names
+
+
+def analyze_file(file_path, shard_path, chunk_size=DEFAULT_CHUNK_SIZE, top_n=DEFAULT_TOP_N, cache_path=None,
+                 metrics_path=None, scorers=None):
+    """Worker entry point: score one export and return its summary and top rows.
+
+    Errors are reported in the summary rather than raised, so one bad file
+    does not stop the rest of the batch. With metrics_path the per-stage
+    timings of the file are written there; scorers names the registered
+    scorers to run (the heuristic alone by default).
+    """
+    started = time.perf_counter()
+    summary = {'file': str(file_path), 'shard': str(shard_path)}
+    if cache_path:
+        cache = make_scorers_cache(scorers, cache_path) if scorers else make_score_cache(cache_path)
+    else:
+        cache = None
+    metrics = PipelineMetrics() if metrics_path else None
+    try:
+        if is_store_path(file_path):
+            summary['shard'] = str(file_path)
+            analysis = summarize_store(file_path, top_n=top_n)
+        else:
+            analysis = stream_analyze(file_path, shard_path, chunk_size=chunk_size, top_n=top_n, cache=cache,
+                                      metrics=metrics, scorers=scorers)
+    except Exception as e:
+        summary.update(status='error', error=str(e), seconds=time.perf_counter() - started)
+        return summary, None
+    finally:
+        if cache is not None:
+            summary['cache_hit_rate'] = cache.stats()['hit_rate']
+            cache.close()
+        if metrics is not None:
+            metrics.write(metrics_path)
+
+    summary.update(analysis.summary())
+    summary.pop('score_histogram')
+    summary.update(status='ok', error='', seconds=time.perf_counter() - started)
+    top_rows = analysis.top_rows
+    if top_rows is not None:
+        top_rows.insert(0, 'source_file', str(file_path))
+    return summary, top_rows
+
+
+def run_batch(files, output_dir, jobs=None, chunk_size=DEFAULT_CHUNK_SIZE, top_n=DEFAULT_TOP_N,
+              cache_path=None, shard_format='csv', metrics=False, scorers=None):
+    """Score files in parallel and write the shards plus combined outputs.
+
+    cache_path names a SQLite score cache shared by all workers. shard_format
+    is 'csv' or 'results' for columnar results stores. With metrics each shard
+    gets a <shard>.metrics.json with its per-stage timings. Returns the
+    per-file summary DataFrame.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    summaries, tops = [], []
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        futures = [pool.submit(analyze_file, path, output_dir / name, chunk_size, top_n, cache_path,
+                               output_dir / f"{name}.metrics.json" if metrics else None, scorers)
+                   for path, name in zip(files, shard_names(files, SHARD_SUFFIXES[shard_format]))]
+        for future in as_completed(futures):
+            summary, top_rows = future.result()
+            summaries.append(summary)
+            if top_rows is not None and len(top_rows):
+                tops.append(top_rows)
+            print(f"[{len(summaries)}/{len(files)}] {summary['file']}: {summary['status']}"
+                  + (f" ({summary['error']})" if summary['error'] else ""), file=sys.stderr)
+
+    # Keep the summary in input order regardless of completion order
+    order = {str(path): i for i, path in enumerate(files)}
+    summary_df = pd.DataFrame(summaries).reindex(columns=SUMMARY_COLUMNS)
+    summary_df = summary_df.sort_values('file', key=lambda s: s.map(order)).reset_index(drop=True)
+    # Failed files have no counts, so use a nullable integer type
+    summary_df[COUNT_COLUMNS] = summary_df[COUNT_COLUMNS].astype('Int64')
+    summary_df.to_csv(output_dir / 'summary.csv', index=False)
+
+    if tops:
+        combined = pd.concat(tops, ignore_index=True).nlargest(top_n, 'suspicion_score')
+        combined.to_csv(output_dir / 'top_suspicious.csv', index=False)
+    return summary_df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score many chat exports without the GUI")
+    parser.add_argument('inputs', nargs='+', help="CSV exports or directories containing them")
+    parser.add_argument('-o', '--output-dir', default='scored', help="Directory for shards and summaries")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--pattern', help="File pattern used inside directories "
+                        "(default: CSV and .txt exports and Facebook thread directories)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk")
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP_N, help="Rows kept in top_suspicious.csv")
+    parser.add_argument('--scorers',
+                        help="Comma-separated scorers, each adding its own columns (e.g. heuristic,ga)")
+    parser.add_argument('--cache', help="SQLite file reusing scores across files and runs")
+    parser.add_argument('--format', choices=sorted(SHARD_SUFFIXES), default='csv',
+                        help="Shard format; 'results' writes memory-mappable columnar stores")
+    parser.add_argument('--metrics', action='store_true', help="Write per-stage timings next to every shard")
+    args = parser.parse_args(argv)
+    if args.scorers:
+        try:
+            args.scorers = parse_scorers(args.scorers)
+        except ValueError as e:
+            parser.error(str(e))
+
+    files = collect_inputs(args.inputs, args.pattern)
+    if not files:
+        parser.error("no input files found")
+
+    summary_df = run_batch(files, args.output_dir, jobs=args.jobs,
+                           chunk_size=args.chunk_size, top_n=args.top, cache_path=args.cache,
+                           shard_format=args.format, metrics=args.metrics, scorers=args.scorers)
+    return 0 if (summary_df['status'] == 'ok').all() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
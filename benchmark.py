@@ -0,0 +1,229 @@
+"""Stage-by-stage benchmark of the analysis pipeline on synthetic chats.
+
+Each size is generated with synthetic_chats, written to a temporary CSV and
+pushed through the same steps as the GUI: CSV load, compact_frame,
+standardize_columns, both scorers, the detect_* functions, the per-sender and
+streaming aggregates, writing and reopening a results store, and (when PyQt5
+is available) the table model and the Overview charts. Every stage reports its wall time, rows/sec and the process
+peak RSS; --trace-memory adds the peak Python allocation of the stage.
+
+Per-message functions (score_message, detect_*) are timed on the first
+--sample rows, since they are what the vectorized paths are compared to.
+
+    python benchmark.py --rows 10000 1000000 -o bench.json
+    python benchmark.py --rows 1000000 -o new.json --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+import chat_core
+import drug_scorer
+import scorers
+from frame_memory import column_bytes, compact_frame
+from instrumentation import max_rss_mb
+from results_store import RESULTS_SUFFIX, ResultsStore, write_results
+from synthetic_chats import write_csv
+
+DEFAULT_SAMPLE = 20000
+
+# A stage this much slower than in the compared run is marked as a regression
+REGRESSION_RATIO = 0.9
+
+
+class StageTimer:
+    """Runs named stages and records their timing and memory"""
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = {}
+
+    def run(self, name, rows, func, *args, **kwargs):
+        """Time func(*args, **kwargs); rows=None counts the rows of its result"""
+        if self.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1] if self.trace_memory else None
+            if self.trace_memory:
+                tracemalloc.stop()
+        if rows is None:
+            rows = len(result)
+        self.stages[name] = {
+            'seconds': seconds,
+            'rows': rows,
+            'rows_per_sec': rows / seconds if seconds > 0 else None,
+            'max_rss_mb': max_rss_mb(),
+            'traced_peak_mb': peak / 2 ** 20 if peak is not None else None,
+        }
+        return result
+
+    def skip(self, name, reason):
+        self.stages[name] = {'skipped': reason}
+
+
+def _qt_stages(timer, results, analysis, sender_index):
+    """Table model and chart stages; skipped when the GUI libraries are missing"""
+    try:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PyQt5.QtWidgets import QApplication
+        from overview_charts import OverviewCharts
+        from table_models import ResultsTableModel
+    except ImportError as e:
+        for name in ('table_model', 'table_filter_sort', 'overview_charts'):
+            timer.skip(name, str(e))
+        return
+    app = QApplication.instance() or QApplication([])
+    rows = len(results)
+
+    model = timer.run('table_model', rows, ResultsTableModel, results, row_color=('is_suspicious', None))
+
+    def filter_and_sort():
+        model.set_filter('cash', 'is_suspicious')
+        model.sort(model.column_names.index('suspicion_score'))
+    timer.run('table_filter_sort', rows, filter_and_sort)
+
+    charts = OverviewCharts()
+
+    def draw():
+        charts.update(analysis, sender_index.ranked())
+        for canvas in charts.canvases:
+            canvas.draw()
+    timer.run('overview_charts', rows, draw)
+    app.processEvents()
+
+
+def benchmark(path, sample=DEFAULT_SAMPLE, trace_memory=False, encoding='utf-8'):
+    """Time every stage on one CSV export; returns the stage dict.
+
+    The default encoding is that of synthetic_chats.py, so the CJK and emoji
+    messages reach the scorers intact.
+    """
+    from chat_stream import StreamingAnalysis
+    from sender_index import SenderIndex
+
+    timer = StageTimer(trace_memory)
+    df = timer.run('csv_load', None, pd.read_csv, path, encoding=encoding)
+    rows = len(df)
+    loaded_bytes = column_bytes(df).sum()
+    timer.run('compact_frame', rows, compact_frame, df)
+    timer.stages['compact_frame'].update(bytes_per_row_before=loaded_bytes / max(1, rows),
+                                         bytes_per_row_after=column_bytes(df).sum() / max(1, rows))
+
+    timer.run('standardize_columns', rows, chat_core.standardize_columns, df, 'WhatsApp')
+    messages = df['message'].astype(str)
+    head = messages.iloc[:sample].tolist()
+
+    results = timer.run('score_frame', rows, chat_core.score_frame, df)
+    timer.run('heuristic_score_message', len(head), lambda: [chat_core.score_message(m) for m in head])
+    timer.run('ga_batch_score', rows, drug_scorer.batch_score, messages)
+    timer.run('ga_score_message', len(head), lambda: [drug_scorer.score_message(m) for m in head])
+    # Both scorers on one shared featurization, against score_frame + ga_batch_score above
+    timer.run('score_messages_shared', rows, scorers.score_messages, messages, ('heuristic', 'ga'))
+    for detector in (chat_core.detect_transaction, chat_core.detect_location, chat_core.detect_personal_info):
+        timer.run(detector.__name__, len(head), lambda: [detector(m) for m in head])
+
+    count_columns = ['is_suspicious'] + chat_core.FLAG_COLUMNS
+    sender_index = timer.run('sender_index', rows, SenderIndex, results, count_columns)
+    analysis = StreamingAnalysis()
+    timer.run('streaming_aggregates', rows, analysis.update, results)
+
+    # Saving the case and reopening it as the GUI's Open Results does
+    with tempfile.TemporaryDirectory() as tmp:
+        store_path = os.path.join(tmp, f"case{RESULTS_SUFFIX}")
+        timer.run('store_write', rows, write_results, results, store_path)
+        timer.run('store_reopen', rows, lambda: StreamingAnalysis().update(ResultsStore(store_path).read()))
+
+    _qt_stages(timer, results, analysis, sender_index)
+    return timer.stages
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, previous):
+    """Print rows/sec per stage against an earlier result file"""
+    old_runs = {run['rows']: run['stages'] for run in previous['runs']}
+    for run in current['runs']:
+        old = old_runs.get(run['rows'])
+        if old is None:
+            print(f"{run['rows']} rows: no run of this size in the compared file")
+            continue
+        print(f"{run['rows']} rows, against {previous.get('commit') or 'previous run'}:")
+        for name, stage in run['stages'].items():
+            before = old.get(name, {}).get('rows_per_sec')
+            now = stage.get('rows_per_sec')
+            if not before or not now:
+                continue
+            ratio = now / before
+            marker = '  SLOWER' if ratio < REGRESSION_RATIO else ''
+            print(f"  {name:<24} {before:14.0f} -> {now:14.0f} rows/s  x{ratio:.2f}{marker}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark each pipeline stage on synthetic chats")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000], help="Dataset sizes to run")
+    parser.add_argument('--input', help="Benchmark this CSV export instead of synthetic data")
+    parser.add_argument('--encoding', default='ISO-8859-1', help="Encoding of the --input export")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic data")
+    parser.add_argument('--sample', type=int, default=DEFAULT_SAMPLE, help="Rows for per-message functions")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="Record peak Python allocations per stage (slows every stage down)")
+    parser.add_argument('-o', '--output', default='benchmark.json', help="JSON file to write")
+    parser.add_argument('--compare', help="Earlier benchmark JSON to compare rows/sec against")
+    args = parser.parse_args(argv)
+
+    report = {
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'runs': [],
+    }
+    if args.input:
+        stages = benchmark(args.input, args.sample, args.trace_memory, args.encoding)
+        report['runs'].append({'rows': stages['csv_load']['rows'], 'input': args.input, 'stages': stages})
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            for rows in args.rows:
+                path = os.path.join(tmp, f"synthetic_{rows}.csv")
+                started = time.perf_counter()
+                write_csv(path, rows, seed=args.seed)
+                generated = time.perf_counter() - started
+                stages = benchmark(path, args.sample, args.trace_memory)
+                report['runs'].append({'rows': rows, 'generate_seconds': generated, 'stages': stages})
+                os.remove(path)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    for run in report['runs']:
+        print(f"{run['rows']} rows:")
+        for name, stage in run['stages'].items():
+            if 'skipped' in stage:
+                print(f"  {name:<24} skipped ({stage['skipped']})")
+            else:
+                print(f"  {name:<24} {stage['seconds']:9.3f} s {stage['rows_per_sec'] or 0:14.0f} rows/s")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(report, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""Persisted state for re-analyzing a chat export as it grows.
+
+A re-extracted device yields the same chat history again with new messages
+appended. CaseState remembers a key for every message already scored along
+with the running StreamingAnalysis aggregates, so a re-run scores only the
+new rows and folds them into the existing sender and timeline counts.
+"""
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from chat_core import SCORER_VERSION
+from chat_stream import DEFAULT_TOP_N, StreamingAnalysis
+
+
+def row_keys(df):
+    """64-bit key per row from sender, receiver, send time and message text.
+
+    The raw 'Time (UTC)' column is preferred over the parsed timestamp. Values
+    are hashed as text so keys do not depend on per-chunk dtype inference.
+    Rows identical in all of these fields share a key.
+    """
+    columns = {col.lower(): col for col in df.columns}
+    time_col = columns.get('time (utc)', columns.get('timestamp'))
+    key_cols = [col for col in (columns.get('sender'), columns.get('receiver'), time_col, columns.get('message'))
+                if col is not None]
+    return pd.util.hash_pandas_object(df[key_cols].astype(str), index=False).to_numpy()
+
+
+class CaseState:
+    """Keys of the messages already scored for a case plus their aggregates.
+
+    With keep_rows the scored rows are kept as well, so a viewer can show the
+    whole history without re-reading the earlier exports.
+    """
+
+    def __init__(self, top_n=DEFAULT_TOP_N, keep_rows=False, version=SCORER_VERSION):
+        # Fingerprint of the scorers that produced the rows (scorers.scorers_version when several run)
+        self.version = version
+        self.keys = np.array([], dtype=np.uint64)
+        self.analysis = StreamingAnalysis(top_n=top_n)
+        self.rows = [] if keep_rows else None
+        # Keys added since the last save; merged into the sorted keys on save
+        self._new_keys = []
+
+    @classmethod
+    def load(cls, path, top_n=DEFAULT_TOP_N, keep_rows=False, version=SCORER_VERSION):
+        """Read a saved state; a missing file or other scorer version starts afresh"""
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+            if isinstance(state, cls) and state.version == version:
+                return state
+        return cls(top_n=top_n, keep_rows=keep_rows, version=version)
+
+    def new_rows(self, df):
+        """Boolean mask of the rows of a standardized frame not scored before"""
+        keys = row_keys(df)
+        if not len(self.keys):
+            return np.ones(len(keys), dtype=bool)
+        pos = np.searchsorted(self.keys, keys).clip(max=len(self.keys) - 1)
+        return self.keys[pos] != keys
+
+    def update(self, scored):
+        """Record newly scored rows and fold them into the aggregates"""
+        self._new_keys.append(row_keys(scored))
+        self.analysis.update(scored)
+        if self.rows is not None:
+            self.rows.append(scored)
+
+    def history(self):
+        """All scored rows kept so far, or None when rows are not kept"""
+        if not self.rows:
+            return None
+        if len(self.rows) > 1:
+            self.rows = [pd.concat(self.rows)]
+        return self.rows[0]
+
+    def save(self, path):
+        """Write the state atomically, so an interrupted save keeps the old one"""
+        if self._new_keys:
+            self.keys = np.union1d(self.keys, np.concatenate(self._new_keys))
+            self._new_keys = []
+        self.history()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
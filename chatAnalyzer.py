@@ -1,99 +1,130 @@
+import os
 import sys
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-import seaborn as sns
-import re
-from datetime import datetime
+import time
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QPushButton, QLabel, QFileDialog, QComboBox, QTabWidget, 
                              QTextEdit, QTableWidget, QTableWidgetItem, QSplitter, 
-                             QHeaderView, QMessageBox, QProgressBar, QGroupBox)
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QFont, QColor
+                             QHeaderView, QMessageBox, QProgressBar, QGroupBox,
+                             QTableView, QLineEdit, QCheckBox)
+from PyQt5.QtCore import Qt, QObject, QThread, pyqtSignal
+from PyQt5.QtGui import QColor
 
-# Simulated scoring functions
-def score_message(message):
-    """Score message based on drug-related keywords and patterns"""
-    if not isinstance(message, str):
-        return 0
-        
-    score = 0
-    message_lower = message.lower()
-    
-    # Drug-related keywords
-    drug_keywords = [
-        'weed', 'marijuana', 'cocaine', 'heroin', 'ecstasy', 'mdma', 'lsd', 'acid',
-        'speed', 'meth', 'crystal', 'amphetamine', 'opioid', 'oxy', 'xanax', 'valium',
-        'prescription', 'pills', 'dealer', 'score', 'hook up', 'bag', 'ounce', 'gram',
-        '8ball', 'pot', 'dope', 'smoke', 'joint', 'blunt', 'bong', 'pipe'
-    ]
-    
-    # Check for drug-related keywords
-    for keyword in drug_keywords:
-        if keyword in message_lower:
-            score += 5
-    
-    # Check for common patterns
-    patterns = [
-        (r'\$\d+', 3),  # Money references
-        (r'\b\d+\s*(g|mg|oz|gram|ounce)\b', 4),  # Quantity references
-        (r'\bmeet\b.*\b(later|tonight|tomorrow)\b', 3),  # Meeting arrangements
-        (r'\b(text|call|pm|dm)\b', 2),  # Private communication
-    ]
-    
-    for pattern, pattern_score in patterns:
-        if re.search(pattern, message_lower):
-            score += pattern_score
-            
-    return min(score, 10)  # Cap at 10
+from case_state import CaseState
+from chat_stream import StreamingAnalysis
+from contact_graph import ContactGraph, contact_names
+from conversations import score_windows, top_windows, window_rows
+from export_readers import load_export
+from frame_memory import column_bytes, compact_frame
+from instrumentation import PipelineMetrics, stage
+from results_store import RESULTS_SUFFIX, ResultsStore, is_store_path, write_results
+from scorers import make_scorers_cache, scorers_version
+from search_index import SearchIndex
+from sender_index import SenderIndex
+from table_models import ResultsTableModel
 
-def is_drug(message):
-    """Determine if message is likely drug-related"""
-    return score_message(message) >= 5
+# Scoring lives in chat_core so headless tools can use it without Qt;
+# the names are re-exported here for existing callers
+from chat_core import (DETECTOR_PATTERNS, DRUG_KEYWORDS, FLAG_COLUMNS, KEYWORD_MATCHER, SCORER_VERSION,
+                       SUSPICION_THRESHOLD, detect_location, detect_personal_info, detect_platform,
+                       detect_transaction, is_drug, make_score_cache, scan_columns, scan_message,
+                       scan_messages, score_frame, score_message, standardize_columns)
 
-def detect_transaction(text):
-    """Detect potential transactions in text"""
-    transaction_indicators = [
-        r'\$\d+', r'\d+\s*(dollars|bucks)', r'pay\s*(you|me)', r'venmo', r'cash\s*app',
-        r'zelle', r'wire\s*transfer', r'bitcoin', r'crypto', r'payment', r'send\s*money'
-    ]
-    
-    text_lower = text.lower()
-    for pattern in transaction_indicators:
-        if re.search(pattern, text_lower):
-            return True
-    return False
+# Rows scored per worker step; the GUI refreshes partial results between steps
+ANALYSIS_CHUNK_SIZE = 20000
+
+# Scorers run on every analysis, sharing one featurization; each adds its own columns
+ANALYSIS_SCORERS = ('heuristic', 'ga')
+
+# Highest-scoring rows kept for the Raw Data tab while an analysis is running
+PARTIAL_RESULT_ROWS = 1000
 
-def detect_location(text):
-    """Detect potential locations in text"""
-    location_indicators = [
-        r'\b(at|in|to|from|near)\s+[A-Z][a-z]+', r'\b(street|ave|avenue|road|rd|boulevard|blvd)\b',
-        r'\b(park|mall|plaza|center|store|shop)\b', r'\d+\s*(miles|blocks|minutes)\b'
-    ]
+# When set, per-stage timings of every analysis are written to this JSON file
+METRICS_ENV = 'CHATANALYZER_METRICS'
+
+# Window length and number of flagged windows in the Conversations tab
+CONVERSATION_WINDOW_MINUTES = 30
+CONVERSATION_TOP_WINDOWS = 200
+
+class AnalysisWorker(QObject):
+    """Standardizes and scores a chat DataFrame in chunks off the GUI thread.
     
-    text_lower = text.lower()
-    for pattern in location_indicators:
-        if re.search(pattern, text_lower):
-            return True
-    return False
+    A run that completes also builds the search index of the case rows
+    (earlier rows in the case state, then the new ones) in the same thread.
+    """
+    progress = pyqtSignal(int)
+    chunk_ready = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    finished = pyqtSignal()
+    
+    def __init__(self, df, platform, chunk_size=ANALYSIS_CHUNK_SIZE, cache=None, case_state=None, metrics=None):
+        super().__init__()
+        self.df = df
+        self.platform = platform
+        self.chunk_size = chunk_size
+        self.cache = cache
+        self.case_state = case_state
+        self.metrics = metrics
+        self.pending = 0
+        self.skipped = 0
+        self.cancelled = False
+        self.completed = False
+        self.search_index = None
+        
+    def cancel(self):
+        # Checked between chunks, so the current chunk still completes
+        self.cancelled = True
+        
+    def run(self):
+        try:
+            with stage(self.metrics, 'standardize_columns', len(self.df)):
+                standardize_columns(self.df, self.platform, metrics=self.metrics)
+            df = self.df
+            if self.case_state is not None:
+                # Only rows missing from the case state need scoring
+                with stage(self.metrics, 'skip_known_rows', len(df)):
+                    df = df[self.case_state.new_rows(df)]
+            self.pending = len(df)
+            self.skipped = len(self.df) - len(df)
+            # The GUI thread only touches the case state once the first chunk is emitted
+            known = self.case_state.history() if self.case_state is not None else None
+            messages = [known['message']] if known is not None else []
+            for start in range(0, self.pending, self.chunk_size):
+                if self.cancelled:
+                    break
+                chunk = score_frame(df.iloc[start:start + self.chunk_size], cache=self.cache, metrics=self.metrics,
+                                    scorers=ANALYSIS_SCORERS)
+                messages.append(chunk['message'])
+                self.chunk_ready.emit(chunk)
+                self.progress.emit(int((start + len(chunk)) * 100 / self.pending))
+            else:
+                self.completed = True
+                # Rows in the order on_analysis_finished puts them in results_df
+                if messages:
+                    rows = sum(len(m) for m in messages)
+                    with stage(self.metrics, 'search_index', rows):
+                        self.search_index = SearchIndex.build(pd.concat(messages, ignore_index=True))
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            self.finished.emit()
 
-def detect_personal_info(text):
-    """Detect potential personal information in text"""
-    personal_info_indicators = [
-        r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b',  # Phone numbers
-        r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',  # Email addresses
-        r'\b\d{4}\s?\d{4}\s?\d{4}\s?\d{4}\b',  # Credit card numbers
-        r'\b\d{3}-\d{2}-\d{4}\b',  # SSN
-        r'\b(birth|born|age|dob)\b.*\b(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})\b'  # Birth dates
-    ]
+class SearchIndexWorker(QObject):
+    """Builds the search index of results that came without one off the GUI thread"""
+    finished = pyqtSignal(object)
     
-    text_lower = text.lower()
-    for pattern in personal_info_indicators:
-        if re.search(pattern, text_lower):
-            return True
-    return False
+    def __init__(self, messages, metrics=None):
+        super().__init__()
+        self.messages = messages
+        self.metrics = metrics
+        
+    def run(self):
+        try:
+            with stage(self.metrics, 'search_index', len(self.messages)):
+                index = SearchIndex.build(self.messages)
+        except Exception:
+            index = None
+        self.finished.emit(index)
 
 class ChatAnalyzerApp(QMainWindow):
     def __init__(self):
@@ -104,8 +135,38 @@ class ChatAnalyzerApp(QMainWindow):
         # Initialize data
         self.df = None
         self.results_df = None
+        self.sender_index = None
+        self.contact_graph = None
+        self.search_index = None
+        self.windows = None
+        self.top_windows = None
+        self.overview_charts = None
         self.current_file = None
         
+        # Per-stage timings, only collected when METRICS_ENV names an output file
+        self.metrics = None
+        self.analysis_started = 0.0
+        
+        # Scan results are reused across analyses until the scorer changes
+        self.score_cache = make_scorers_cache(ANALYSIS_SCORERS)
+        
+        # Incremental analysis: scored message keys and aggregates for the case
+        self.case_state = None
+        self.case_state_path = None
+        
+        # Aggregates shown in the Overview: the case state's, unless it kept no
+        # rows to show with them (history_note then says so)
+        self.analysis = None
+        self.history_note = None
+        
+        # Background analysis state
+        self.analysis_thread = None
+        self.analysis_worker = None
+        self.index_worker = None
+        self.scored_chunks = []
+        self.partial_df = None
+        self.last_partial_refresh = 0.0
+        
         # Set up UI
         self.setup_ui()
         
@@ -129,6 +190,16 @@ class ChatAnalyzerApp(QMainWindow):
         self.load_btn.clicked.connect(self.load_file)
         file_info_layout.addWidget(self.load_btn)
         
+        self.open_results_btn = QPushButton("Open Results")
+        self.open_results_btn.setToolTip("Reopen a saved .results store without scoring again")
+        self.open_results_btn.clicked.connect(self.open_results)
+        file_info_layout.addWidget(self.open_results_btn)
+        
+        self.save_results_btn = QPushButton("Save Results")
+        self.save_results_btn.clicked.connect(self.save_results)
+        self.save_results_btn.setEnabled(False)
+        file_info_layout.addWidget(self.save_results_btn)
+        
         top_layout.addLayout(file_info_layout)
         
         # Platform selection
@@ -144,6 +215,16 @@ class ChatAnalyzerApp(QMainWindow):
         self.analyze_btn.setEnabled(False)
         platform_layout.addWidget(self.analyze_btn)
         
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self.cancel_analysis)
+        self.cancel_btn.setEnabled(False)
+        platform_layout.addWidget(self.cancel_btn)
+        
+        self.state_btn = QPushButton("Case State...")
+        self.state_btn.setToolTip("Keep a state file so re-extracted exports only score their new messages")
+        self.state_btn.clicked.connect(self.choose_case_state)
+        platform_layout.addWidget(self.state_btn)
+        
         platform_layout.addStretch()
         top_layout.addLayout(platform_layout)
         
@@ -173,12 +254,72 @@ class ChatAnalyzerApp(QMainWindow):
         self.raw_layout = QVBoxLayout(self.raw_tab)
         self.tabs.addTab(self.raw_tab, "Raw Data")
         
+        # Conversations tab: the highest-risk time windows of each sender/receiver thread
+        self.conversation_tab = QWidget()
+        self.conversation_layout = QVBoxLayout(self.conversation_tab)
+        self.tabs.addTab(self.conversation_tab, "Conversations")
+        self.conversation_label = QLabel()
+        self.conversation_layout.addWidget(self.conversation_label)
+        conversation_splitter = QSplitter(Qt.Vertical)
+        self.window_table = QTableView()
+        self.window_table.setSortingEnabled(True)
+        self.window_table.setSelectionBehavior(QTableView.SelectRows)
+        self.window_table.clicked.connect(self.show_window_messages)
+        conversation_splitter.addWidget(self.window_table)
+        self.window_messages_table = QTableView()
+        conversation_splitter.addWidget(self.window_messages_table)
+        self.conversation_layout.addWidget(conversation_splitter)
+        
+        # Search tab: full-text queries answered from the inverted index
+        self.search_tab = QWidget()
+        self.search_layout = QVBoxLayout(self.search_tab)
+        self.tabs.addTab(self.search_tab, "Search")
+        search_bar = QHBoxLayout()
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText(
+            'Words, "exact phrase", prefix*, from:NAME to:NAME score>=5 after:2025-01-01 before:2025-02-01')
+        self.search_edit.returnPressed.connect(self.run_search)
+        search_bar.addWidget(self.search_edit)
+        self.search_btn = QPushButton("Search")
+        self.search_btn.clicked.connect(self.run_search)
+        search_bar.addWidget(self.search_btn)
+        self.search_layout.addLayout(search_bar)
+        self.search_label = QLabel()
+        self.search_layout.addWidget(self.search_label)
+        self.search_table = QTableView()
+        self.search_table.setSortingEnabled(True)
+        self.search_layout.addWidget(self.search_table)
+        
+        # Filter bar; filtering and sorting happen in the table model
+        filter_layout = QHBoxLayout()
+        self.raw_filter_edit = QLineEdit()
+        self.raw_filter_edit.setPlaceholderText("Filter messages...")
+        self.raw_filter_edit.textChanged.connect(self.apply_raw_filter)
+        filter_layout.addWidget(self.raw_filter_edit)
+        self.suspicious_only_check = QCheckBox("Suspicious only")
+        self.suspicious_only_check.toggled.connect(self.apply_raw_filter)
+        filter_layout.addWidget(self.suspicious_only_check)
+        self.raw_count_label = QLabel()
+        filter_layout.addWidget(self.raw_count_label)
+        self.raw_layout.addLayout(filter_layout)
+        
+        # Only the visible rows are ever rendered, so no row limit is needed
+        self.raw_table = QTableView()
+        self.raw_table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.raw_table.setSortingEnabled(True)
+        self.raw_table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        # Size columns from a sample of rows rather than every loaded row
+        self.raw_table.horizontalHeader().setResizeContentsPrecision(100)
+        self.raw_layout.addWidget(self.raw_table)
+        
         # Status bar
         self.statusBar().showMessage("Ready to load chat data")
         
     def load_file(self):
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "Open Chat File", "", "CSV Files (*.csv);;All Files (*)"
+            self, "Open Chat File", "",
+            "Chat Exports (*.csv *.json *.txt);;CSV Files (*.csv);;Facebook JSON (*.json);;"
+            "WhatsApp Text (*.txt);;All Files (*)"
         )
         
         if file_path:
@@ -186,8 +327,16 @@ class ChatAnalyzerApp(QMainWindow):
             self.file_label.setText(f"Loaded: {file_path.split('/')[-1]}")
             
             try:
-                self.df = pd.read_csv(file_path, encoding='ISO-8859-1')
-                self.statusBar().showMessage(f"Loaded {len(self.df)} messages from {file_path}")
+                self.metrics = PipelineMetrics() if os.environ.get(METRICS_ENV) else None
+                with stage(self.metrics, 'read_export') as step:
+                    self.df = load_export(file_path)
+                    step.add_rows(len(self.df))
+                # Repeated senders and metadata become categoricals; scoring keeps the layout
+                with stage(self.metrics, 'compact_frame', len(self.df)):
+                    compact_frame(self.df)
+                bytes_per_row = column_bytes(self.df).sum() / max(1, len(self.df))
+                self.statusBar().showMessage(
+                    f"Loaded {len(self.df)} messages from {file_path} ({bytes_per_row:.0f} bytes per message)")
                 self.analyze_btn.setEnabled(True)
                 
                 # Show a preview of the data
@@ -196,6 +345,73 @@ class ChatAnalyzerApp(QMainWindow):
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Failed to load file: {str(e)}")
     
+    def open_results(self):
+        store_path = QFileDialog.getExistingDirectory(self, "Open Results Store")
+        if not store_path:
+            return
+        
+        try:
+            # Numeric and dictionary columns are memory-mapped; the message heap is
+            # decoded block by block (store_reopen in benchmark.py times this)
+            store = ResultsStore(store_path)
+            self.results_df = store.read()
+            # A store saved with its search index is not indexed again
+            self.search_index = SearchIndex.load(store_path, len(store))
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to open results: {str(e)}")
+            return
+        
+        # The aggregates are rebuilt from the stored scores, nothing is rescored
+        self.case_state = CaseState(top_n=PARTIAL_RESULT_ROWS)
+        self.case_state.analysis.platform = store.attrs.get('platform')
+        self.case_state.analysis.update(self.results_df)
+        self.analysis = self.case_state.analysis
+        self.history_note = None
+        
+        self.df = None
+        self.current_file = store_path
+        self.file_label.setText(f"Opened: {store_path.rstrip('/').split('/')[-1]}")
+        self.analyze_btn.setEnabled(False)
+        self.show_results()
+        self.statusBar().showMessage(f"Opened {len(store)} scored messages from {store_path}")
+    
+    def save_results(self):
+        if self.results_df is None:
+            return
+        
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Save Results", "", "Results Store (*.results);;CSV Files (*.csv)"
+        )
+        if not file_path:
+            return
+        
+        try:
+            if file_path.lower().endswith('.csv'):
+                self.results_df.to_csv(file_path, index=False)
+            else:
+                # Anything other than CSV is saved as a columnar results store
+                if not is_store_path(file_path):
+                    file_path += RESULTS_SUFFIX
+                write_results(self.results_df, file_path, platform=self.case_state.analysis.platform)
+                if self.search_index is not None:
+                    self.search_index.save(file_path)
+            self.statusBar().showMessage(f"Saved {len(self.results_df)} scored messages to {file_path}")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to save results: {str(e)}")
+    
+    def choose_case_state(self):
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Case State File", "", "Case State (*.state);;All Files (*)",
+            options=QFileDialog.DontConfirmOverwrite
+        )
+        
+        # Cancelling the dialog turns incremental analysis off again
+        self.case_state_path = file_path or None
+        if file_path:
+            self.statusBar().showMessage(f"Incremental analysis using {file_path}")
+        else:
+            self.statusBar().showMessage("Incremental analysis off")
+    
     def show_data_preview(self):
         # Clear previous content
         for i in reversed(range(self.overview_layout.count())): 
@@ -229,119 +445,230 @@ class ChatAnalyzerApp(QMainWindow):
         self.overview_layout.addWidget(preview_group)
     
     def analyze_data(self):
-        if self.df is None:
+        if self.df is None or self.analysis_thread is not None:
             return
             
         self.progress_bar.setVisible(True)
-        self.progress_bar.setRange(0, 0)  # Indeterminate progress
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.analyze_btn.setEnabled(False)
+        self.load_btn.setEnabled(False)
+        self.open_results_btn.setEnabled(False)
+        self.save_results_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        
+        self.scored_chunks = []
+        self.partial_df = None
+        self.last_partial_refresh = 0.0
+        self.results_df = None
+        self.search_index = None
+        self.index_worker = None
+        
+        if self.case_state_path:
+            self.case_state = CaseState.load(self.case_state_path, top_n=PARTIAL_RESULT_ROWS, keep_rows=True,
+                                             version=scorers_version(ANALYSIS_SCORERS))
+        else:
+            self.case_state = CaseState(top_n=PARTIAL_RESULT_ROWS, keep_rows=True,
+                                        version=scorers_version(ANALYSIS_SCORERS))
+        
+        if self.metrics is None and os.environ.get(METRICS_ENV):
+            self.metrics = PipelineMetrics()
+        self.analysis_started = time.monotonic()
+        
+        # Detect platform on the GUI thread; standardizing and scoring run in the worker
+        self.analysis_worker = AnalysisWorker(self.df, self.detect_platform(), cache=self.score_cache,
+                                              case_state=self.case_state, metrics=self.metrics)
+        self.analysis_thread = QThread(self)
+        self.analysis_worker.moveToThread(self.analysis_thread)
+        self.analysis_thread.started.connect(self.analysis_worker.run)
+        self.analysis_worker.progress.connect(self.progress_bar.setValue)
+        self.analysis_worker.chunk_ready.connect(self.on_chunk_scored)
+        self.analysis_worker.failed.connect(self.on_analysis_failed)
+        self.analysis_worker.finished.connect(self.analysis_thread.quit)
+        self.analysis_thread.finished.connect(self.on_analysis_finished)
+        self.analysis_thread.start()
+        self.statusBar().showMessage("Analyzing...")
+    
+    def cancel_analysis(self):
+        if self.analysis_worker is not None:
+            self.analysis_worker.cancel()
+            self.cancel_btn.setEnabled(False)
+            self.statusBar().showMessage("Cancelling after the current chunk...")
+    
+    def on_chunk_scored(self, chunk):
+        self.scored_chunks.append(chunk)
+        
+        # The case state keeps the highest-scoring rows seen so far for triage
+        with stage(self.metrics, 'aggregate', len(chunk)):
+            self.case_state.update(chunk)
+        self.partial_df = self.case_state.analysis.top_rows
+        
+        scored = sum(len(c) for c in self.scored_chunks)
+        suspicious = sum(int(c['is_suspicious'].sum()) for c in self.scored_chunks)
+        now = time.monotonic()
+        rate = scored / max(now - self.analysis_started, 1e-6)
+        self.statusBar().showMessage(
+            f"Scored {scored} of {self.analysis_worker.pending} messages, {suspicious} suspicious so far "
+            f"({rate:,.0f} messages/s)...")
+        
+        # Rebuilding the table is costly, so refresh it at most once a second
+        if now - self.last_partial_refresh >= 1.0:
+            self.last_partial_refresh = now
+            with stage(self.metrics, 'table_fill', len(self.partial_df)):
+                self.update_raw_tab(self.partial_df)
+    
+    def on_analysis_failed(self, error):
+        # A half-updated case state is dropped rather than saved
+        self.case_state = None
+        self.scored_chunks = []
+        self.statusBar().showMessage("Analysis failed.")
+        QMessageBox.critical(self, "Error", f"Analysis failed: {error}")
+    
+    def on_analysis_finished(self):
+        cancelled = self.analysis_worker.cancelled and not self.analysis_worker.completed
+        pending = self.analysis_worker.pending
+        skipped = self.analysis_worker.skipped
+        search_index = self.analysis_worker.search_index
+        self.analysis_thread.wait()
+        self.analysis_thread.deleteLater()
+        self.analysis_worker.deleteLater()
+        self.analysis_thread = None
+        self.analysis_worker = None
+        
+        self.progress_bar.setVisible(False)
+        self.analyze_btn.setEnabled(True)
+        self.load_btn.setEnabled(True)
+        self.open_results_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        
+        if self.case_state is None:
+            self.metrics = None
+            return
         
-        # Process in a separate thread would be better, but for simplicity we'll do it here
         try:
-            # Detect platform if auto-selected
-            platform = self.detect_platform()
+            # A cancelled run is saved too, so the next run resumes where it stopped
+            if self.case_state_path:
+                self.case_state.save(self.case_state_path)
             
-            # Standardize column names based on platform
-            self.standardize_columns(platform)
+            # States written by chat_stream.py or batch_cli.py keep aggregates but no rows
+            self.results_df = self.case_state.history()
+            self.analysis = self.case_state.analysis
+            self.history_note = None
+            if self.results_df is None and self.scored_chunks:
+                self.results_df = pd.concat(self.scored_chunks)
+                if self.analysis.total_messages != len(self.results_df):
+                    # The summary then covers the same new rows as the tables
+                    self.history_note = (f"History not kept in the case state: showing the "
+                                         f"{len(self.results_df)} new messages only.")
+                    self.analysis = StreamingAnalysis(top_n=PARTIAL_RESULT_ROWS)
+                    self.analysis.platform = self.case_state.analysis.platform
+                    self.analysis.update(self.results_df)
+            scored = sum(len(c) for c in self.scored_chunks)
+            self.scored_chunks = []
+            self.partial_df = None
             
-            # Apply scoring
-            self.results_df = self.df.copy()
-            self.results_df['suspicion_score'] = self.results_df['message'].astype(str).apply(score_message)
-            self.results_df['is_suspicious'] = self.results_df['suspicion_score'] >= 5
-            self.results_df['has_transaction'] = self.results_df['message'].astype(str).apply(detect_transaction)
-            self.results_df['has_location'] = self.results_df['message'].astype(str).apply(detect_location)
-            self.results_df['has_personal_info'] = self.results_df['message'].astype(str).apply(detect_personal_info)
+            if self.results_df is None:
+                self.statusBar().showMessage("Analysis cancelled." if cancelled else "No new messages to analyze.")
+                return
             
-            # Update UI with results
-            self.update_overview_tab()
-            self.update_sender_tab()
-            self.update_raw_tab()
+            self.search_index = search_index
+            self.show_results()
+            elapsed = time.monotonic() - self.analysis_started
             
-            self.statusBar().showMessage(f"Analysis complete. Found {self.results_df['is_suspicious'].sum()} suspicious messages.")
+            suspicious = self.analysis.flag_counts['is_suspicious']
+            reused = f" ({skipped} already analyzed)" if skipped else ""
+            if cancelled:
+                message = (f"Analysis cancelled after {scored} of {pending} messages{reused}. "
+                           f"Found {suspicious} suspicious messages so far.")
+            else:
+                message = (f"Analysis complete. Scored {scored} messages{reused} in {elapsed:.1f}s "
+                           f"({scored / max(elapsed, 1e-6):,.0f} messages/s). Found {suspicious} suspicious messages. "
+                           f"Score cache hit rate {self.score_cache.stats()['hit_rate']:.0%}.")
+            if self.history_note:
+                message = f"{message} {self.history_note}"
+            self.statusBar().showMessage(message)
             
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Analysis failed: {str(e)}")
         finally:
-            self.progress_bar.setVisible(False)
+            if self.metrics is not None:
+                self.metrics.write(os.environ[METRICS_ENV])
+                self.metrics = None
+    
+    def show_results(self):
+        rows = len(self.results_df)
+        self.index_worker = None
+        
+        # Sender rows and aggregates are indexed once per analysis
+        with stage(self.metrics, 'sender_index', rows):
+            self.sender_index = SenderIndex(self.results_df, ['is_suspicious'] + FLAG_COLUMNS)
+        with stage(self.metrics, 'contact_graph', rows):
+            self.contact_graph = ContactGraph()
+            self.contact_graph.update(self.results_df)
+        if self.search_index is not None and self.search_index.num_rows != rows:
+            self.search_index = None
+        
+        # Update UI with results
+        with stage(self.metrics, 'overview_charts', rows):
+            self.update_overview_tab()
+        with stage(self.metrics, 'sender_tab', rows):
+            self.update_sender_tab()
+        with stage(self.metrics, 'table_fill', rows):
+            self.update_raw_tab()
+        with stage(self.metrics, 'conversations', rows):
+            self.update_conversation_tab()
+        self.search_table.setModel(None)
+        if self.search_index is not None:
+            self.search_label.setText(f"{self.search_index.num_docs} distinct messages indexed.")
+        else:
+            # Cancelled runs and stores saved without an index are indexed in the background
+            self.start_search_index()
+        self.save_results_btn.setEnabled(True)
+    
+    def start_search_index(self):
+        self.search_label.setText("Indexing messages for search...")
+        worker = SearchIndexWorker(self.results_df['message'], metrics=self.metrics)
+        thread = QThread(self)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.finished.connect(self.on_search_index_built)
+        worker.finished.connect(thread.quit)
+        thread.finished.connect(worker.deleteLater)
+        thread.finished.connect(thread.deleteLater)
+        self.index_worker = worker
+        thread.start()
+    
+    def on_search_index_built(self, index):
+        # A build for results that were replaced meanwhile is dropped
+        if self.sender() is not self.index_worker:
+            return
+        self.index_worker = None
+        if index is None:
+            self.search_label.setText("Search index could not be built.")
+            return
+        self.search_index = index
+        self.search_label.setText(f"{index.num_docs} distinct messages indexed.")
+    
+    def closeEvent(self, event):
+        # Stop a running analysis before the window goes away
+        if self.analysis_thread is not None:
+            self.analysis_worker.chunk_ready.disconnect(self.on_chunk_scored)
+            self.analysis_thread.finished.disconnect(self.on_analysis_finished)
+            self.analysis_worker.cancel()
+            self.analysis_thread.quit()
+            self.analysis_thread.wait()
+        # Index builds cannot be interrupted, so wait for any still running
+        for thread in self.findChildren(QThread):
+            thread.quit()
+            thread.wait()
+        super().closeEvent(event)
     
     def detect_platform(self):
         if self.platform_combo.currentText() != "Auto Detect":
             return self.platform_combo.currentText()
             
         # Auto-detect platform based on column names
-        columns = set(self.df.columns.str.lower())
-        
-        # Check for WhatsApp-specific columns
-        whatsapp_indicators = {'from', 'to', 'time (utc)', 'time (local)', 'message'}
-        if whatsapp_indicators.issubset(columns):
-            return "WhatsApp"
-            
-        # Check for Facebook-specific columns
-        facebook_indicators = {'sender_name', 'timestamp_ms', 'content'}
-        if facebook_indicators.issubset(columns):
-            return "Facebook"
-            
-        # Check for partial matches
-        if 'from' in columns and 'message' in columns:
-            return "WhatsApp"
-        elif 'sender_name' in columns and 'content' in columns:
-            return "Facebook"
-                
-        return "Unknown"
-    
-    def standardize_columns(self, platform):
-        # Standardize column names for easier processing
-        column_map = {}
-        
-        if platform == "WhatsApp":
-            # Map WhatsApp columns to standard names
-            if 'from' in self.df.columns:
-                column_map['From'] = 'sender'
-            if 'to' in self.df.columns:
-                column_map['To'] = 'receiver'
-            if 'message' in self.df.columns:
-                column_map['Message'] = 'message'
-            elif 'content' in self.df.columns:
-                column_map['Content'] = 'message'
-                
-            # Handle timestamp columns
-            if 'time (local)' in self.df.columns:
-                column_map['Time (local)'] = 'timestamp'
-            elif 'timestamp' in self.df.columns:
-                column_map['Timestamp'] = 'timestamp'
-            elif 'date' in self.df.columns:
-                column_map['Date'] = 'timestamp'
-                
-        elif platform == "Facebook":
-            # Map Facebook columns to standard names
-            if 'sender_name' in self.df.columns:
-                column_map['sender_name'] = 'sender'
-            if 'content' in self.df.columns:
-                column_map['content'] = 'message'
-            elif 'message' in self.df.columns:
-                column_map['message'] = 'message'
-                
-            # Handle timestamp columns
-            if 'timestamp_ms' in self.df.columns:
-                # Convert Facebook timestamp (ms) to datetime
-                self.df['timestamp'] = pd.to_datetime(self.df['timestamp_ms'], unit='ms')
-                # Don't need to map this as we're creating a new column
-            elif 'timestamp' in self.df.columns:
-                column_map['timestamp'] = 'timestamp'
-            elif 'date' in self.df.columns:
-                column_map['date'] = 'timestamp'
-        
-        # Rename columns
-        self.df.rename(columns=column_map, inplace=True)
-        
-        # Ensure we have required columns
-        required = ['sender', 'message']
-        for col in required:
-            if col not in self.df.columns:
-                raise ValueError(f"Required column '{col}' not found in data")
-        
-        # Convert timestamp to datetime if it exists
-        if 'timestamp' in self.df.columns:
-            self.df['timestamp'] = pd.to_datetime(self.df['timestamp'], errors='coerce')
+        return detect_platform(self.df.columns)
     
     def update_overview_tab(self):
         # Clear previous content
@@ -350,15 +677,18 @@ class ChatAnalyzerApp(QMainWindow):
             if widget:
                 widget.setParent(None)
         
-        # Create summary stats
-        total_msgs = len(self.results_df)
-        suspicious_msgs = self.results_df['is_suspicious'].sum()
-        transaction_msgs = self.results_df['has_transaction'].sum()
-        location_msgs = self.results_df['has_location'].sum()
-        personal_info_msgs = self.results_df['has_personal_info'].sum()
+        # Summary stats come from the aggregates, which cover every message in the tables
+        summary = self.analysis.summary()
+        total_msgs = summary['total_messages']
+        suspicious_msgs = summary['suspicious_messages']
+        transaction_msgs = summary['transaction_messages']
+        location_msgs = summary['location_messages']
+        personal_info_msgs = summary['personal_info_messages']
+        note = f"<i>{self.history_note}</i><br>" if self.history_note else ""
         
         stats_text = f"""
         <h3>Analysis Summary</h3>
+        {note}
         <b>Total Messages:</b> {total_msgs}<br>
         <b>Suspicious Messages:</b> {suspicious_msgs} ({suspicious_msgs/total_msgs*100:.1f}%)<br>
         <b>Potential Transactions:</b> {transaction_msgs}<br>
@@ -369,90 +699,15 @@ class ChatAnalyzerApp(QMainWindow):
         stats_label = QLabel(stats_text)
         self.overview_layout.addWidget(stats_label)
         
-        # Create matplotlib figures
-        fig1 = self.create_suspicion_distribution_plot()
-        fig2 = self.create_sender_analysis_plot()
-        fig3 = self.create_timeline_plot()
+        # matplotlib and its Qt backend load with the first chart, not at startup
+        if self.overview_charts is None:
+            from overview_charts import OverviewCharts
+            self.overview_charts = OverviewCharts()
         
-        # Add plots to layout
-        self.overview_layout.addWidget(FigureCanvas(fig1))
-        self.overview_layout.addWidget(FigureCanvas(fig2))
-        self.overview_layout.addWidget(FigureCanvas(fig3))
-    
-    def create_suspicion_distribution_plot(self):
-        fig, ax = plt.subplots(figsize=(10, 4))
-        sns.histplot(data=self.results_df, x='suspicion_score', bins=10, ax=ax)
-        ax.set_title('Distribution of Suspicion Scores')
-        ax.set_xlabel('Suspicion Score')
-        ax.set_ylabel('Count')
-        plt.tight_layout()
-        return fig
-    
-    def create_sender_analysis_plot(self):
-        # Group by sender and calculate metrics
-        sender_stats = self.results_df.groupby('sender').agg({
-            'suspicion_score': 'mean',
-            'is_suspicious': 'sum',
-            'has_transaction': 'sum',
-            'has_location': 'sum',
-            'has_personal_info': 'sum'
-        }).sort_values('suspicion_score', ascending=False)
-        
-        fig, ax = plt.subplots(figsize=(10, 6))
-        x = range(len(sender_stats))
-        width = 0.15
-        
-        ax.bar(x, sender_stats['is_suspicious'], width, label='Suspicious')
-        ax.bar([i + width for i in x], sender_stats['has_transaction'], width, label='Transactions')
-        ax.bar([i + width*2 for i in x], sender_stats['has_location'], width, label='Locations')
-        ax.bar([i + width*3 for i in x], sender_stats['has_personal_info'], width, label='Personal Info')
-        
-        ax.set_xlabel('Sender')
-        ax.set_ylabel('Count')
-        ax.set_title('Message Analysis by Sender')
-        ax.set_xticks([i + width*1.5 for i in x])
-        ax.set_xticklabels(sender_stats.index, rotation=45, ha='right')
-        ax.legend()
-        
-        plt.tight_layout()
-        return fig
-    
-    def create_timeline_plot(self):
-        # Try to create a timeline if we have timestamp data
-        if 'timestamp' in self.results_df.columns:
-            try:
-                # Convert to datetime if not already
-                time_df = self.results_df.copy()
-                time_df['timestamp'] = pd.to_datetime(time_df['timestamp'], errors='coerce')
-                time_df = time_df.dropna(subset=['timestamp'])
-                
-                # Group by date
-                time_df['date'] = time_df['timestamp'].dt.date
-                daily_counts = time_df.groupby('date').size()
-                daily_suspicious = time_df[time_df['is_suspicious']].groupby('date').size()
-                
-                fig, ax = plt.subplots(figsize=(10, 4))
-                ax.plot(daily_counts.index, daily_counts.values, label='All Messages', alpha=0.7)
-                ax.scatter(daily_suspicious.index, daily_suspicious.values, 
-                          color='red', label='Suspicious Messages', alpha=0.8)
-                ax.set_title('Message Activity Over Time')
-                ax.set_xlabel('Date')
-                ax.set_ylabel('Message Count')
-                ax.legend()
-                plt.xticks(rotation=45)
-                plt.tight_layout()
-                return fig
-            except Exception as e:
-                print(f"Timeline error: {e}")
-                pass
-                
-        # Fallback if timeline can't be created
-        fig, ax = plt.subplots(figsize=(10, 4))
-        ax.text(0.5, 0.5, 'Timeline data not available', 
-                horizontalalignment='center', verticalalignment='center',
-                transform=ax.transAxes, fontsize=14)
-        ax.set_title('Message Activity Over Time')
-        return fig
+        # The same canvases are redrawn from the aggregates on every analysis
+        self.overview_charts.update(self.analysis, self.sender_index.ranked())
+        for canvas in self.overview_charts.canvases:
+            self.overview_layout.addWidget(canvas)
     
     def update_sender_tab(self):
         # Clear previous content
@@ -465,10 +720,10 @@ class ChatAnalyzerApp(QMainWindow):
         sender_layout = QHBoxLayout()
         sender_layout.addWidget(QLabel("Select Sender:"))
         
+        # Senders are looked up by their position in the sender index
         sender_combo = QComboBox()
-        senders = self.results_df['sender'].unique()
-        sender_combo.addItems(senders)
-        sender_combo.currentTextChanged.connect(self.update_sender_details)
+        sender_combo.addItems([str(sender) for sender in self.sender_index.senders])
+        sender_combo.currentIndexChanged.connect(self.update_sender_details)
         sender_layout.addWidget(sender_combo)
         
         sender_layout.addStretch()
@@ -484,27 +739,27 @@ class ChatAnalyzerApp(QMainWindow):
         splitter.addWidget(self.sender_details)
         
         # Sender messages table
-        self.sender_table = QTableWidget()
+        self.sender_table = QTableView()
+        self.sender_table.setSortingEnabled(True)
         splitter.addWidget(self.sender_table)
         
         # Set initial sender
-        if len(senders) > 0:
-            self.update_sender_details(senders[0])
+        if len(self.sender_index) > 0:
+            self.update_sender_details(0)
     
-    def update_sender_details(self, sender):
-        if self.results_df is None:
+    def update_sender_details(self, sender_idx):
+        if self.results_df is None or sender_idx < 0:
             return
             
-        # Filter data for selected sender
-        sender_data = self.results_df[self.results_df['sender'] == sender]
-        
-        # Calculate stats
-        total_msgs = len(sender_data)
-        suspicious_msgs = sender_data['is_suspicious'].sum()
-        avg_score = sender_data['suspicion_score'].mean()
-        transaction_msgs = sender_data['has_transaction'].sum()
-        location_msgs = sender_data['has_location'].sum()
-        personal_info_msgs = sender_data['has_personal_info'].sum()
+        # Stats are precomputed, so switching senders does not scan the results
+        sender = self.sender_index.senders[sender_idx]
+        stats = self.sender_index.sender_stats(sender_idx)
+        total_msgs = stats['messages']
+        suspicious_msgs = stats['is_suspicious']
+        avg_score = stats['suspicion_score']
+        transaction_msgs = stats['has_transaction']
+        location_msgs = stats['has_location']
+        personal_info_msgs = stats['has_personal_info']
         
         # Update details text
         details_text = f"""
@@ -515,91 +770,163 @@ class ChatAnalyzerApp(QMainWindow):
         <b>Potential Transactions:</b> {transaction_msgs}<br>
         <b>Location Mentions:</b> {location_msgs}<br>
         <b>Personal Info Detected:</b> {personal_info_msgs}<br>
-        """
+        """ + self.sender_network_text(sender)
         
         self.sender_details.setHtml(details_text)
         
         # Update messages table
-        self.update_sender_table(sender_data)
+        self.update_sender_table(self.sender_index.positions(sender_idx))
     
-    def update_sender_table(self, sender_data):
-        # Prepare table data
-        table_data = sender_data[['timestamp', 'message', 'suspicion_score', 
-                                 'has_transaction', 'has_location', 'has_personal_info']].copy()
-        table_data = table_data.sort_values('suspicion_score', ascending=False)
-        
-        # Configure table
-        self.sender_table.setRowCount(len(table_data))
-        self.sender_table.setColumnCount(6)
-        self.sender_table.setHorizontalHeaderLabels([
-            'Timestamp', 'Message', 'Score', 'Transaction', 'Location', 'Personal Info'
-        ])
-        
-        # Populate table
-        for row_idx, (_, row) in enumerate(table_data.iterrows()):
-            # Timestamp
-            timestamp_item = QTableWidgetItem(str(row['timestamp']))
-            self.sender_table.setItem(row_idx, 0, timestamp_item)
-            
-            # Message
-            message_item = QTableWidgetItem(str(row['message']))
-            self.sender_table.setItem(row_idx, 1, message_item)
-            
-            # Score
-            score_item = QTableWidgetItem(str(row['suspicion_score']))
-            self.sender_table.setItem(row_idx, 2, score_item)
-            
-            # Transaction flag
-            transaction_item = QTableWidgetItem("Yes" if row['has_transaction'] else "No")
-            if row['has_transaction']:
-                transaction_item.setBackground(QColor(255, 200, 200))  # Light red
-            self.sender_table.setItem(row_idx, 3, transaction_item)
-            
-            # Location flag
-            location_item = QTableWidgetItem("Yes" if row['has_location'] else "No")
-            if row['has_location']:
-                location_item.setBackground(QColor(200, 255, 200))  # Light green
-            self.sender_table.setItem(row_idx, 4, location_item)
-            
-            # Personal info flag
-            personal_item = QTableWidgetItem("Yes" if row['has_personal_info'] else "No")
-            if row['has_personal_info']:
-                personal_item.setBackground(QColor(255, 255, 200))  # Light yellow
-            self.sender_table.setItem(row_idx, 5, personal_item)
+    def sender_network_text(self, sender):
+        # Exports without receivers (Facebook, WhatsApp .txt) have no contact graph
+        if self.contact_graph is None or not self.contact_graph.num_edges:
+            return ""
+        try:
+            neighbors = self.contact_graph.neighbors(sender)
+        except KeyError:
+            return ""
+        
+        # Centrality is computed on the first lookup and kept by the graph
+        centrality = self.contact_graph.centrality()
+        rank = centrality.index.get_loc(contact_names([sender])[0]) + 1
+        two_hops = len(self.contact_graph.k_hop(sender, 2))
+        top_contacts = ', '.join(f"{name} ({row.score_sum})" for name, row in neighbors.head(5).iterrows())
+        return f"""
+        <b>Contacts:</b> {len(neighbors)} direct, {two_hops - len(neighbors)} more within 2 hops<br>
+        <b>Network Rank:</b> #{rank} of {len(centrality)} by suspicious traffic<br>
+        <b>Top Contacts (suspicion score):</b> {top_contacts}<br>
+        """
+    
+    def update_sender_table(self, positions):
+        # Positions come most suspicious first; the model handles any later re-sorting
+        model = ResultsTableModel(
+            self.results_df,
+            columns=['timestamp', 'message', 'suspicion_score',
+                     'has_transaction', 'has_location', 'has_personal_info'],
+            headers=['Timestamp', 'Message', 'Score', 'Transaction', 'Location', 'Personal Info'],
+            yes_no=FLAG_COLUMNS,
+            cell_colors={
+                'has_transaction': QColor(255, 200, 200),  # Light red
+                'has_location': QColor(200, 255, 200),  # Light green
+                'has_personal_info': QColor(255, 255, 200),  # Light yellow
+            },
+            rows=positions,
+            parent=self.sender_table
+        )
+        old_model = self.sender_table.model()
+        self.sender_table.setModel(model)
+        if old_model is not None:
+            old_model.deleteLater()
+        
+        # Show the score sort indicator without sorting the rows again
+        model.sort_column, model.sort_order = 2, Qt.DescendingOrder
+        header = self.sender_table.horizontalHeader()
+        header.blockSignals(True)
+        header.setSortIndicator(2, Qt.DescendingOrder)
+        header.blockSignals(False)
         
         # Resize columns to content
         self.sender_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
         
-    def update_raw_tab(self):
-        # Clear previous content
-        for i in reversed(range(self.raw_layout.count())): 
-            widget = self.raw_layout.itemAt(i).widget()
-            if widget:
-                widget.setParent(None)
+    def update_raw_tab(self, data=None):
+        # Show partial results while an analysis is running, full results otherwise
+        if data is None:
+            data = self.results_df
         
-        # Create raw data table
-        raw_table = QTableWidget()
-        self.raw_layout.addWidget(raw_table)
+        # Highlight suspicious messages
+        model = ResultsTableModel(data, row_color=('is_suspicious', QColor(255, 200, 200)), parent=self.raw_table)
+        old_model = self.raw_table.model()
+        self.raw_table.setModel(model)
+        if old_model is not None:
+            old_model.deleteLater()
         
-        # Configure table
-        raw_table.setRowCount(min(1000, len(self.results_df)))  # Limit for performance
-        raw_table.setColumnCount(len(self.results_df.columns))
-        raw_table.setHorizontalHeaderLabels(self.results_df.columns)
+        # Keep the user's sort order and filter across refreshes
+        header = self.raw_table.horizontalHeader()
+        model.sort_column, model.sort_order = header.sortIndicatorSection(), header.sortIndicatorOrder()
+        self.apply_raw_filter()
         
-        # Populate table
-        for row_idx in range(min(1000, len(self.results_df))):
-            row = self.results_df.iloc[row_idx]
-            for col_idx, col_name in enumerate(self.results_df.columns):
-                item = QTableWidgetItem(str(row[col_name]))
-                
-                # Highlight suspicious messages
-                if col_name == 'is_suspicious' and row[col_name]:
-                    item.setBackground(QColor(255, 200, 200))  # Light red
-                
-                raw_table.setItem(row_idx, col_idx, item)
+        self.raw_table.resizeColumnsToContents()
+    
+    def update_conversation_tab(self):
+        # Windows are computed for the whole export at once; exports without timestamps have none
+        try:
+            self.windows = score_windows(self.results_df, CONVERSATION_WINDOW_MINUTES)
+        except ValueError:
+            self.windows = None
+        if self.windows is None:
+            self.top_windows = None
+            self.conversation_label.setText("Conversation windows need message timestamps.")
+            self.window_table.setModel(None)
+            self.window_messages_table.setModel(None)
+            return
         
-        # Resize columns to content
-        raw_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.top_windows = top_windows(self.windows, CONVERSATION_TOP_WINDOWS, CONVERSATION_WINDOW_MINUTES)
+        self.conversation_label.setText(
+            f"Highest-risk {CONVERSATION_WINDOW_MINUTES}-minute windows across "
+            f"{self.windows['thread'].nunique()} conversations. Select one to see its messages.")
+        model = ResultsTableModel(
+            self.top_windows,
+            columns=['thread', 'window_start', 'timestamp', 'messages', 'signal_kinds', 'risk'],
+            headers=['Conversation', 'From', 'To', 'Messages', 'Signal Kinds', 'Risk'],
+            parent=self.window_table
+        )
+        old_model = self.window_table.model()
+        self.window_table.setModel(model)
+        if old_model is not None:
+            old_model.deleteLater()
+        self.window_messages_table.setModel(None)
+        self.window_table.resizeColumnsToContents()
+    
+    def show_window_messages(self, index):
+        if self.top_windows is None or not index.isValid():
+            return
+        
+        # Rows of the top-window table are labelled by their position in self.windows
+        position = self.window_table.model().row_position(index.row())
+        rows = window_rows(self.windows, self.top_windows.index[position])
+        columns = [col for col in ('timestamp', 'sender', 'receiver', 'message', 'suspicion_score')
+                   if col in self.results_df.columns]
+        model = ResultsTableModel(self.results_df, columns=columns, rows=rows,
+                                  row_color=('is_suspicious', QColor(255, 200, 200)),
+                                  parent=self.window_messages_table)
+        old_model = self.window_messages_table.model()
+        self.window_messages_table.setModel(model)
+        if old_model is not None:
+            old_model.deleteLater()
+        self.window_messages_table.resizeColumnsToContents()
+    
+    def run_search(self):
+        if self.search_index is None:
+            return
+        
+        started = time.monotonic()
+        try:
+            rows = self.search_index.search(self.search_edit.text(), self.results_df)
+        except ValueError as e:
+            self.search_label.setText(str(e))
+            return
+        elapsed = time.monotonic() - started
+        
+        columns = [col for col in ('timestamp', 'sender', 'receiver', 'message', 'suspicion_score')
+                   if col in self.results_df.columns]
+        model = ResultsTableModel(self.results_df, columns=columns, rows=rows,
+                                  row_color=('is_suspicious', QColor(255, 200, 200)),
+                                  parent=self.search_table)
+        old_model = self.search_table.model()
+        self.search_table.setModel(model)
+        if old_model is not None:
+            old_model.deleteLater()
+        self.search_table.resizeColumnsToContents()
+        self.search_label.setText(f"{len(rows)} matching messages ({elapsed * 1000:.0f} ms)")
+    
+    def apply_raw_filter(self):
+        model = self.raw_table.model()
+        if model is None:
+            return
+        
+        required = 'is_suspicious' if self.suspicious_only_check.isChecked() else None
+        model.set_filter(self.raw_filter_edit.text(), required)
+        self.raw_count_label.setText(f"{model.visible_rows()} of {model.total_rows} rows")
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,292 @@
+"""Message scoring and detection without any GUI or plotting dependencies.
+
+Everything here imports only the standard library and numpy, so batch
+workers and scoring subprocesses can score messages without paying for
+PyQt5, matplotlib or pandas at startup. The frame helpers work on the
+DataFrames they are given; standardize_columns imports pandas (through
+timestamps.py) on first use.
+"""
+import re
+
+import numpy as np
+
+from drug_scorer import build_matcher
+from instrumentation import stage
+from score_cache import DEFAULT_MAXSIZE, ScoreCache, fingerprint
+
+# Drug-related keywords
+DRUG_KEYWORDS = [
+    'weed', 'marijuana', 'cocaine', 'heroin', 'ecstasy', 'mdma', 'lsd', 'acid',
+    'speed', 'meth', 'crystal', 'amphetamine', 'opioid', 'oxy', 'xanax', 'valium',
+    'prescription', 'pills', 'dealer', 'score', 'hook up', 'bag', 'ounce', 'gram',
+    '8ball', 'pot', 'dope', 'smoke', 'joint', 'blunt', 'bong', 'pipe'
+]
+
+# Pattern table for the fused detector: (regex, suspicion score, flags set,
+# literals one of which must appear for the regex to match; None = a digit)
+DETECTOR_PATTERNS = [
+    # Suspicion patterns
+    (r'\$\d+', 3, ('has_transaction',), ('$',)),  # Money references
+    (r'\b\d+\s*(?:g|mg|oz|gram|ounce)\b', 4, (), None),  # Quantity references
+    (r'\bmeet\b.*\b(?:later|tonight|tomorrow)\b', 3, (), ('meet',)),  # Meeting arrangements
+    (r'\b(?:text|call|pm|dm)\b', 2, (), ('text', 'call', 'pm', 'dm')),  # Private communication
+    # Transactions
+    (r'\d+\s*(?:dollars|bucks)', 0, ('has_transaction',), ('dollars', 'bucks')),
+    (r'pay\s*(?:you|me)', 0, ('has_transaction',), ('pay',)),
+    (r'venmo', 0, ('has_transaction',), ('venmo',)),
+    (r'cash\s*app', 0, ('has_transaction',), ('cash',)),
+    (r'zelle', 0, ('has_transaction',), ('zelle',)),
+    (r'wire\s*transfer', 0, ('has_transaction',), ('wire',)),
+    (r'bitcoin', 0, ('has_transaction',), ('bitcoin',)),
+    (r'crypto', 0, ('has_transaction',), ('crypto',)),
+    (r'payment', 0, ('has_transaction',), ('payment',)),
+    (r'send\s*money', 0, ('has_transaction',), ('send',)),
+    # Locations (place names must start with a capital in the original text)
+    (r'\b(?:at|in|to|from|near)\s+(?-i:[A-Z][a-z]+)', 0, ('has_location',),
+     ('at', 'in', 'to', 'from', 'near')),
+    (r'\b(?:street|ave|avenue|road|rd|boulevard|blvd)\b', 0, ('has_location',),
+     ('street', 'ave', 'road', 'rd', 'boulevard', 'blvd')),
+    (r'\b(?:park|mall|plaza|center|store|shop)\b', 0, ('has_location',),
+     ('park', 'mall', 'plaza', 'center', 'store', 'shop')),
+    (r'\d+\s*(?:miles|blocks|minutes)\b', 0, ('has_location',), ('miles', 'blocks', 'minutes')),
+    # Personal information
+    (r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b', 0, ('has_personal_info',), None),  # Phone numbers
+    (r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', 0, ('has_personal_info',), ('@',)),  # Email addresses
+    (r'\b\d{4}\s?\d{4}\s?\d{4}\s?\d{4}\b', 0, ('has_personal_info',), None),  # Credit card numbers
+    (r'\b\d{3}-\d{2}-\d{4}\b', 0, ('has_personal_info',), None),  # SSN
+    (r'\b(?:birth|born|age|dob)\b.*\b(?:\d{1,2}[/-]\d{1,2}[/-]\d{2,4})\b', 0, ('has_personal_info',),
+     ('birth', 'born', 'age', 'dob')),  # Birth dates
+]
+
+FLAG_COLUMNS = ['has_transaction', 'has_location', 'has_personal_info']
+
+# Messages scoring at least this much are flagged as suspicious
+SUSPICION_THRESHOLD = 5
+
+# Scores are capped at 10, so one byte per row holds them
+SCORE_DTYPE = np.int8
+
+_COMPILED_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern, _, _, _ in DETECTOR_PATTERNS]
+_DIGIT_PATTERNS = [i for i, (_, _, _, literals) in enumerate(DETECTOR_PATTERNS) if literals is None]
+_TRIGGERS = {f'pattern:{i}': i for i in range(len(DETECTOR_PATTERNS))}
+_HAS_DIGIT = re.compile(r'\d').search
+
+# One automaton over the GA lexicons, the keywords above and the detector
+# literals, built at import so each message is traversed once
+KEYWORD_MATCHER = build_matcher(
+    DRUG_KEYWORDS,
+    extra=[(literal, f'pattern:{i}')
+           for i, (_, _, _, literals) in enumerate(DETECTOR_PATTERNS)
+           for literal in literals or ()])
+
+
+def scan_message(message):
+    """Score a message and detect all flags in a single pass.
+
+    The keyword automaton finds the drug keywords and the literals each
+    detector pattern needs; only patterns whose literals were seen are
+    confirmed with their regex.
+
+    Returns (suspicion_score, has_transaction, has_location, has_personal_info).
+    """
+    if not isinstance(message, str):
+        return 0, False, False, False
+    return scan_hits(message, KEYWORD_MATCHER.scan(message.lower()))
+
+
+def scan_hits(message, hits):
+    """scan_message for a message whose lower-cased text KEYWORD_MATCHER already scanned"""
+    # Check for drug-related keywords (each distinct keyword counts once)
+    score = 5 * sum(1 for feature in hits if feature.startswith('keyword:'))
+    
+    # Check for common patterns
+    candidates = {_TRIGGERS[feature] for feature in hits if feature in _TRIGGERS}
+    if _HAS_DIGIT(message):
+        candidates.update(_DIGIT_PATTERNS)
+    flags = set()
+    for index in sorted(candidates):
+        _, pattern_score, pattern_flags, _ = DETECTOR_PATTERNS[index]
+        if not pattern_score and flags.issuperset(pattern_flags):
+            continue
+        if _COMPILED_PATTERNS[index].search(message):
+            score += pattern_score
+            flags.update(pattern_flags)
+    
+    return (min(score, 10),  # Cap at 10
+            'has_transaction' in flags, 'has_location' in flags, 'has_personal_info' in flags)
+
+
+# Changes whenever the keywords or detector patterns change; keys cached scans
+SCORER_VERSION = fingerprint(DRUG_KEYWORDS, DETECTOR_PATTERNS)
+
+
+def make_score_cache(path=None, maxsize=DEFAULT_MAXSIZE):
+    """Cache of scan_message results; path adds a persistent SQLite store"""
+    return ScoreCache(lambda messages: [scan_message(m) for m in messages], SCORER_VERSION, maxsize, path)
+
+
+def scan_columns(results):
+    """Split scan_message tuples into one numpy array per result column"""
+    columns = ['suspicion_score'] + FLAG_COLUMNS
+    values = zip(*results) if len(results) else [()] * len(columns)
+    return {col: np.array(v, dtype=SCORE_DTYPE if col == 'suspicion_score' else bool)
+            for col, v in zip(columns, values)}
+
+
+def scan_messages(messages, cache=None):
+    """Scan a column of messages, returning one numpy array per result column.
+    
+    With a cache from make_score_cache, each distinct message is scanned once.
+    """
+    if cache is not None:
+        return scan_columns(cache.map(messages))
+    return scan_columns([scan_message(message) for message in messages])
+
+
+def score_message(message):
+    """Score message based on drug-related keywords and patterns"""
+    return scan_message(message)[0]
+
+
+def is_drug(message):
+    """Determine if message is likely drug-related"""
+    return score_message(message) >= SUSPICION_THRESHOLD
+
+
+def detect_transaction(text):
+    """Detect potential transactions in text"""
+    return scan_message(text)[1]
+
+
+def detect_location(text):
+    """Detect potential locations in text"""
+    return scan_message(text)[2]
+
+
+def detect_personal_info(text):
+    """Detect potential personal information in text"""
+    return scan_message(text)[3]
+
+
+def score_frame(df, cache=None, metrics=None, scorers=None):
+    """Return a copy of a standardized frame with the score and flag columns added.
+
+    The copy shares the input columns; only the added columns are new.
+    scorers names registered scorers (see scorers.py) to run on one shared
+    featurization, each adding its own columns; a cache must then come from
+    scorers.make_scorers_cache for the same names.
+    """
+    results_df = df.copy(deep=False)
+    messages = results_df['message'].astype(str)
+    before = cache.stats() if cache is not None and metrics is not None else None
+    if scorers is not None:
+        # scorers imports this module, so it is only imported here
+        from scorers import score_messages
+        with stage(metrics, 'score', len(results_df)):
+            scored = score_messages(messages, scorers, cache=cache, metrics=metrics)
+    else:
+        with stage(metrics, 'score', len(results_df)):
+            scored = scan_messages(messages, cache=cache)
+        scored['is_suspicious'] = scored['suspicion_score'] >= SUSPICION_THRESHOLD
+    if before is not None:
+        metrics.count_cache(before, cache.stats())
+    for col in ['suspicion_score', 'is_suspicious'] + FLAG_COLUMNS:
+        if col in scored:
+            results_df[col] = scored.pop(col)
+    for col, values in scored.items():
+        results_df[col] = values
+    return results_df
+
+
+def detect_platform(columns):
+    """Guess the export platform from a file's column names"""
+    columns = {str(col).lower() for col in columns}
+    
+    # Check for WhatsApp-specific columns
+    whatsapp_indicators = {'from', 'to', 'time (utc)', 'time (local)', 'message'}
+    if whatsapp_indicators.issubset(columns):
+        return "WhatsApp"
+        
+    # Check for Facebook-specific columns
+    facebook_indicators = {'sender_name', 'timestamp_ms', 'content'}
+    if facebook_indicators.issubset(columns):
+        return "Facebook"
+        
+    # Check for partial matches
+    if 'from' in columns and 'message' in columns:
+        return "WhatsApp"
+    elif 'sender_name' in columns and 'content' in columns:
+        return "Facebook"
+            
+    return "Unknown"
+
+
+def standardize_columns(df, platform, metrics=None):
+    """Rename platform-specific columns to sender/receiver/message/timestamp in place.
+
+    Timestamps are parsed once into an int64 'epoch_ms' column (see
+    timestamps.py); 'timestamp' is its datetime64 view.
+    """
+    from timestamps import as_datetime64, parse_timestamps
+
+    column_map = {}
+    
+    # Export headers vary in case, so look columns up by their lower-cased name
+    columns = {col.lower(): col for col in df.columns}
+    
+    if platform == "WhatsApp":
+        # Map WhatsApp columns to standard names
+        if 'from' in columns:
+            column_map[columns['from']] = 'sender'
+        if 'to' in columns:
+            column_map[columns['to']] = 'receiver'
+        if 'message' in columns:
+            column_map[columns['message']] = 'message'
+        elif 'content' in columns:
+            column_map[columns['content']] = 'message'
+            
+        # Handle timestamp columns
+        if 'time (local)' in columns:
+            column_map[columns['time (local)']] = 'timestamp'
+        elif 'timestamp' in columns:
+            column_map[columns['timestamp']] = 'timestamp'
+        elif 'date' in columns:
+            column_map[columns['date']] = 'timestamp'
+            
+    elif platform == "Facebook":
+        # Map Facebook columns to standard names
+        if 'sender_name' in columns:
+            column_map[columns['sender_name']] = 'sender'
+        if 'content' in columns:
+            column_map[columns['content']] = 'message'
+        elif 'message' in columns:
+            column_map[columns['message']] = 'message'
+            
+        # Handle timestamp columns
+        if 'timestamp_ms' in columns:
+            # Facebook timestamps are already epoch milliseconds
+            df['timestamp'] = df[columns['timestamp_ms']]
+            # Don't need to map this as we're creating a new column
+        elif 'timestamp' in columns:
+            column_map[columns['timestamp']] = 'timestamp'
+        elif 'date' in columns:
+            column_map[columns['date']] = 'timestamp'
+    
+    # The export's own column name keys the cached timestamp format
+    timestamp_source = next((src for src, dst in column_map.items() if dst == 'timestamp'), 'timestamp')
+
+    # Rename columns
+    df.rename(columns=column_map, inplace=True)
+    
+    # Ensure we have required columns
+    required = ['sender', 'message']
+    for col in required:
+        if col not in df.columns:
+            raise ValueError(f"Required column '{col}' not found in data")
+    
+    # Parse timestamps once; downstream code uses the epoch column
+    if 'timestamp' in df.columns:
+        with stage(metrics, 'parse_timestamps', len(df)):
+            df['epoch_ms'] = parse_timestamps(df['timestamp'], name=timestamp_source, metrics=metrics)
+            df['timestamp'] = as_datetime64(df['epoch_ms'].to_numpy())
+    return df
@@ -0,0 +1,272 @@
+"""Streaming analysis for chat exports too large to load in one piece.
+
+The export (CSV, Facebook JSON or WhatsApp .txt) is read in chunks; each chunk is standardized and scored, written
+straight to the output file, and folded into running aggregates. Only the
+aggregates and the top-N most suspicious rows stay in memory, so memory use
+does not grow with the size of the export.
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from chat_core import (FLAG_COLUMNS, SCORER_VERSION, detect_platform, make_score_cache, score_frame,
+                       standardize_columns)
+from export_readers import read_export
+from instrumentation import PipelineMetrics, StackSampler, stage
+from parallel_scoring import parallel_score_frame
+from results_store import ResultsStore, ResultsWriter, is_store_path
+from scorers import check_analysis_scorers, make_scorers_cache, parse_scorers, scorers_version
+from timestamps import EPOCH_MISSING, epoch_days
+
+DEFAULT_CHUNK_SIZE = 100000
+DEFAULT_TOP_N = 1000
+
+# Per-sender counters kept while streaming; the mean score is derived at the end
+SENDER_COLUMNS = ['messages', 'score_sum', 'is_suspicious'] + FLAG_COLUMNS
+
+
+def chunk_epoch_ms(chunk):
+    """Epoch milliseconds of a scored chunk, or None without timestamps.
+
+    Stores written before the epoch column existed only have 'timestamp'.
+    """
+    if 'epoch_ms' in chunk.columns:
+        return chunk['epoch_ms'].to_numpy(dtype=np.int64)
+    if 'timestamp' in chunk.columns and pd.api.types.is_datetime64_any_dtype(chunk['timestamp']):
+        return chunk['timestamp'].to_numpy().astype('datetime64[ms]').view(np.int64)
+    return None
+
+
+def _day_counts(days):
+    """Messages per day, indexed by datetime64 dates"""
+    values, counts = np.unique(days, return_counts=True)
+    return pd.Series(counts, index=pd.DatetimeIndex(values.astype('datetime64[D]')), dtype='int64')
+
+
+class StreamingAnalysis:
+    """Running aggregates and top-N rows for a chat export scored chunk by chunk"""
+
+    def __init__(self, top_n=DEFAULT_TOP_N):
+        self.top_n = top_n
+        self.platform = None
+        self.total_messages = 0
+        self.flag_counts = dict.fromkeys(['is_suspicious'] + FLAG_COLUMNS, 0)
+        # Heuristic scores are capped integers 0..10
+        self.score_counts = np.zeros(11, dtype=np.int64)
+        self.sender_totals = pd.DataFrame(columns=SENDER_COLUMNS, dtype='float64')
+        self.daily_counts = pd.Series(dtype='int64')
+        self.daily_suspicious = pd.Series(dtype='int64')
+        self.top_rows = None
+
+    def update(self, chunk):
+        """Fold one scored chunk into the aggregates"""
+        self.total_messages += len(chunk)
+        for col in self.flag_counts:
+            self.flag_counts[col] += int(chunk[col].sum())
+        self.score_counts += np.bincount(chunk['suspicion_score'].to_numpy(dtype=np.int64),
+                                         minlength=len(self.score_counts))
+
+        # Per-sender counters
+        grouped = chunk.assign(messages=1, score_sum=chunk['suspicion_score']).groupby('sender', observed=True)
+        self.sender_totals = self.sender_totals.add(grouped[SENDER_COLUMNS].sum(), fill_value=0)
+
+        # Daily activity
+        epoch = chunk_epoch_ms(chunk)
+        if epoch is not None:
+            days = epoch_days(epoch)
+            known = days != EPOCH_MISSING
+            self.daily_counts = self.daily_counts.add(_day_counts(days[known]), fill_value=0).astype('int64')
+            suspicious = known & chunk['is_suspicious'].to_numpy(dtype=bool)
+            self.daily_suspicious = self.daily_suspicious.add(
+                _day_counts(days[suspicious]), fill_value=0).astype('int64')
+
+        # Keep only the most suspicious rows seen so far
+        top = chunk.nlargest(self.top_n, 'suspicion_score')
+        if self.top_rows is not None:
+            top = pd.concat([self.top_rows, top]).nlargest(self.top_n, 'suspicion_score')
+        self.top_rows = top
+
+    def sender_stats(self):
+        """Per-sender aggregates, most suspicious senders first"""
+        stats = self.sender_totals.copy()
+        stats['suspicion_score'] = stats['score_sum'] / stats['messages']
+        stats = stats.drop(columns='score_sum').astype({col: 'int64' for col in SENDER_COLUMNS if col != 'score_sum'})
+        return stats.sort_values('suspicion_score', ascending=False)
+
+    def summary(self):
+        """JSON-serializable overview of the analysis"""
+        return {
+            'platform': self.platform,
+            'total_messages': self.total_messages,
+            'suspicious_messages': self.flag_counts['is_suspicious'],
+            'transaction_messages': self.flag_counts['has_transaction'],
+            'location_messages': self.flag_counts['has_location'],
+            'personal_info_messages': self.flag_counts['has_personal_info'],
+            'score_histogram': self.score_counts.tolist(),
+            'senders': len(self.sender_totals),
+        }
+
+
+def stream_analyze(file_path, output_path=None, platform=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                   top_n=DEFAULT_TOP_N, encoding='ISO-8859-1', workers=None, cache=None, state=None,
+                   metrics=None, graph=None, scorers=None):
+    """Score an export chunk by chunk, streaming scored rows to output_path.
+
+    file_path is a CSV export, a Facebook message_N.json file or thread
+    directory, or a WhatsApp .txt export (see export_readers).
+
+    platform is "WhatsApp" or "Facebook"; it is detected from the header when
+    not given. With workers > 1 each chunk is split across that many
+    processes. scorers names the registered scorers (see scorers.py) to run
+    on one shared featurization instead of the heuristic alone. A cache
+    from chat_core.make_score_cache (scorers.make_scorers_cache with
+    scorers) skips messages scored before. With a case_state.CaseState only rows missing from it are
+    scored and appended to output_path, and its aggregates are extended.
+    An output_path ending in .results is written as a columnar results store
+    instead of CSV. An instrumentation.PipelineMetrics records the time of
+    every step, and a contact_graph.ContactGraph gets the edges of every
+    chunk. Returns the StreamingAnalysis with the aggregates and top rows.
+    """
+    if scorers is not None:
+        check_analysis_scorers(scorers)
+    analysis = state.analysis if state is not None else StreamingAnalysis(top_n=top_n)
+    chunks = read_export(file_path, chunk_size, encoding=encoding)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers and workers > 1 else None
+    # Earlier incremental runs already wrote the header and history rows
+    first_chunk = not (state is not None and analysis.total_messages and output_path is not None
+                       and os.path.exists(output_path))
+    writer = None
+    if output_path is not None and is_store_path(output_path):
+        writer = ResultsWriter(output_path, append=not first_chunk)
+    try:
+        while True:
+            with stage(metrics, 'read_export') as step:
+                chunk = next(chunks, None)
+                step.add_rows(0 if chunk is None else len(chunk))
+            if chunk is None:
+                break
+            if analysis.platform is None:
+                analysis.platform = platform or detect_platform(chunk.columns)
+            with stage(metrics, 'standardize_columns', len(chunk)):
+                standardize_columns(chunk, analysis.platform, metrics=metrics)
+            if state is not None:
+                with stage(metrics, 'skip_known_rows', len(chunk)):
+                    chunk = chunk[state.new_rows(chunk)]
+                if chunk.empty:
+                    continue
+            if executor is None:
+                scored = score_frame(chunk, cache=cache, metrics=metrics, scorers=scorers)
+            else:
+                before = cache.stats() if cache is not None and metrics is not None else None
+                with stage(metrics, 'score', len(chunk)):
+                    scored = parallel_score_frame(chunk, chunk_size=-(-len(chunk) // workers),
+                                                  executor=executor, cache=cache, scorers=scorers)
+                if before is not None:
+                    metrics.count_cache(before, cache.stats())
+            with stage(metrics, 'write_output', len(scored)):
+                if writer is not None:
+                    writer.write(scored)
+                elif output_path is not None:
+                    scored.to_csv(output_path, mode='w' if first_chunk else 'a', header=first_chunk, index=False)
+            first_chunk = False
+            with stage(metrics, 'aggregate', len(scored)):
+                if state is not None:
+                    state.update(scored)
+                else:
+                    analysis.update(scored)
+                if graph is not None:
+                    graph.update(scored)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if writer is not None:
+            writer.attrs['platform'] = analysis.platform
+            writer.close()
+    return analysis
+
+
+def summarize_store(path, top_n=DEFAULT_TOP_N):
+    """Aggregates and top rows of an already scored results store.
+
+    The aggregates are computed from the memory-mapped score, flag, sender
+    and timestamp columns; text heaps only decode the blocks holding the top rows.
+    """
+    store = ResultsStore(path)
+    analysis = StreamingAnalysis(top_n=top_n)
+    analysis.platform = store.attrs.get('platform')
+    # sender is needed for the aggregates even when it had too many values for a dictionary
+    heap_columns = [col for col in store.columns if store.encoding(col) == 'heap' and col != 'sender']
+    analysis.update(store.read([col for col in store.columns if col not in heap_columns]))
+    if analysis.top_rows is not None:
+        # Row labels of the store frame are row positions
+        for col in heap_columns:
+            analysis.top_rows[col] = store.column(col, analysis.top_rows.index.to_numpy())
+        analysis.top_rows = analysis.top_rows[store.columns]
+    return analysis
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream-score a large chat export")
+    parser.add_argument('input', help="CSV export, Facebook JSON file or thread directory, or WhatsApp .txt")
+    parser.add_argument('-o', '--output', help="CSV file or .results store to write scored rows to")
+    parser.add_argument('--platform', choices=['WhatsApp', 'Facebook'], help="Skip auto detection")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk")
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP_N, help="Most suspicious rows to report")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="Processes scoring each chunk")
+    parser.add_argument('--scorers',
+                        help="Comma-separated scorers, each adding its own columns (e.g. heuristic,ga)")
+    parser.add_argument('--cache', help="SQLite file reusing scores across runs")
+    parser.add_argument('--state', help="Case state file; only rows not scored in earlier runs are scored")
+    parser.add_argument('--graph', help="Contact graph file to add this export's sender/receiver edges to")
+    parser.add_argument('--search-index', action='store_true',
+                        help="Build the full-text search index of a .results output after scoring")
+    parser.add_argument('--metrics', help="JSON file for per-stage timings and a trace of the run")
+    parser.add_argument('--profile', action='store_true', help="Add sampled call stacks to the metrics file")
+    args = parser.parse_args()
+    if args.profile and not args.metrics:
+        parser.error("--profile needs --metrics")
+    if args.search_index and not (args.output and is_store_path(args.output)):
+        parser.error("--search-index needs a .results output")
+    if args.scorers:
+        try:
+            args.scorers = parse_scorers(args.scorers)
+        except ValueError as e:
+            parser.error(str(e))
+
+    # case_state imports this module, so it is only needed when run as a script
+    from case_state import CaseState
+    from contact_graph import ContactGraph
+    metrics = PipelineMetrics(sampler=StackSampler() if args.profile else None) if args.metrics else None
+    if args.cache:
+        cache = make_scorers_cache(args.scorers, args.cache) if args.scorers else make_score_cache(args.cache)
+    else:
+        cache = None
+    version = scorers_version(args.scorers) if args.scorers else SCORER_VERSION
+    state = CaseState.load(args.state, top_n=args.top, version=version) if args.state else None
+    graph = ContactGraph.load(args.graph) if args.graph else None
+    scored_before = state.analysis.total_messages if state is not None else 0
+    result = stream_analyze(args.input, args.output, platform=args.platform, chunk_size=args.chunk_size,
+                            top_n=args.top, workers=args.jobs, cache=cache, state=state,
+                            metrics=metrics, graph=graph, scorers=args.scorers)
+    summary = result.summary()
+    if state is not None:
+        state.save(args.state)
+        summary['new_messages'] = result.total_messages - scored_before
+    if args.search_index:
+        from search_index import SearchIndex
+        with stage(metrics, 'search_index', result.total_messages):
+            # Incremental runs append to the store, so the index covers every row in it
+            SearchIndex.build(ResultsStore(args.output).column('message')).save(args.output)
+    if graph is not None:
+        graph.save(args.graph)
+        summary['graph'] = {'contacts': len(graph), 'edges': graph.num_edges}
+    if cache is not None:
+        summary['cache'] = cache.stats()
+        cache.close()
+    if metrics is not None:
+        metrics.write(args.metrics)
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,361 @@
+"""Contact graph of who messaged whom, with per-edge counts and suspicion.
+
+Every scored row with a sender and a receiver adds to the directed edge
+between them: the number of messages, their summed suspicion score and how
+many were suspicious. WhatsApp JIDs (``123@s.whatsapp.net``) and bare
+numbers are the same contact. Chunks are aggregated as they arrive and
+merged with the existing edges only when the graph is queried or saved, so
+merging a new export costs time proportional to the export, not the graph.
+
+Edges are kept sorted by (sender, receiver), which makes them a CSR
+adjacency structure: the out-edges of node i are the slice
+indptr[i]:indptr[i + 1]. Neighborhood, degree, centrality and cluster
+queries work on an undirected CSR built from it once per change, with
+vectorized numpy passes over whole frontiers or edge arrays.
+
+    python contact_graph.py case.graph --add scored.results other_export.csv
+    python contact_graph.py case.graph --hops "Ali" 2 --central 20 --clusters 10
+"""
+import argparse
+import os
+import pickle
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Edge weights summed per (sender, receiver) pair
+EDGE_COLUMNS = ['messages', 'score_sum', 'suspicious']
+
+_JID_SUFFIX = re.compile(r'@(?:s\.whatsapp\.net|c\.us)$')
+
+
+def contact_names(values):
+    """Normalized contact name of each value: text, stripped, without a WhatsApp JID suffix"""
+    return [_JID_SUFFIX.sub('', str(value).strip()) for value in values]
+
+
+def csr_indptr(rows, n):
+    """indptr of a CSR structure over rows sorted ascending"""
+    return np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=n))])
+
+
+def csr_slots(indptr, nodes):
+    """All CSR neighbor slots of nodes, concatenated without a Python loop"""
+    starts, lengths = indptr[nodes], indptr[nodes + 1] - indptr[nodes]
+    total = int(lengths.sum())
+    if not total:
+        return np.zeros(0, dtype=np.int64)
+    # Position within each node's slice, added to that slice's start
+    offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + offsets
+
+
+class ContactGraph:
+    """Directed message graph between contacts, updated chunk by chunk"""
+
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+        # Edges sorted by (src, dst); weights aligned with them
+        self.src = np.zeros(0, dtype=np.int32)
+        self.dst = np.zeros(0, dtype=np.int32)
+        self.weights = {col: np.zeros(0, dtype=np.int64) for col in EDGE_COLUMNS}
+        # Chunk edges added since the last merge
+        self._pending = []
+        # Undirected CSR and centrality results, dropped whenever edges change
+        self._undirected = None
+        self._centrality = {}
+
+    def _changed(self):
+        self._undirected = None
+        self._centrality = {}
+
+    @classmethod
+    def load(cls, path):
+        """Read a saved graph; a missing file starts an empty one"""
+        graph = cls()
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                saved = pickle.load(f)
+            graph.names = saved['names']
+            graph.ids = {name: i for i, name in enumerate(graph.names)}
+            graph.src, graph.dst, graph.weights = saved['src'], saved['dst'], saved['weights']
+        return graph
+
+    def save(self, path):
+        """Write the graph atomically, so an interrupted save keeps the old one"""
+        self._merge()
+        # Plain arrays rather than the object, so the file loads whether this
+        # module was imported or run as a script
+        saved = {'names': self.names, 'src': self.src, 'dst': self.dst, 'weights': self.weights}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(saved, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def num_edges(self):
+        self._merge()
+        return len(self.src)
+
+    # Building
+
+    def _node_ids(self, names):
+        ids = np.empty(len(names), dtype=np.int32)
+        for i, name in enumerate(names):
+            node = self.ids.get(name)
+            if node is None:
+                node = self.ids[name] = len(self.names)
+                self.names.append(name)
+            ids[i] = node
+        return ids
+
+    def update(self, scored):
+        """Add the edges of a scored frame; frames without a receiver add none"""
+        if 'receiver' not in scored.columns or not len(scored):
+            return
+        present = (scored['sender'].notna() & scored['receiver'].notna()).to_numpy()
+        rows = scored[present]
+        # Names are normalized once per distinct value, not per row
+        src_codes, src_values = pd.factorize(rows['sender'])
+        dst_codes, dst_values = pd.factorize(rows['receiver'])
+        src = self._node_ids(contact_names(src_values))[src_codes]
+        dst = self._node_ids(contact_names(dst_values))[dst_codes]
+        keep = src != dst
+        values = {
+            'messages': np.ones(int(keep.sum()), dtype=np.int64),
+            'score_sum': rows['suspicion_score'].to_numpy(dtype=np.int64)[keep],
+            'suspicious': rows['is_suspicious'].to_numpy(dtype=np.int64)[keep],
+        }
+        self._pending.append(self._aggregate(src[keep], dst[keep], values))
+        self._changed()
+
+    def merge(self, other):
+        """Add all edges of another ContactGraph, e.g. one built from a second device"""
+        other._merge()
+        mapping = self._node_ids(other.names)
+        self._pending.append(self._aggregate(mapping[other.src], mapping[other.dst], other.weights))
+        self._changed()
+
+    @staticmethod
+    def _aggregate(src, dst, values):
+        """Sum duplicate (src, dst) pairs; returns sorted src, dst and summed weights"""
+        keys = (src.astype(np.int64) << 32) | dst.astype(np.int64)
+        unique, inverse = np.unique(keys, return_inverse=True)
+        sums = {col: np.bincount(inverse, weights=values[col], minlength=len(unique)).astype(np.int64)
+                for col in EDGE_COLUMNS}
+        return (unique >> 32).astype(np.int32), (unique & 0xFFFFFFFF).astype(np.int32), sums
+
+    def _merge(self):
+        if not self._pending:
+            return
+        parts = [(self.src, self.dst, self.weights)] + self._pending
+        self._pending = []
+        self.src, self.dst, self.weights = self._aggregate(
+            np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts]),
+            {col: np.concatenate([p[2][col] for p in parts]) for col in EDGE_COLUMNS})
+
+    def out_edges(self):
+        """Directed CSR: (indptr, receivers, weights) with out-edges of i at indptr[i]:indptr[i + 1]"""
+        self._merge()
+        return csr_indptr(self.src, len(self)), self.dst, self.weights
+
+    def undirected(self):
+        """Symmetric CSR (indptr, neighbors, weights), both directions of a pair summed"""
+        self._merge()
+        if self._undirected is None:
+            low, high = np.minimum(self.src, self.dst), np.maximum(self.src, self.dst)
+            low, high, sums = self._aggregate(low, high, self.weights)
+            rows, cols = np.concatenate([low, high]), np.concatenate([high, low])
+            order = np.lexsort((cols, rows))
+            self._undirected = (csr_indptr(rows[order], len(self)), cols[order],
+                                {col: np.concatenate([w, w])[order] for col, w in sums.items()})
+        return self._undirected
+
+    # Queries
+
+    def node(self, name):
+        """Node id of a contact name"""
+        node = self.ids.get(contact_names([name])[0])
+        if node is None:
+            raise KeyError(f"Unknown contact {name!r}")
+        return node
+
+    def neighbors(self, name):
+        """Direct contacts of name with the summed weights of both directions, heaviest first"""
+        indptr, cols, weights = self.undirected()
+        node = self.node(name)
+        slots = slice(indptr[node], indptr[node + 1])
+        frame = pd.DataFrame({col: weights[col][slots] for col in EDGE_COLUMNS},
+                             index=pd.Index([self.names[i] for i in cols[slots]], name='contact'))
+        return frame.sort_values(['score_sum', 'messages'], ascending=False)
+
+    def k_hop(self, name, k=2, suspicious_only=False):
+        """Contacts within k hops of name and their distance, nearest first.
+
+        With suspicious_only only edges carrying a suspicious message are
+        followed.
+        """
+        indptr, cols, weights = self.undirected()
+        start = self.node(name)
+        hops = np.full(len(self), -1, dtype=np.int32)
+        hops[start] = 0
+        frontier = np.array([start])
+        for hop in range(1, k + 1):
+            slots = csr_slots(indptr, frontier)
+            if suspicious_only:
+                slots = slots[weights['suspicious'][slots] > 0]
+            reached = np.unique(cols[slots])
+            frontier = reached[hops[reached] < 0]
+            if not len(frontier):
+                break
+            hops[frontier] = hop
+        found = np.flatnonzero(hops > 0)
+        found = found[np.argsort(hops[found], kind='stable')]
+        return pd.DataFrame({'hops': hops[found]}, index=pd.Index([self.names[i] for i in found], name='contact'))
+
+    def degrees(self):
+        """Per-contact degrees and weights, as a DataFrame indexed by contact.
+
+        out/in degree count distinct receivers and senders, neighbors the
+        distinct contacts in either direction; the weight columns sum both
+        directions.
+        """
+        self._merge()
+        n = len(self)
+        indptr, _, weights = self.undirected()
+        frame = pd.DataFrame({
+            'out_degree': np.bincount(self.src, minlength=n),
+            'in_degree': np.bincount(self.dst, minlength=n),
+            'neighbors': np.diff(indptr),
+        }, index=pd.Index(self.names, name='contact'))
+        rows = np.repeat(np.arange(n), np.diff(indptr))
+        for col in EDGE_COLUMNS:
+            frame[col] = np.bincount(rows, weights=weights[col], minlength=n).astype(np.int64)
+        return frame
+
+    def centrality(self, weight='score_sum', damping=0.85, iterations=100, tol=1e-8):
+        """Weighted PageRank over the undirected graph, highest first.
+
+        Rank flows along edges in proportion to weight, so with the default
+        score_sum contacts at the center of suspicious traffic rank highest.
+        The result is kept until the graph changes.
+        """
+        key = (weight, damping, iterations, tol)
+        if key not in self._centrality:
+            self._centrality[key] = self._pagerank(weight, damping, iterations, tol)
+        return self._centrality[key]
+
+    def _pagerank(self, weight, damping, iterations, tol):
+        n = len(self)
+        if not n:
+            return pd.Series(dtype='float64', name='centrality')
+        indptr, cols, weights = self.undirected()
+        rows = np.repeat(np.arange(n), np.diff(indptr))
+        edge_weight = weights[weight].astype(np.float64)
+        strength = np.bincount(rows, weights=edge_weight, minlength=n)
+        share = np.divide(edge_weight, strength[rows], out=np.zeros_like(edge_weight), where=strength[rows] > 0)
+        dangling = strength == 0
+        rank = np.full(n, 1.0 / n)
+        for _ in range(iterations):
+            spread = np.bincount(cols, weights=rank[rows] * share, minlength=n)
+            new = (1 - damping) / n + damping * (spread + rank[dangling].sum() / n)
+            done = np.abs(new - rank).sum() < tol
+            rank = new
+            if done:
+                break
+        return pd.Series(rank, index=pd.Index(self.names, name='contact'), name='centrality').sort_values(
+            ascending=False)
+
+    def components(self, min_suspicious=1):
+        """Component label per node over edges with at least min_suspicious suspicious messages.
+
+        Labels are found by repeated min-label propagation with pointer
+        jumping; nodes without such edges keep their own id.
+        """
+        indptr, cols, weights = self.undirected()
+        rows = np.repeat(np.arange(len(self)), np.diff(indptr))
+        keep = weights['suspicious'] >= min_suspicious
+        u, v = rows[keep], cols[keep]
+        labels = np.arange(len(self))
+        while True:
+            new = labels.copy()
+            np.minimum.at(new, u, labels[v])
+            np.minimum.at(new, v, labels[u])
+            while True:
+                jumped = new[new]
+                if np.array_equal(jumped, new):
+                    break
+                new = jumped
+            if np.array_equal(new, labels):
+                return labels
+            labels = new
+
+    def suspicious_clusters(self, top_n=10, min_size=3, min_suspicious=1):
+        """Connected groups joined by suspicious messages, densest in suspicion first.
+
+        score_density is the summed suspicion score inside the group per
+        member; density is the share of member pairs that have an edge.
+        """
+        columns = ['size', 'edges', 'density', 'messages', 'score_sum', 'score_density', 'members']
+        labels = self.components(min_suspicious)
+        indptr, cols, weights = self.undirected()
+        rows = np.repeat(np.arange(len(self)), np.diff(indptr))
+        # Each undirected edge is stored twice; count it once, inside its component
+        inside = (rows < cols) & (labels[rows] == labels[cols]) & (weights['suspicious'] >= min_suspicious)
+        sizes = np.bincount(labels, minlength=len(self))
+        groups = np.flatnonzero(sizes >= min_size)
+        if not len(groups):
+            return pd.DataFrame(columns=columns)
+        edge_labels = labels[rows[inside]]
+        stats = pd.DataFrame({'size': sizes[groups],
+                              'edges': np.bincount(edge_labels, minlength=len(self))[groups]}, index=groups)
+        for col in ('messages', 'score_sum'):
+            stats[col] = np.bincount(edge_labels, weights=weights[col][inside], minlength=len(self))[groups]
+        stats['density'] = stats['edges'] / (stats['size'] * (stats['size'] - 1) / 2)
+        stats['score_density'] = stats['score_sum'] / stats['size']
+        top = stats.sort_values(['score_density', 'density'], ascending=False).head(top_n)
+        members = {label: [] for label in top.index}
+        for node in np.flatnonzero(np.isin(labels, top.index)):
+            members[labels[node]].append(self.names[node])
+        top['members'] = [members[label] for label in top.index]
+        return top.reset_index(drop=True)[columns]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and query the contact graph of a case")
+    parser.add_argument('graph', help="Graph file; created when missing")
+    parser.add_argument('--add', nargs='+', default=[], metavar='INPUT',
+                        help="Results stores, scored CSVs or raw exports to merge into the graph")
+    parser.add_argument('--hops', nargs=2, metavar=('CONTACT', 'K'), help="Contacts within K hops of CONTACT")
+    parser.add_argument('--suspicious-only', action='store_true', help="Follow only suspicious edges with --hops")
+    parser.add_argument('--degree', metavar='CONTACT', help="Direct contacts of CONTACT")
+    parser.add_argument('--central', type=int, metavar='N', help="N most central contacts by suspicion")
+    parser.add_argument('--clusters', type=int, metavar='N', help="N densest suspicious clusters")
+    args = parser.parse_args(argv)
+
+    graph = ContactGraph.load(args.graph)
+    if args.add:
+        from conversations import load_scored
+        for path in args.add:
+            graph.update(load_scored(path))
+        graph.save(args.graph)
+    print(f"{len(graph)} contacts, {graph.num_edges} edges")
+    if args.hops:
+        print(graph.k_hop(args.hops[0], int(args.hops[1]), args.suspicious_only).to_string())
+    if args.degree:
+        print(graph.neighbors(args.degree).to_string())
+    if args.central:
+        print(graph.centrality().head(args.central).to_string())
+    if args.clusters:
+        print(graph.suspicious_clusters(args.clusters).to_string())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
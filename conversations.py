@@ -0,0 +1,190 @@
+"""Conversation-level scoring over sliding time windows.
+
+Both scorers judge one message at a time, but a deal is usually spread over
+several turns: a price, then "cod", then a meeting time. Here the scored
+rows are grouped into threads (the unordered sender/receiver pair, or the
+whole export when there is no receiver), sorted once by thread and time,
+and every message gets the aggregates of the messages in its thread during
+the window before it.
+
+All windows are computed together. Timestamps are shifted so they increase
+across thread boundaries with a gap wider than the window, after which one
+searchsorted call finds every window start and prefix sums give every
+window total. The cost is the O(n log n) sort, with no Python loop per
+thread or per window.
+
+A window's risk is the sum of its message scores, plus SIGNAL_BONUS for
+each kind of signal it holds (suspicious wording, transactions,
+locations) when it combines at least two kinds.
+
+    python conversations.py scored.results --window 30 --top 50 -o windows.csv
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from chat_stream import chunk_epoch_ms
+from timestamps import EPOCH_MISSING
+
+DEFAULT_WINDOW_MINUTES = 30
+DEFAULT_TOP_N = 50
+
+# Added to a window's risk per signal kind when it combines two or more kinds
+SIGNAL_BONUS = 3
+
+# Per-message features summed over each window: (window column, result column)
+WINDOW_SUMS = [('score_sum', 'suspicion_score'), ('suspicious', 'is_suspicious'),
+               ('transactions', 'has_transaction'), ('locations', 'has_location')]
+
+
+def thread_codes(results_df):
+    """Thread code per row and the thread labels.
+
+    Rows with a receiver belong to the thread of their unordered
+    (sender, receiver) pair, so both directions of a chat are one thread.
+    Without a receiver column every row is in one thread.
+    """
+    n = len(results_df)
+    if 'receiver' not in results_df.columns:
+        return np.zeros(n, dtype=np.int64), ['all messages']
+    both = pd.concat([results_df['sender'].astype(object), results_df['receiver'].astype(object)],
+                     ignore_index=True)
+    people_codes, people = pd.factorize(both, use_na_sentinel=False)
+    sender, receiver = people_codes[:n], people_codes[n:]
+    pairs = np.minimum(sender, receiver) * len(people) + np.maximum(sender, receiver)
+    codes, unique_pairs = pd.factorize(pairs)
+    labels = [f"{people[a]} <-> {people[b]}"
+              for a, b in zip(unique_pairs // len(people), unique_pairs % len(people))]
+    return codes.astype(np.int64), labels
+
+
+def score_windows(results_df, window_minutes=DEFAULT_WINDOW_MINUTES):
+    """Aggregates of the window ending at every message, in thread and time order.
+
+    One row per message with a timestamp: 'row' is its position in
+    results_df and 'start' the position (in this frame) of the first message
+    of its window, so the window's messages are rows start..i here.
+    """
+    window_ms = int(window_minutes * 60000)
+    epoch = chunk_epoch_ms(results_df)
+    if epoch is None:
+        raise ValueError("Conversation windows need a timestamp column")
+    threads, labels = thread_codes(results_df)
+
+    timed = np.flatnonzero(epoch != EPOCH_MISSING)
+    order = timed[np.lexsort((epoch[timed], threads[timed]))]
+    times, thread = epoch[order], threads[order]
+    m = len(order)
+
+    # Shift each thread to start after the previous one ends plus more than a window
+    first = np.ones(m, dtype=bool)
+    first[1:] = thread[1:] != thread[:-1]
+    starts = np.flatnonzero(first)
+    segment = np.cumsum(first) - 1
+    offset = times - times[starts][segment]
+    spans = np.maximum.reduceat(offset, starts) if m else offset
+    bases = np.concatenate([[0], np.cumsum(spans + window_ms + 1)[:-1]])
+    keys = bases[segment] + offset
+    start = np.searchsorted(keys, keys - window_ms, side='left')
+
+    windows = pd.DataFrame({
+        'row': order,
+        'thread': pd.Categorical.from_codes(thread, labels) if m else pd.Categorical([], categories=labels),
+        'window_start': times[start].view('datetime64[ms]'),
+        'timestamp': times.view('datetime64[ms]'),
+        'start': start,
+        'messages': np.arange(m) - start + 1,
+    })
+    for name, col in WINDOW_SUMS:
+        values = results_df[col].to_numpy(dtype=np.int64)[order]
+        totals = np.concatenate([[0], np.cumsum(values)])
+        windows[name] = totals[1:] - totals[start]
+    if 'ga_score' in results_df.columns:
+        ga = np.concatenate([[0.0], np.cumsum(results_df['ga_score'].to_numpy(dtype=np.float64)[order])])
+        windows['ga_mean'] = ((ga[1:] - ga[start]) / windows['messages']).astype(np.float32)
+
+    kinds = ((windows['score_sum'] > 0).astype(np.int8) + (windows['transactions'] > 0)
+             + (windows['locations'] > 0))
+    windows['signal_kinds'] = kinds.astype(np.int8)
+    windows['risk'] = windows['score_sum'] + np.where(kinds >= 2, SIGNAL_BONUS * kinds, 0)
+    return windows
+
+
+def top_windows(windows, top_n=DEFAULT_TOP_N, window_minutes=DEFAULT_WINDOW_MINUTES):
+    """The highest-risk windows, one per thread and window-long stretch of time.
+
+    A burst of messages yields many overlapping windows with similar risk;
+    keeping the best window per thread and time bucket flags it once.
+    """
+    candidates = windows[windows['risk'] > 0]
+    bucket = candidates['timestamp'].to_numpy().view(np.int64) // int(window_minutes * 60000)
+    best = (candidates.assign(_bucket=bucket)
+            .sort_values('risk', ascending=False, kind='stable')
+            .drop_duplicates(['thread', '_bucket'])
+            .drop(columns='_bucket'))
+    return best.head(top_n)
+
+
+def thread_summary(windows):
+    """Per-thread message count, peak risk and its time, riskiest threads first"""
+    if not len(windows):
+        return pd.DataFrame(columns=['messages', 'peak_risk', 'peak_time'])
+    peaks = windows.loc[windows.groupby('thread', observed=True)['risk'].idxmax()]
+    summary = pd.DataFrame({
+        'messages': windows.groupby('thread', observed=True).size(),
+        'peak_risk': peaks.set_index('thread')['risk'],
+        'peak_time': peaks.set_index('thread')['timestamp'],
+    })
+    return summary.sort_values('peak_risk', ascending=False)
+
+
+def thread_timeline(windows, thread):
+    """Risk over time of one thread: the windows ending at each of its messages"""
+    return windows[windows['thread'] == thread][['timestamp', 'messages', 'score_sum', 'signal_kinds', 'risk']]
+
+
+def window_rows(windows, i):
+    """Positions in the scored frame of the messages in the window ending at windows row i"""
+    return windows['row'].to_numpy()[windows['start'].iloc[i]:i + 1]
+
+
+def load_scored(path):
+    """Scored rows from a results store or CSV; raw exports are scored first"""
+    from results_store import ResultsStore, is_store_path
+    if is_store_path(path):
+        return ResultsStore(path).read()
+    from chat_core import detect_platform, score_frame, standardize_columns
+    from export_readers import load_export
+    df = load_export(path)
+    if 'suspicion_score' not in df.columns:
+        return score_frame(standardize_columns(df, detect_platform(df.columns)))
+    if 'timestamp' in df.columns and 'epoch_ms' not in df.columns:
+        df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
+    return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score conversations over sliding time windows")
+    parser.add_argument('input', help="Results store, scored CSV or raw chat export")
+    parser.add_argument('--window', type=float, default=DEFAULT_WINDOW_MINUTES, help="Window length in minutes")
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP_N, help="Highest-risk windows to report")
+    parser.add_argument('-o', '--output', help="CSV file for the top windows")
+    parser.add_argument('--timeline', help="CSV file for the window ending at every message")
+    args = parser.parse_args(argv)
+
+    results = load_scored(args.input)
+    windows = score_windows(results, args.window)
+    top = top_windows(windows, args.top, args.window)
+    if args.output:
+        top.to_csv(args.output, index=False)
+    if args.timeline:
+        windows.to_csv(args.timeline, index=False)
+    print(f"{len(windows)} messages in {windows['thread'].nunique()} threads; top windows:")
+    print(top[['thread', 'window_start', 'timestamp', 'messages', 'signal_kinds', 'risk']].head(20).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 import re, numpy as np
+from keyword_matcher import KeywordMatcher
+from score_cache import DEFAULT_MAXSIZE, ScoreCache, fingerprint
 WEIGHTS=np.array([0.7841198794598256, 0.6936287055262979, 0.6598222472386498, 0.9096115916498606, 0.7492912860059341, 0.6238784170381078, 0.629817713403088, 0.5068378702719317, -0.787489734716512],dtype=float)
 THRESHOLD=0.44000000000000006
 MALAY=set(['g4nj4', 'drop', 'pukal', 'urusan senyap', 'pil tidur', 'malam', 'sy4bu', 'pil kuda', 'ready stock', 'mlm', 'barang jalan', 'selit', 'ubat kuat', 'packing', 'bankin', 'barang sampai', 'barang', 'duit', 'transfer', 'stok', 'pagi', 'runner', 'bayar', 'ganja', 'cod', 'syabu', 'ketum', 'titip'])
@@ -9,20 +11,72 @@ EMOJI=set(['💊', '🍁', '💉', '🧪', '💵', '📦', '🔒', '🤫', '🪙
 MONEY=set(['rm', 'ringgit', 'cash', 'duit', 'bayar', 'transfer', 'bankin', 'tng', 'sikit', 'seratus', '50', '100', '200'])
 SECRECY=set(['senyap', 'diam', 'private', 'confidential', 'silent', '🤫', '🔒', '安全', '私聊', 'low key', 'dl'])
 QTY=set(['1g', '2g', '3g', '5g', '10g', 'setengah', 'sekilo', 'kg', 'pkt', 'pack', 'botol', 'strip', '板', '粒'])
-def _featurize(msg:str)->np.ndarray:
+LEXICONS=(("malay",MALAY),("chinese",CHINESE),("english",ENGLISH),("emoji",EMOJI),("money",MONEY),("secrecy",SECRECY),("quantity",QTY))
+_CJK_RE=re.compile(r"[\u4e00-\u9fff]")
+_NUM_RE=re.compile(r"\b\d+g?\b")
+# Words as the scorers split them: each CJK character alone, and runs of ASCII letters/digits
+TOKEN_PATTERN=r"[\u4e00-\u9fff]|[a-z0-9]+"
+_TOKEN_RE=re.compile(TOKEN_PATTERN)
+N_FEATURES=len(WEIGHTS)
+# Changes only when featurization changes; keys cached training features
+FEATURE_VERSION=fingerprint(LEXICONS,TOKEN_PATTERN,_NUM_RE.pattern,N_FEATURES)
+# Changes whenever the weights, threshold or featurization change; keys cached scores
+MODEL_VERSION=fingerprint(WEIGHTS.tolist(),THRESHOLD,FEATURE_VERSION)
+def build_matcher(keywords=(),extra=())->KeywordMatcher:
+    """One automaton for every lexicon; each keyword counts under 'keyword:<kw>', extra is (pattern, feature) pairs."""
+    m=KeywordMatcher()
+    for name,lex in LEXICONS:
+        for w in lex:
+            # WEIGHTS were trained on single-token matches plus emoji substring counts: an entry that is
+            # not one token ('urusan senyap', '安全', the emoji in SECRECY) never counted, so it is left out
+            if name=="emoji" or _TOKEN_RE.fullmatch(w): m.add(w,name,whole_word=True)
+    # every CJK character that appears in a Chinese entry also scores on its own
+    for ch in set(_CJK_RE.findall("".join(CHINESE))): m.add(ch,"chinese")
+    for kw in keywords: m.add(kw,"keyword:"+kw)
+    for pattern,feature in extra: m.add(pattern,feature)
+    return m.build()
+MATCHER=build_matcher()
+def count_numbers(text:str)->int:
+    """Number tokens ("50", "5g") in lower-cased text; the last feature before the bias."""
+    return len(_NUM_RE.findall(text))
+def _counts(msg:str)->tuple:
+    """Raw lexicon counts for one message, in WEIGHTS order without the bias term."""
     text=(msg or "").lower()
-    emoji_cnt=sum(text.count(e) for e in EMOJI)
-    tokens=re.findall(r"[\u4e00-\u9fff]|[a-zA-Z0-9]+", text)
-    def count_in(tok,v): return sum(1 for t in tok if t in v)
-    mal=count_in(tokens,MALAY)
-    chn=count_in(tokens,CHINESE)+sum(1 for t in tokens if re.match(r"[\u4e00-\u9fff]",t) and t in "".join(list(CHINESE)))
-    eng=count_in(tokens,ENGLISH)
-    money_c=count_in(tokens,MONEY)
-    sec_c=count_in(tokens,SECRECY)
-    qty_c=count_in(tokens,QTY)
-    nums=len(re.findall(r"\b\d+g?\b", text))
-    return np.array([mal,chn,eng,emoji_cnt,money_c,sec_c,qty_c,nums,1.0],dtype=float)
+    hits=MATCHER.scan(text)
+    return tuple(hits.get(name,0) for name,_ in LEXICONS)+(count_numbers(text),)
+def tokenize(msg:str)->list:
+    """Lower-cased words of a message, split like the whole-word lexicon matches."""
+    return _TOKEN_RE.findall((msg or "").lower())
+def _featurize(msg:str)->np.ndarray:
+    return np.array(_counts(msg)+(1.0,),dtype=float)
+def featurize_batch(messages)->np.ndarray:
+    """Featurize a whole column into one (n x N_FEATURES) matrix; last column is the bias."""
+    messages=list(messages)
+    X=np.ones((len(messages),N_FEATURES),dtype=float)
+    if messages: X[:,:-1]=[_counts(m) for m in messages]
+    return X
+def features_from_hits(hits,numbers)->np.ndarray:
+    """featurize_batch from precomputed scans: hits are scan() dicts of any build_matcher() automaton
+    over the lower-cased messages, numbers their count_numbers()."""
+    X=np.ones((len(hits),N_FEATURES),dtype=float)
+    if len(hits):
+        X[:,:-2]=[[h.get(name,0) for name,_ in LEXICONS] for h in hits]
+        X[:,-2]=numbers
+    return X
+def _sigmoid(z): return 1/(1+np.exp(-z))
+def predict_features(X:np.ndarray,weights=None,threshold=None):
+    """(scores, is_drug) for a feature matrix from featurize_batch or features_from_hits; WEIGHTS/THRESHOLD by default."""
+    weights=WEIGHTS if weights is None else weights; threshold=THRESHOLD if threshold is None else threshold
+    scores=_sigmoid(X@weights); return scores,scores>=threshold
 def score_message(msg:str)->float:
-    x=_featurize(msg); z=float(x@WEIGHTS); return 1/(1+np.exp(-z))
+    x=_featurize(msg); z=float(x@WEIGHTS); return _sigmoid(z)
 def is_drug(msg:str)->bool: return score_message(msg)>=THRESHOLD
-def batch_score(messages): return [score_message(m) for m in messages]
+def batch_predict(messages,cache=None):
+    """Score many messages with one matmul; returns (scores, is_drug) numpy arrays. A cache from make_cache skips repeats."""
+    if cache is not None: scores=np.array(cache.map(messages),dtype=float)
+    else: return predict_features(featurize_batch(messages))
+    return scores,scores>=THRESHOLD
+def batch_score(messages,cache=None)->np.ndarray: return batch_predict(messages,cache)[0]
+def make_cache(path=None,maxsize=DEFAULT_MAXSIZE)->ScoreCache:
+    """GA score cache keyed by MODEL_VERSION; path adds a persistent SQLite store."""
+    return ScoreCache(lambda msgs: batch_score(msgs).tolist(),MODEL_VERSION,maxsize,path)
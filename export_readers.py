@@ -0,0 +1,177 @@
+"""Chunked readers for chat exports in their native formats.
+
+Besides CSV, two native formats are read directly, without converting
+them to CSV first:
+
+* Facebook Messenger JSON: a thread directory of ``message_N.json`` files
+  (or one such file). Each document is scanned for its "messages" array,
+  and the messages are decoded one at a time from a fixed-size buffer, so a
+  file is never loaded whole. Facebook escapes UTF-8 bytes as \\u00XX
+  code points; names and texts are decoded back to proper text.
+* WhatsApp .txt: the "Export chat" text file, Android
+  (``1/9/21, 4:44 PM - Name: text``) or iOS (``[1/9/21, 4:44:12 PM] Name: text``)
+  style. Lines without a timestamp continue the message before them;
+  system notices without a sender are skipped.
+
+read_export() yields DataFrame chunks with the export's own column names
+(sender_name/timestamp_ms/content for Facebook, From/Time (local)/Message
+for WhatsApp), so detect_platform and standardize_columns treat them like
+the CSV exports.
+"""
+import json
+import re
+from pathlib import Path
+
+import pandas as pd
+
+from results_store import is_store_path
+
+FACEBOOK_COLUMNS = ['sender_name', 'timestamp_ms', 'content']
+WHATSAPP_TXT_COLUMNS = ['From', 'Time (local)', 'Message']
+
+DEFAULT_BLOCK_SIZE = 1 << 20
+# Rows per chunk when a native export is loaded whole
+LOAD_CHUNK_SIZE = 100000
+
+_FACEBOOK_FILE = re.compile(r'message_(\d+)\.json$')
+_WHATSAPP_LINE = re.compile(
+    r'^\[?(?P<date>\d{1,4}[./-]\d{1,2}[./-]\d{1,4}),?\s+'
+    r'(?P<time>\d{1,2}[:.]\d{2}(?:[:.]\d{2})?(?:\s?[APap]\.?\s?[Mm]\.?)?)\]?'
+    r'(?:\s+-\s+|\s+)(?P<rest>.*)$')
+# Direction marks and the narrow no-break spaces newer exports put before AM/PM
+_WHATSAPP_NOISE = str.maketrans({'\u200e': None, '\u200f': None, '\u202f': ' ', '\xa0': ' '})
+
+
+def export_kind(path):
+    """'facebook_json', 'whatsapp_txt' or 'csv', from the path alone"""
+    path = Path(path)
+    if (path.is_dir() and not is_store_path(path)) or path.suffix.lower() == '.json':
+        return 'facebook_json'
+    if path.suffix.lower() == '.txt':
+        return 'whatsapp_txt'
+    return 'csv'
+
+
+def facebook_files(path):
+    """The message_N.json files of a thread directory in N order, or [path] for a file"""
+    path = Path(path)
+    if not path.is_dir():
+        return [path]
+    files = [p for p in path.iterdir() if _FACEBOOK_FILE.match(p.name)]
+    return sorted(files, key=lambda p: int(_FACEBOOK_FILE.match(p.name).group(1)))
+
+
+def iter_json_array(f, key, block_size=DEFAULT_BLOCK_SIZE):
+    """Yield the items of the array under key in a JSON text file, one at a time.
+
+    Only the current item and one block of text are held in memory. The
+    first '"key": [' in the document is taken as the array, which holds for
+    the Facebook exports where "messages" is a top-level key.
+    """
+    decoder = json.JSONDecoder()
+    start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    buffer = ''
+    while True:
+        match = start.search(buffer)
+        if match:
+            break
+        block = f.read(block_size)
+        if not block:
+            return
+        # Keep a tail in case the key is split across two blocks
+        buffer = buffer[-(len(key) + 64):] + block
+
+    pos, eof = match.end(), False
+    separator = re.compile(r'[\s,]*')
+    while True:
+        pos = separator.match(buffer, pos).end()
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+        if pos < len(buffer):
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise ValueError(f"Malformed JSON in the {key!r} array of {getattr(f, 'name', f)}")
+            else:
+                yield item
+                continue
+        elif eof:
+            raise ValueError(f"Unterminated {key!r} array in {getattr(f, 'name', f)}")
+        # The item is cut off at the end of the buffer: read on
+        block = f.read(block_size)
+        eof = not block
+        buffer = buffer[pos:] + block
+        pos = 0
+
+
+def _fix_facebook_text(text):
+    """Undo Facebook's escaping of UTF-8 bytes as Latin-1 code points"""
+    if not text:
+        return text
+    try:
+        return text.encode('latin-1').decode('utf-8')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return text
+
+
+def read_facebook_json(path, chunk_size, block_size=DEFAULT_BLOCK_SIZE):
+    """Yield DataFrame chunks of FACEBOOK_COLUMNS from a thread directory or message_N.json"""
+    rows = []
+    for file_path in facebook_files(path):
+        with open(file_path, encoding='utf-8') as f:
+            for message in iter_json_array(f, 'messages', block_size):
+                rows.append((_fix_facebook_text(message.get('sender_name', '')),
+                             message.get('timestamp_ms'),
+                             _fix_facebook_text(message.get('content', ''))))
+                if len(rows) >= chunk_size:
+                    yield pd.DataFrame(rows, columns=FACEBOOK_COLUMNS)
+                    rows = []
+    if rows:
+        yield pd.DataFrame(rows, columns=FACEBOOK_COLUMNS)
+
+
+def read_whatsapp_txt(path, chunk_size, encoding='utf-8-sig'):
+    """Yield DataFrame chunks of WHATSAPP_TXT_COLUMNS from a WhatsApp chat export"""
+    rows = []
+    current = None
+    with open(path, encoding=encoding, errors='replace') as f:
+        for line in f:
+            line = line.rstrip('\r\n').translate(_WHATSAPP_NOISE)
+            match = _WHATSAPP_LINE.match(line)
+            if match is None:
+                if current is not None:
+                    current[2] += '\n' + line
+                continue
+            if current is not None:
+                rows.append(current)
+                if len(rows) >= chunk_size:
+                    yield pd.DataFrame(rows, columns=WHATSAPP_TXT_COLUMNS)
+                    rows = []
+            sender, sep, text = match.group('rest').partition(': ')
+            # "Messages are end-to-end encrypted", "X added Y" and the like have no sender
+            current = [sender, f"{match.group('date')} {match.group('time')}", text] if sep else None
+    if current is not None:
+        rows.append(current)
+    if rows:
+        yield pd.DataFrame(rows, columns=WHATSAPP_TXT_COLUMNS)
+
+
+def read_export(path, chunk_size, encoding='ISO-8859-1'):
+    """Yield DataFrame chunks of any supported export; encoding applies to CSV only"""
+    kind = export_kind(path)
+    if kind == 'facebook_json':
+        return read_facebook_json(path, chunk_size)
+    if kind == 'whatsapp_txt':
+        return read_whatsapp_txt(path, chunk_size)
+    return iter(pd.read_csv(path, encoding=encoding, chunksize=chunk_size))
+
+
+def load_export(path, encoding='ISO-8859-1'):
+    """A whole export as one DataFrame"""
+    kind = export_kind(path)
+    if kind == 'csv':
+        return pd.read_csv(path, encoding=encoding)
+    columns = FACEBOOK_COLUMNS if kind == 'facebook_json' else WHATSAPP_TXT_COLUMNS
+    chunks = list(read_export(path, LOAD_CHUNK_SIZE))
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns)
@@ -0,0 +1,117 @@
+"""Compact in-memory layout for loaded and scored chat frames, and a memory report.
+
+Exports repeat most of their metadata on every row: the same handful of
+senders and receivers, a Direction of two values, a Profile and a long
+Origin path that are identical for a whole device extraction. Kept as
+Python strings each row costs an 8-byte pointer plus, for values not shared
+by the CSV reader, a string object of 50 bytes or more. compact_frame()
+stores such columns as categoricals (one small integer code per row plus
+the distinct values once) and downcasts numbers where no value changes, so
+the message text is the only per-row string left.
+
+The scored columns are already compact: chat_core stores the capped
+heuristic score as int8 and the flags as one-byte booleans, and
+parallel_scoring stores the GA score as float32.
+
+    python frame_memory.py Chats.csv
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Text columns with fewer distinct values than this share of rows become categoricals
+CATEGORY_RATIO = 0.5
+
+
+def _is_text(values):
+    return values.dtype == object or pd.api.types.is_string_dtype(values.dtype)
+
+
+def compact_column(values, ratio=CATEGORY_RATIO):
+    """values in the smallest dtype that keeps every value, or values itself"""
+    if isinstance(values.dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(values.dtype):
+        return values
+    if _is_text(values):
+        if values.nunique(dropna=False) < max(1, len(values) * ratio):
+            return values.astype('category')
+        return values
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return pd.to_numeric(values, downcast='integer')
+    if pd.api.types.is_float_dtype(values.dtype) and values.dtype != np.float32:
+        narrow = values.astype(np.float32)
+        # Phone numbers and ids read as floats (a column with blanks) need all 64 bits
+        if ((narrow.astype(values.dtype) == values) | values.isna()).all():
+            return narrow
+    return values
+
+
+def compact_frame(df, ratio=CATEGORY_RATIO, keep=()):
+    """Convert the columns of df to their compact dtypes in place; returns df.
+
+    Columns named in keep are left as they are.
+    """
+    for col in df.columns:
+        if col in keep:
+            continue
+        values = df[col]
+        compact = compact_column(values, ratio)
+        if compact is not values:
+            df[col] = compact
+    return df
+
+
+def column_bytes(df):
+    """Bytes held by each column, text values included"""
+    return df.memory_usage(index=False, deep=True)
+
+
+def memory_report(frames):
+    """Bytes per row of every column for each (label, frame) pair, as a DataFrame.
+
+    The last row, 'total', holds the bytes per row of the whole frame.
+    """
+    report = {}
+    for label, df in frames:
+        per_row = column_bytes(df) / max(1, len(df))
+        per_row['total'] = per_row.sum()
+        report[label] = per_row
+    return pd.DataFrame(report)
+
+
+def format_report(report, pairs=()):
+    """memory_report() as a text table; pairs of labels add the ratio of their totals"""
+    lines = [report.fillna(0).round(1).to_string()]
+    totals = report.loc['total']
+    for before, after in pairs:
+        if totals[after] > 0:
+            lines.append(f"{before} -> {after}: x{totals[before] / totals[after]:.1f} fewer bytes per row")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show bytes per row of an export before and after compaction")
+    parser.add_argument('input', help="Chat export (CSV, Facebook JSON or WhatsApp .txt)")
+    parser.add_argument('--no-score', action='store_true', help="Only report the loaded frame")
+    args = parser.parse_args(argv)
+
+    from chat_core import detect_platform, score_frame, standardize_columns
+    from export_readers import load_export
+
+    loaded = load_export(args.input)
+    compact = compact_frame(loaded.copy())
+    frames = [('loaded', loaded), ('compact', compact)]
+    pairs = [('loaded', 'compact')]
+    if not args.no_score:
+        platform = detect_platform(loaded.columns)
+        for label, df in (('loaded', loaded), ('compact', compact)):
+            frames.append((f'{label} scored', score_frame(standardize_columns(df.copy(), platform))))
+        pairs.append(('loaded scored', 'compact scored'))
+    print(f"{len(loaded)} rows, bytes per row:")
+    print(format_report(memory_report(frames), pairs))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,314 @@
+"""Genetic-algorithm trainer for the drug_scorer weights.
+
+The labeled chats are featurized once with drug_scorer.featurize_batch and
+the matrix is cached next to the CSV, so later runs with other GA settings
+skip the text scan. Rows with identical feature vectors are merged into
+one row with positive and negative counts; the features are small integer
+counts, so a million messages shrink to a few thousand distinct rows.
+
+Every generation scores the whole population with one (rows x population)
+matmul and computes the AUC of every individual from the sorted scores at
+once. The best individual's threshold is the one with the best validation
+F1. The result is written to ga_weights_report.json, training_report.txt
+and the WEIGHTS/THRESHOLD lines of drug_scorer.py; drug_scorer.py is left
+alone when its current weights have the higher validation AUC (--force
+overrides).
+
+    python ga_trainer.py whatsapp_drug_chats.csv --generations 15 -j 8
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import drug_scorer
+from score_cache import fingerprint
+
+DEFAULT_POPULATION = 64
+DEFAULT_GENERATIONS = 15
+DEFAULT_CHUNK_SIZE = 100000
+
+FEATURE_ORDER = [name for name, _ in drug_scorer.LEXICONS] + ['numbers', 'bias']
+
+# Candidate decision thresholds on the sigmoid output
+THRESHOLDS = np.round(np.arange(0.01, 1.0, 0.01), 2)
+
+
+def _columns(path, label_column, encoding='utf-8'):
+    """Message and label column names of a labeled export, matched case-insensitively"""
+    header = pd.read_csv(path, encoding=encoding, nrows=0).columns
+    columns = {col.lower(): col for col in header}
+    message = columns.get('message', columns.get('content'))
+    label = columns.get(label_column.lower())
+    if message is None or label is None:
+        raise ValueError(f"{path} needs a message column and a '{label_column}' column")
+    return message, label
+
+
+def load_features(path, label_column='Label', positive='drug', chunk_size=DEFAULT_CHUNK_SIZE,
+                  executor=None, cache_path=None, encoding='utf-8'):
+    """Feature matrix (without the bias column) and 0/1 labels of a labeled CSV.
+
+    The result is cached in cache_path (default <csv>.features.npz) and
+    reused while the file, the label settings and the featurization are
+    unchanged. With an executor the chunks are featurized in parallel.
+    """
+    cache_path = cache_path or f"{path}.features.npz"
+    stat = os.stat(path)
+    key = fingerprint(drug_scorer.FEATURE_VERSION, stat.st_size, stat.st_mtime_ns, label_column, positive,
+                      encoding)
+    if os.path.exists(cache_path):
+        cached = np.load(cache_path)
+        if str(cached['key']) == key:
+            return cached['X'], cached['y']
+
+    message_col, label_col = _columns(path, label_column, encoding)
+    reader = pd.read_csv(path, encoding=encoding, usecols=[message_col, label_col], chunksize=chunk_size)
+    blocks, labels = [], []
+    for chunk in reader:
+        messages = chunk[message_col].where(chunk[message_col].notna(), '').astype(str).tolist()
+        blocks.append(executor.submit(_featurize, messages) if executor is not None else _featurize(messages))
+        labels.append((chunk[label_col].astype(str).str.strip().str.lower() == positive.lower()).to_numpy())
+    blocks = [b.result() if executor is not None else b for b in blocks]
+    X = np.concatenate(blocks) if blocks else np.zeros((0, drug_scorer.N_FEATURES - 1), dtype=np.float32)
+    y = np.concatenate(labels) if labels else np.zeros(0, dtype=bool)
+
+    tmp_path = f"{cache_path}.tmp.npz"
+    np.savez(tmp_path, X=X, y=y, key=np.array(key))
+    os.replace(tmp_path, cache_path)
+    return X, y
+
+
+def _featurize(messages):
+    """Lexicon counts of a block of messages, bias column dropped"""
+    return drug_scorer.featurize_batch(messages)[:, :-1].astype(np.float32)
+
+
+def compress(X, y):
+    """Distinct feature rows (with bias column) and their positive/negative counts"""
+    rows, inverse = np.unique(X, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    total = np.bincount(inverse, minlength=len(rows))
+    pos = np.bincount(inverse, weights=y.astype(np.float64), minlength=len(rows))
+    rows = np.hstack([rows.astype(np.float64), np.ones((len(rows), 1))])
+    return rows, pos, total - pos
+
+
+def auc_batch(scores, pos, neg):
+    """AUC of every column of scores (rows x population) for weighted rows.
+
+    Equal scores are ties whichever rows they come from: each positive
+    counts the negatives scored below it plus half of those scored equal
+    (average ranks), so the result does not depend on the row order.
+    """
+    pairs = pos.sum() * neg.sum()
+    if not pairs:
+        return np.full(scores.shape[1], 0.5)
+    order = np.argsort(scores, axis=0)
+    ordered = np.take_along_axis(scores, order, axis=0)
+    p, n = pos[order], neg[order]
+    # Negatives before and through each position, then spread over its run of equal scores
+    before = np.cumsum(n, axis=0) - n
+    through = before + n
+    starts = np.ones(ordered.shape, dtype=bool)
+    starts[1:] = ordered[1:] != ordered[:-1]
+    ends = np.ones(ordered.shape, dtype=bool)
+    ends[:-1] = starts[1:]
+    below = np.maximum.accumulate(np.where(starts, before, 0), axis=0)
+    upto = np.minimum.accumulate(np.where(ends, through, np.inf)[::-1], axis=0)[::-1]
+    return (p * (below + 0.5 * (upto - below))).sum(axis=0) / pairs
+
+
+def population_auc(population, rows, pos, neg):
+    """AUC of every individual; logits are monotonic in the score, so no sigmoid is needed"""
+    return auc_batch(rows @ population.T, pos, neg)
+
+
+_worker_data = None
+
+
+def _init_worker(rows, pos, neg):
+    global _worker_data
+    _worker_data = (rows, pos, neg)
+
+
+def _worker_auc(population):
+    return population_auc(population, *_worker_data)
+
+
+def threshold_metrics(weights, rows, pos, neg, thresholds=THRESHOLDS):
+    """Precision, recall and F1 at every threshold, as arrays"""
+    probs = 1 / (1 + np.exp(-(rows @ weights)))
+    predicted = probs[None, :] >= thresholds[:, None]
+    tp = predicted @ pos
+    fp = predicted @ neg
+    fn = pos.sum() - tp
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    return precision, recall, f1
+
+
+def evolve(rows, pos, neg, population_size=DEFAULT_POPULATION, generations=DEFAULT_GENERATIONS,
+           mutation_scale=0.2, elite=4, seed=0, executor=None, jobs=1):
+    """Run the GA on compressed training rows; returns (best weights, best AUC per generation)"""
+    rng = np.random.default_rng(seed)
+    population = rng.uniform(-1, 1, size=(population_size, rows.shape[1]))
+    history = []
+    best, best_fitness = None, -np.inf
+    for _ in range(generations):
+        if executor is not None:
+            parts = np.array_split(population, jobs)
+            fitness = np.concatenate(list(executor.map(_worker_auc, parts)))
+        else:
+            fitness = population_auc(population, rows, pos, neg)
+
+        leader = int(np.argmax(fitness))
+        if fitness[leader] > best_fitness:
+            best, best_fitness = population[leader].copy(), float(fitness[leader])
+        history.append(best_fitness)
+
+        # Elitism, then tournament selection, blend crossover and gaussian mutation
+        ranked = np.argsort(-fitness)
+        children = population_size - elite
+        contenders = rng.integers(0, population_size, size=(2, children, 2))
+        parents = np.where(fitness[contenders[..., 0]] >= fitness[contenders[..., 1]],
+                           contenders[..., 0], contenders[..., 1])
+        mix = rng.uniform(size=(children, 1))
+        offspring = mix * population[parents[0]] + (1 - mix) * population[parents[1]]
+        mutate = rng.uniform(size=offspring.shape) < 1 / rows.shape[1]
+        offspring += mutate * rng.normal(scale=mutation_scale, size=offspring.shape)
+        population = np.vstack([population[ranked[:elite]], offspring])
+    return best, history
+
+
+def split(n, val_fraction, seed):
+    """Boolean validation mask over n rows, reproducible from seed"""
+    rng = np.random.default_rng(seed)
+    mask = np.zeros(n, dtype=bool)
+    mask[rng.permutation(n)[:int(round(n * val_fraction))]] = True
+    return mask
+
+
+def train(X, y, val_fraction=0.2, seed=0, jobs=1, **ga_options):
+    """Fit weights and threshold on X/y; returns the report dict"""
+    val = split(len(y), val_fraction, seed)
+    train_rows = compress(X[~val], y[~val])
+    val_rows = compress(X[val], y[val])
+
+    executor = None
+    if jobs > 1:
+        executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=train_rows)
+    try:
+        weights, history = evolve(*train_rows, seed=seed, executor=executor, jobs=jobs, **ga_options)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    precision, recall, f1 = threshold_metrics(weights, *val_rows)
+    best = int(np.argmax(f1))
+    return {
+        'weights': weights.tolist(),
+        'threshold': float(THRESHOLDS[best]),
+        'val_auc': float(population_auc(weights[None, :], *val_rows)[0]),
+        'current_val_auc': float(population_auc(drug_scorer.WEIGHTS[None, :], *val_rows)[0]),
+        'val_precision': float(precision[best]),
+        'val_recall': float(recall[best]),
+        'val_f1': float(f1[best]),
+        'history': history,
+        'feature_order': FEATURE_ORDER,
+    }
+
+
+def write_report(report, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+
+def write_summary(report, path, title, rows):
+    """Plain-text summary in the training_report.txt layout"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"{title}\n"
+                f"Dataset rows: {rows}\n"
+                f"Validation AUC: {report['val_auc']:.4f}\n"
+                f"Best Val F1:    {report['val_f1']:.4f} at threshold {report['threshold']:.3f}\n"
+                f"Precision/Recall: {report['val_precision']:.4f} / {report['val_recall']:.4f}")
+
+
+def write_scorer(report, path=drug_scorer.__file__, force=False):
+    """Replace the WEIGHTS and THRESHOLD constants of drug_scorer.py in place.
+
+    Raises ValueError, leaving the file unchanged, when the current weights
+    had the higher validation AUC, unless force is set.
+    """
+    current = report.get('current_val_auc')
+    if not force and current is not None and report['val_auc'] < current:
+        raise ValueError(f"validation AUC {report['val_auc']:.4f} is below the current weights' "
+                         f"{current:.4f}; {path} not updated (use --force to write it anyway)")
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    weights = f"WEIGHTS=np.array({[float(w) for w in report['weights']]!r},dtype=float)"
+    threshold = f"THRESHOLD={float(report['threshold'])!r}"
+    source, replaced_weights = re.subn(r'^WEIGHTS=.*$', lambda _: weights, source, count=1, flags=re.M)
+    source, replaced_threshold = re.subn(r'^THRESHOLD=.*$', lambda _: threshold, source, count=1, flags=re.M)
+    if not (replaced_weights and replaced_threshold):
+        raise ValueError(f"{path} has no WEIGHTS/THRESHOLD lines to update")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(source)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Retrain the drug_scorer weights on labeled chats")
+    parser.add_argument('input', help="CSV with a message column and a label column")
+    parser.add_argument('--label-column', default='Label', help="Column holding the labels")
+    parser.add_argument('--positive', default='drug', help="Label value of drug-related messages")
+    parser.add_argument('--encoding', default='utf-8', help="Encoding of the input CSV")
+    parser.add_argument('--population', type=int, default=DEFAULT_POPULATION, help="Individuals per generation")
+    parser.add_argument('--generations', type=int, default=DEFAULT_GENERATIONS, help="Generations to run")
+    parser.add_argument('--val-fraction', type=float, default=0.2, help="Share of rows held out for validation")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the split and the GA")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="Processes for featurizing and fitness")
+    parser.add_argument('--features-cache', help="Cached feature matrix (default: <input>.features.npz)")
+    parser.add_argument('--report', default='ga_weights_report.json', help="JSON report to write")
+    parser.add_argument('--summary', default='training_report.txt', help="Text summary to write")
+    parser.add_argument('--no-scorer', action='store_true', help="Do not update drug_scorer.py")
+    parser.add_argument('--force', action='store_true',
+                        help="Update drug_scorer.py even when the current weights validate better")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    executor = ProcessPoolExecutor(max_workers=args.jobs) if args.jobs > 1 else None
+    try:
+        X, y = load_features(args.input, args.label_column, args.positive, executor=executor,
+                             cache_path=args.features_cache, encoding=args.encoding)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    featurized = time.perf_counter()
+
+    report = train(X, y, val_fraction=args.val_fraction, seed=args.seed, jobs=args.jobs,
+                   population_size=args.population, generations=args.generations)
+    write_report(report, args.report)
+    write_summary(report, args.summary, f"Drug-only chat detector (GA-optimized) trained on {args.input}", len(y))
+    print(f"{len(y)} rows: featurized in {featurized - started:.1f}s, "
+          f"trained in {time.perf_counter() - featurized:.1f}s; "
+          f"val AUC {report['val_auc']:.4f}, F1 {report['val_f1']:.4f} at {report['threshold']:.2f}",
+          file=sys.stderr)
+    if not args.no_scorer:
+        try:
+            write_scorer(report, force=args.force)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""Import-time budget check for the headless modules.
+
+Each module is imported in a fresh interpreter, timed, and checked for
+modules it must not pull in. Batch workers and scoring subprocesses import
+these on every start, so a new top-level import of Qt or matplotlib (or a
+slow one) shows up here before it shows up as slow batches.
+
+    python import_budget.py            # check every budget, exit 1 on failure
+    python import_budget.py chat_core  # check some of them
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+GUI_MODULES = ('PyQt5', 'matplotlib')
+
+# module: (budget in milliseconds, top-level modules it must not import)
+BUDGETS = {
+    'chat_core': (300, GUI_MODULES + ('pandas',)),
+    'drug_scorer': (300, GUI_MODULES + ('pandas',)),
+    'scorers': (300, GUI_MODULES + ('pandas',)),
+    'parallel_scoring': (400, GUI_MODULES + ('pandas',)),
+    'scoring_service': (400, GUI_MODULES + ('pandas',)),
+    'case_state': (1500, GUI_MODULES),
+    'chat_stream': (1500, GUI_MODULES),
+    'batch_cli': (1500, GUI_MODULES),
+}
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{'ms': elapsed * 1000, 'modules': sorted({{m.split('.')[0] for m in sys.modules}})}}))
+"""
+
+
+def measure(module):
+    """Import time in ms and top-level modules loaded, from a fresh interpreter"""
+    output = subprocess.run([sys.executable, '-c', _PROBE.format(module=module)],
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.splitlines()[-1])
+    return result['ms'], set(result['modules'])
+
+
+def check(module, repeat=3):
+    """Return a list of budget violations for one module (best of repeat runs)"""
+    budget, forbidden = BUDGETS[module]
+    runs = [measure(module) for _ in range(repeat)]
+    ms = min(run[0] for run in runs)
+    loaded = runs[0][1]
+    problems = [f"imports {name}" for name in forbidden if name in loaded]
+    if ms > budget:
+        problems.append(f"took {ms:.0f} ms, budget {budget} ms")
+    return ms, problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check import time and dependencies of the headless modules")
+    parser.add_argument('modules', nargs='*', help="Modules to check (default: all)")
+    parser.add_argument('--repeat', type=int, default=3, help="Imports per module; the fastest one counts")
+    args = parser.parse_args(argv)
+    unknown = [module for module in args.modules if module not in BUDGETS]
+    if unknown:
+        parser.error(f"no budget for {', '.join(unknown)}")
+
+    failed = False
+    for module in args.modules or BUDGETS:
+        ms, problems = check(module, args.repeat)
+        failed = failed or bool(problems)
+        status = 'FAIL ' + '; '.join(problems) if problems else 'ok'
+        print(f"{module:<18} {ms:7.0f} ms  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""Per-stage timing, counters and traces for the analysis pipeline.
+
+Pipeline code wraps its steps in ``stage(metrics, name, rows)``. When no
+PipelineMetrics is passed the call returns a shared no-op context manager,
+so an uninstrumented run pays one None check per stage (per chunk, not per
+message). With metrics every stage records its calls, rows, wall time and
+CPU time of the calling thread, and a trace event; nested stages are
+counted in both. CPU time spent in worker processes is not included.
+
+PipelineMetrics.write() saves the summary, the counters, the peak RSS and
+the trace events in Chrome trace format (open it in chrome://tracing or
+Perfetto). A sampler such as StackSampler can be attached to profile where
+inside the stages the time goes.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def max_rss_mb():
+    """Peak resident set size of this process so far, or None where unsupported"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add_rows(self, rows):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(metrics, name, rows=0):
+    """Context manager timing name on metrics; a shared no-op when metrics is None"""
+    return _NULL_STAGE if metrics is None else _Stage(metrics, name, rows)
+
+
+class _Stage:
+    __slots__ = ('metrics', 'name', 'rows', 'wall', 'cpu')
+
+    def __init__(self, metrics, name, rows):
+        self.metrics = metrics
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.name, self.rows, self.wall, time.perf_counter() - self.wall,
+                            time.thread_time() - self.cpu)
+        return False
+
+    def add_rows(self, rows):
+        """Count rows only known once the stage has run, e.g. a chunk just read"""
+        self.rows += rows
+
+
+class PipelineMetrics:
+    """Stage timings, counters and trace events of one analysis run"""
+
+    def __init__(self, sampler=None):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counters = Counter()
+        self.events = []
+        self.sampler = sampler
+        self._lock = threading.Lock()
+        if sampler is not None:
+            sampler.start()
+
+    def record(self, name, rows, start, wall, cpu):
+        with self._lock:
+            totals = self.stages.setdefault(name, {'calls': 0, 'rows': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0})
+            totals['calls'] += 1
+            totals['rows'] += rows
+            totals['wall_seconds'] += wall
+            totals['cpu_seconds'] += cpu
+            self.events.append({'name': name, 'ph': 'X', 'pid': 0, 'tid': threading.get_ident(),
+                                'ts': (start - self.started) * 1e6, 'dur': wall * 1e6, 'args': {'rows': rows}})
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def count_cache(self, before, after):
+        """Add the lookups and hits between two ScoreCache.stats() snapshots"""
+        for key in ('lookups', 'memory_hits', 'disk_hits', 'computed'):
+            self.count(f'cache_{key}', after[key] - before[key])
+
+    def rows_per_sec(self, name):
+        totals = self.stages.get(name)
+        if not totals or totals['wall_seconds'] <= 0:
+            return None
+        return totals['rows'] / totals['wall_seconds']
+
+    def summary(self):
+        """JSON-serializable totals per stage plus counters and peak RSS"""
+        with self._lock:
+            stages = {name: dict(totals, rows_per_sec=self.rows_per_sec(name))
+                      for name, totals in self.stages.items()}
+            counters = dict(self.counters)
+        return {
+            'elapsed_seconds': time.perf_counter() - self.started,
+            'max_rss_mb': max_rss_mb(),
+            'stages': stages,
+            'counters': counters,
+        }
+
+    def close(self):
+        """Stop the sampler, if any"""
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    def write(self, path):
+        """Save the summary, the trace events and the sampler report as JSON"""
+        self.close()
+        report = self.summary()
+        with self._lock:
+            report['traceEvents'] = list(self.events)
+        if self.sampler is not None:
+            report['samples'] = self.sampler.report()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+
+
+class StackSampler:
+    """Sampling profiler counting the call stacks of one thread.
+
+    A daemon thread looks at the target thread's current frame every
+    interval seconds. report() returns the stacks in collapsed form
+    ("outer;inner;innermost": samples), as used by flame graph tools.
+    """
+
+    def __init__(self, interval=0.005, thread_id=None, max_depth=64):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='StackSampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None and len(names) < self.max_depth:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def report(self):
+        return {'interval_seconds': self.interval, 'stacks': dict(self.stacks.most_common())}
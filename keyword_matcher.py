@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Aho-Corasick keyword automaton used by the chat scorers.
+
+All lexicon entries are compiled once into a single automaton, so one scan of
+a message finds every entry it contains. The cost of a scan grows with the
+length of the message, not with the number of entries in the lexicons.
+"""
+from collections import deque
+
+
+def _is_word_char(ch):
+    return ch.isascii() and ch.isalnum()
+
+
+class KeywordMatcher:
+    """Multi-pattern matcher that counts hits per feature in one pass."""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._built = False
+
+    def add(self, pattern, feature, whole_word=False):
+        """Register ``pattern`` under ``feature``.
+
+        Patterns are lower-cased, so scans must be given lower-cased text.
+        A whole-word pattern only matches when its ASCII letter/digit ends are
+        not joined to further ASCII letters/digits, the same split as the
+        ``[a-zA-Z0-9]+`` tokens in drug_scorer. Multi-word phrases such as
+        'urusan senyap' are matched as written.
+        """
+        if self._built:
+            raise RuntimeError("Cannot add patterns after build()")
+        pattern = pattern.lower()
+        if not pattern:
+            return self
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        check_left = whole_word and _is_word_char(pattern[0])
+        check_right = whole_word and _is_word_char(pattern[-1])
+        self._out[state].append((len(pattern), feature, check_left, check_right))
+        return self
+
+    def build(self):
+        """Compute failure links; call once after all patterns are added."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+        return self
+
+    def scan(self, text):
+        """Return ``{feature: hit count}`` for every pattern found in ``text``."""
+        goto, fail, out = self._goto, self._fail, self._out
+        counts = {}
+        state = 0
+        last = len(text) - 1
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            for length, feature, check_left, check_right in out[state]:
+                start = i - length + 1
+                if check_left and start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                if check_right and i < last and _is_word_char(text[i + 1]):
+                    continue
+                counts[feature] = counts.get(feature, 0) + 1
+        return counts
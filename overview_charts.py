@@ -0,0 +1,147 @@
+"""Persistent charts for the Overview tab.
+
+The three figures and their Qt canvases are created once and redrawn in
+place, so repeated analyses do not leave figures behind. Each chart is
+drawn from precomputed aggregates (score histogram, per-sender stats,
+daily counts), never from the scored rows, and is only redrawn when the
+numbers it shows have changed.
+"""
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+
+# Senders shown in the per-sender chart, most suspicious on average first
+TOP_SENDERS = 20
+
+# Longer timelines are summed into equal bins of several days
+MAX_TIMELINE_POINTS = 365
+
+SENDER_BARS = [('is_suspicious', 'Suspicious'), ('has_transaction', 'Transactions'),
+               ('has_location', 'Locations'), ('has_personal_info', 'Personal Info')]
+
+
+def timeline_bins(daily_counts, daily_suspicious, max_points=MAX_TIMELINE_POINTS):
+    """Bin start dates, message counts and suspicious counts for the timeline.
+
+    Both inputs are counts indexed by date. Days are summed into bins of
+    equal width so at most max_points bins are returned.
+    """
+    if not len(daily_counts):
+        return np.array([], dtype='datetime64[D]'), np.zeros(0, np.int64), np.zeros(0, np.int64)
+    days = pd.to_datetime(daily_counts.index).to_numpy().astype('datetime64[D]')
+    first = days.min()
+    span = int((days.max() - first).astype(np.int64)) + 1
+    width = -(-span // max_points)
+    n_bins = -(-span // width)
+
+    def binned(counts):
+        offsets = (pd.to_datetime(counts.index).to_numpy().astype('datetime64[D]') - first).astype(np.int64)
+        return np.bincount(offsets // width, weights=counts.to_numpy(), minlength=n_bins).astype(np.int64)
+
+    starts = first + np.arange(n_bins) * np.timedelta64(width, 'D')
+    return starts, binned(daily_counts), binned(daily_suspicious)
+
+
+class _Chart:
+    """One figure and canvas, plus the data key it was last drawn from"""
+
+    def __init__(self, figsize):
+        self.figure = Figure(figsize=figsize, tight_layout=True)
+        self.canvas = FigureCanvas(self.figure)
+        self.ax = self.figure.add_subplot()
+        self.key = None
+
+    def start_redraw(self, *arrays):
+        """Clear the axes if arrays differ from the last drawn data; False when unchanged"""
+        key = tuple(np.asarray(a).tobytes() for a in arrays)
+        if key == self.key:
+            return False
+        self.key = key
+        self.ax.clear()
+        return True
+
+
+class OverviewCharts:
+    """Score distribution, per-sender and timeline charts, reused across analyses"""
+
+    def __init__(self):
+        self.scores = _Chart((10, 4))
+        self.senders = _Chart((10, 6))
+        self.timeline = _Chart((10, 4))
+
+    @property
+    def canvases(self):
+        return [self.scores.canvas, self.senders.canvas, self.timeline.canvas]
+
+    def update(self, analysis, sender_stats):
+        """Redraw the charts whose data changed.
+
+        analysis is a chat_stream.StreamingAnalysis, sender_stats a frame
+        of per-sender counts sorted most suspicious first.
+        """
+        self.draw_scores(analysis.score_counts)
+        self.draw_senders(sender_stats)
+        self.draw_timeline(analysis.daily_counts, analysis.daily_suspicious)
+
+    def draw_scores(self, score_counts):
+        chart = self.scores
+        if not chart.start_redraw(score_counts):
+            return
+        ax = chart.ax
+        ax.bar(np.arange(len(score_counts)), score_counts, width=1.0, edgecolor='white')
+        ax.set_title('Distribution of Suspicion Scores')
+        ax.set_xlabel('Suspicion Score')
+        ax.set_ylabel('Count')
+        chart.canvas.draw_idle()
+
+    def draw_senders(self, sender_stats):
+        top = sender_stats.head(TOP_SENDERS)
+        names = top.index.astype(str)
+        counts = top[[col for col, _ in SENDER_BARS]].to_numpy(dtype=np.int64)
+        chart = self.senders
+        if not chart.start_redraw(names.to_numpy(dtype=str), counts, len(sender_stats)):
+            return
+        ax = chart.ax
+        x = np.arange(len(top))
+        width = 0.15
+        for i, (_, label) in enumerate(SENDER_BARS):
+            ax.bar(x + width * i, counts[:, i], width, label=label)
+
+        ax.set_xlabel('Sender')
+        ax.set_ylabel('Count')
+        if len(sender_stats) > len(top):
+            ax.set_title(f'Message Analysis by Sender (top {len(top)} of {len(sender_stats)})')
+        else:
+            ax.set_title('Message Analysis by Sender')
+        ax.set_xticks(x + width * 1.5)
+        ax.set_xticklabels(names, rotation=45, ha='right')
+        if len(top):
+            ax.legend()
+        chart.canvas.draw_idle()
+
+    def draw_timeline(self, daily_counts, daily_suspicious):
+        starts, counts, suspicious = timeline_bins(daily_counts, daily_suspicious)
+        chart = self.timeline
+        if not chart.start_redraw(starts, counts, suspicious):
+            return
+        ax = chart.ax
+        ax.set_title('Message Activity Over Time')
+        if not len(starts):
+            # Fallback if timeline can't be created
+            ax.text(0.5, 0.5, 'Timeline data not available',
+                    horizontalalignment='center', verticalalignment='center',
+                    transform=ax.transAxes, fontsize=14)
+            chart.canvas.draw_idle()
+            return
+
+        ax.plot(starts, counts, label='All Messages', alpha=0.7)
+        flagged = suspicious > 0
+        ax.scatter(starts[flagged], suspicious[flagged],
+                   color='red', label='Suspicious Messages', alpha=0.8)
+        bin_days = int((starts[1] - starts[0]).astype(np.int64)) if len(starts) > 1 else 1
+        ax.set_xlabel('Date' if bin_days == 1 else f'Date ({bin_days}-day bins)')
+        ax.set_ylabel('Message Count')
+        ax.legend()
+        ax.tick_params(axis='x', labelrotation=45)
+        chart.canvas.draw_idle()
@@ -0,0 +1,127 @@
+"""Score one large message column on several cores.
+
+The column is split into contiguous row ranges, one task per range. Each
+worker process scores its messages with the registered scorers (see
+scorers.py) and writes the results straight into shared-memory numpy arrays
+at its row offsets, so only the input messages are pickled and the output
+keeps the original row order.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from chat_core import FLAG_COLUMNS, SUSPICION_THRESHOLD, scan_columns
+from scorers import result_columns, result_rows, row_columns, score_messages
+
+# Rows per task; small enough to balance load, large enough to amortize pickling
+DEFAULT_CHUNK_SIZE = 50000
+
+# Scorers run by parallel_score unless others are named
+PARALLEL_SCORERS = ('heuristic', 'ga')
+
+# Output arrays filled by the workers with the default scorers
+RESULT_COLUMNS = result_columns(PARALLEL_SCORERS)
+
+
+def score_block(messages, scorers=PARALLEL_SCORERS):
+    """Score messages in-process, returning one array per result column of scorers"""
+    return score_messages(messages, scorers)
+
+
+def _attach(blocks, length, columns):
+    """Open the shared blocks in this process as numpy arrays"""
+    handles = {col: shared_memory.SharedMemory(name=name) for col, name in blocks.items()}
+    arrays = {col: np.ndarray((length,), dtype=columns[col], buffer=handles[col].buf)
+              for col in blocks}
+    return handles, arrays
+
+
+def _score_range(blocks, length, start, messages, scorers):
+    """Worker task: score messages and write them at rows start..start+len"""
+    handles, arrays = _attach(blocks, length, result_columns(scorers))
+    try:
+        results = score_block(messages, scorers)
+        stop = start + len(messages)
+        for col, values in results.items():
+            arrays[col][start:stop] = values
+    finally:
+        del arrays
+        for handle in handles.values():
+            handle.close()
+    return len(messages)
+
+
+def parallel_score(messages, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, executor=None,
+                   scorers=PARALLEL_SCORERS):
+    """Score a message column across processes with the named scorers.
+
+    Returns a dict of numpy arrays keyed by their result columns, in input
+    order. Pass an existing ProcessPoolExecutor to avoid starting workers per
+    call. Inputs that fit in one chunk are scored in-process.
+    """
+    messages = [m if isinstance(m, str) else str(m) for m in messages]
+    length = len(messages)
+    if length <= chunk_size or workers == 1:
+        return score_block(messages, scorers)
+
+    columns = result_columns(scorers)
+    handles = {col: shared_memory.SharedMemory(create=True, size=max(1, length * np.dtype(dtype).itemsize))
+               for col, dtype in columns.items()}
+    blocks = {col: handle.name for col, handle in handles.items()}
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+    try:
+        futures = [executor.submit(_score_range, blocks, length, start, messages[start:start + chunk_size], scorers)
+                   for start in range(0, length, chunk_size)]
+        scored = sum(future.result() for future in futures)
+        if scored != length:
+            raise RuntimeError(f"Scored {scored} of {length} messages")
+        # Copy out so the shared blocks can be released
+        return {col: np.ndarray((length,), dtype=dtype, buffer=handles[col].buf).copy()
+                for col, dtype in columns.items()}
+    finally:
+        if own_executor:
+            executor.shutdown()
+        for handle in handles.values():
+            handle.close()
+            handle.unlink()
+
+
+def _scan_rows(results):
+    """Heuristic result rows in scan_message order, as cached by make_score_cache"""
+    return list(zip(*(results[col].tolist() for col in ['suspicion_score'] + FLAG_COLUMNS)))
+
+
+def parallel_score_frame(df, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, executor=None,
+                         include_ga=False, cache=None, scorers=None):
+    """Parallel counterpart of chat_core.score_frame; include_ga adds the GA score columns.
+
+    scorers names the registered scorers to run instead. With a cache from
+    chat_core.make_score_cache (or scorers.make_scorers_cache when scorers
+    are named), only messages missing from it are sent to the workers.
+    """
+    results_df = df.copy(deep=False)
+    messages = results_df['message'].astype(str)
+    names = scorers or (('heuristic', 'ga') if include_ga else ('heuristic',))
+    if cache is None:
+        results = parallel_score(messages, workers=workers, chunk_size=chunk_size, executor=executor,
+                                 scorers=names)
+    elif scorers is not None:
+        rows = cache.map(messages, compute=lambda misses: result_rows(
+            parallel_score(misses, workers=workers, chunk_size=chunk_size, executor=executor, scorers=names),
+            names))
+        results = row_columns(rows, names)
+    else:
+        if include_ga:
+            raise ValueError("include_ga cannot be combined with a heuristic score cache")
+        rows = cache.map(messages, compute=lambda misses: _scan_rows(
+            parallel_score(misses, workers=workers, chunk_size=chunk_size, executor=executor,
+                           scorers=names)))
+        results = scan_columns(rows)
+        results['is_suspicious'] = results['suspicion_score'] >= SUSPICION_THRESHOLD
+    for col in result_columns(names):
+        results_df[col] = results[col]
+    return results_df
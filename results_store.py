@@ -0,0 +1,344 @@
+"""Columnar on-disk store for scored chat results.
+
+A store is a directory (``case.results``) holding one raw binary file per
+column plus ``meta.json`` describing the columns. Reopening a store needs no
+text parsing:
+
+* numeric, boolean and datetime columns are raw numpy arrays, opened as
+  read-only memory maps;
+* low-cardinality text columns (sender, receiver) are int32 codes into a
+  category list kept in ``meta.json``;
+* other text (the messages) is a UTF-8 heap with int64 character offsets,
+  decoded only when the column is read, one block of HEAP_BLOCK_ROWS rows
+  at a time; a read of a few rows decodes only their blocks.
+
+Readers load only the columns they ask for, so plotting scores per sender
+never touches the message heap.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+RESULTS_SUFFIX = '.results'
+FORMAT_NAME = 'chatanalyzer-results'
+FORMAT_VERSION = 1
+
+# Text columns with fewer distinct values than this share of rows are dictionary-encoded
+DICT_RATIO = 0.5
+
+# Rows per independently decodable block of a text heap
+HEAP_BLOCK_ROWS = 1 << 16
+
+# Metadata of indexes built from the rows (search_index); removing it marks them stale
+DERIVED_META = ('search.json',)
+
+
+def is_store_path(path):
+    """True for output paths that should be written as a results store"""
+    return str(path).rstrip('/\\').endswith(RESULTS_SUFFIX)
+
+
+def _numeric_values(values):
+    """values as a numpy array when they are numbers, booleans or datetimes; None for text.
+
+    Numbers or booleans with missing values (an int column of a CSV chunk
+    with blanks arrives as objects) become float64 with NaN, and a chunk with
+    nothing but missing values becomes all-NaN float64.
+    """
+    if values.dtype.kind in 'biu' and values.hasnans:
+        return values.to_numpy(dtype=np.float64, na_value=np.nan)
+    if values.dtype.kind in 'biufmM':
+        return values.to_numpy()
+    kind = pd.api.types.infer_dtype(values, skipna=True)
+    if kind == 'empty':
+        return np.full(len(values), np.nan)
+    if kind in ('boolean', 'integer', 'floating', 'mixed-integer-float'):
+        if values.isna().any():
+            return pd.to_numeric(values).to_numpy(dtype=np.float64)
+        return np.array(values.tolist())
+    return None
+
+
+def _text_encoding(values):
+    if values.nunique() < max(1, len(values) * DICT_RATIO):
+        return 'dict'
+    return 'heap'
+
+
+def _common_dtype(stored, data):
+    """dtype a numpy column of dtype stored needs to also hold data; None when only text can hold both"""
+    if data.dtype.kind == 'f' and np.isnan(data).all():
+        # Missing values fit any column that has a missing value of its own
+        if stored.kind in 'fmM':
+            return stored
+        return np.dtype(np.float64)
+    if (stored.kind in 'mM') != (data.dtype.kind in 'mM'):
+        return None
+    try:
+        return np.result_type(stored, data.dtype)
+    except TypeError:
+        return None
+
+
+def _missing(data):
+    if data.dtype.kind == 'f':
+        return np.isnan(data)
+    if data.dtype.kind in 'mM':
+        return np.isnat(data)
+    return np.zeros(len(data), dtype=bool)
+
+
+class ResultsWriter:
+    """Append scored chunks to a results store; close() writes the metadata.
+
+    With append=True the chunks are added to an existing store, which must
+    have the same columns. Entries in attrs (e.g. the platform) are saved in
+    the metadata.
+    """
+
+    def __init__(self, path, append=False):
+        self.path = str(path)
+        self.meta = None
+        self.categories = {}
+        self.attrs = {}
+        for name in DERIVED_META:
+            if os.path.exists(os.path.join(self.path, name)):
+                os.remove(os.path.join(self.path, name))
+        if append and os.path.exists(os.path.join(self.path, 'meta.json')):
+            self.meta = _read_meta(self.path)
+            self.attrs = self.meta.get('attrs', {})
+            self.categories = {col['name']: {v: i for i, v in enumerate(col['categories'])}
+                               for col in self.meta['columns'] if col['encoding'] == 'dict'}
+        else:
+            os.makedirs(self.path, exist_ok=True)
+            for name in os.listdir(self.path):
+                if name.startswith('c') and name.endswith(('.bin', '.offsets', '.nulls')):
+                    os.remove(os.path.join(self.path, name))
+
+    def _file(self, i, ext):
+        return open(os.path.join(self.path, f"c{i}.{ext}"), 'ab')
+
+    def write(self, chunk):
+        """Append one DataFrame chunk.
+
+        Column encodings are chosen from the first chunk. When a later chunk
+        does not fit (text in a column that was all missing, NaN in an int
+        column), the column is widened by rewriting what was stored so far.
+        """
+        if self.meta is None:
+            self.meta = {'format': FORMAT_NAME, 'version': FORMAT_VERSION, 'rows': 0, 'columns': []}
+            for name in chunk.columns:
+                column = {'name': str(name)}
+                data = _numeric_values(chunk[name])
+                if data is not None:
+                    column.update(encoding='numpy', dtype=data.dtype.str)
+                else:
+                    self._start_text(column, _text_encoding(chunk[name]))
+                self.meta['columns'].append(column)
+        names = [col['name'] for col in self.meta['columns']]
+        if [str(c) for c in chunk.columns] != names:
+            raise ValueError(f"Chunk columns {list(chunk.columns)} do not match the store columns {names}")
+
+        for i, column in enumerate(self.meta['columns']):
+            values = chunk.iloc[:, i]
+            if column['encoding'] == 'numpy':
+                data = _numeric_values(values)
+                stored = np.dtype(column['dtype'])
+                dtype = None if data is None else _common_dtype(stored, data)
+                if dtype is None:
+                    self._widen_to_text(i, column, _text_encoding(values))
+                elif dtype != stored:
+                    self._widen_numpy(i, column, dtype)
+            if column['encoding'] == 'numpy':
+                if data.dtype.kind == 'f' and np.dtype(column['dtype']).kind in 'mM':
+                    data = np.full(len(data), np.datetime64('NaT'), dtype=column['dtype'])
+                self._append_numpy(i, data.astype(column['dtype'], copy=False))
+            else:
+                self._append_text(i, column, values, self.meta['rows'])
+        self.meta['rows'] += len(chunk)
+
+    def _start_text(self, column, encoding):
+        column['encoding'] = encoding
+        if encoding == 'dict':
+            self.categories[column['name']] = {}
+        else:
+            column['chars'] = 0
+            # Byte position of every HEAP_BLOCK_ROWS-th row in the heap
+            column['blocks'] = []
+
+    def _append_numpy(self, i, data):
+        with self._file(i, 'bin') as f:
+            f.write(np.ascontiguousarray(data).tobytes())
+
+    def _append_text(self, i, column, values, first_row):
+        if column['encoding'] == 'dict':
+            # Codes index the store-wide category list; -1 marks a missing value
+            lookup = self.categories[column['name']]
+            codes, uniques = pd.factorize(values)
+            mapping = np.array([lookup.setdefault(str(v), len(lookup)) for v in uniques] + [-1],
+                               dtype=np.int32)
+            with self._file(i, 'bin') as f:
+                f.write(mapping[codes].tobytes())
+            return
+        nulls = values.isna().to_numpy()
+        texts = values.astype(object).where(~nulls, '').astype(str).tolist()
+        lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+        offsets = column['chars'] + np.cumsum(lengths)
+        column['chars'] = int(offsets[-1]) if len(offsets) else column['chars']
+        blocks = column.get('blocks')
+        with self._file(i, 'bin') as f:
+            if blocks is None:
+                # A store written before heaps had blocks is decoded as one block
+                f.write(''.join(texts).encode('utf-8', 'surrogatepass'))
+            else:
+                start, row = 0, first_row
+                while start < len(texts):
+                    if row % HEAP_BLOCK_ROWS == 0:
+                        blocks.append(f.tell())
+                    stop = min(len(texts), start + HEAP_BLOCK_ROWS - row % HEAP_BLOCK_ROWS)
+                    f.write(''.join(texts[start:stop]).encode('utf-8', 'surrogatepass'))
+                    row += stop - start
+                    start = stop
+        with self._file(i, 'offsets') as f:
+            f.write(offsets.tobytes())
+        with self._file(i, 'nulls') as f:
+            f.write(nulls.tobytes())
+
+    def _stored_numpy(self, i, column):
+        return np.fromfile(os.path.join(self.path, f"c{i}.bin"), dtype=np.dtype(column['dtype']),
+                           count=self.meta['rows'])
+
+    def _widen_numpy(self, i, column, dtype):
+        """Rewrite a numpy column with a dtype that also holds the next chunk (int -> float)"""
+        stored = self._stored_numpy(i, column)
+        os.remove(os.path.join(self.path, f"c{i}.bin"))
+        column['dtype'] = np.dtype(dtype).str
+        self._append_numpy(i, stored.astype(dtype))
+
+    def _widen_to_text(self, i, column, encoding):
+        """Rewrite a numpy column as text because the next chunk holds text"""
+        stored = self._stored_numpy(i, column)
+        os.remove(os.path.join(self.path, f"c{i}.bin"))
+        del column['dtype']
+        self._start_text(column, encoding)
+        self._append_text(i, column, pd.Series(stored.astype(object)).where(~_missing(stored)), 0)
+
+    def close(self):
+        if self.meta is None:
+            return
+        for column in self.meta['columns']:
+            if column['encoding'] == 'dict':
+                column['categories'] = list(self.categories[column['name']])
+        self.meta['attrs'] = self.attrs
+        tmp_path = os.path.join(self.path, 'meta.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(self.path, 'meta.json'))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_meta(path):
+    with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('format') != FORMAT_NAME or meta.get('version') != FORMAT_VERSION:
+        raise ValueError(f"{path} is not a version {FORMAT_VERSION} results store")
+    return meta
+
+
+def write_results(df, path, **attrs):
+    """Write a whole scored DataFrame as a results store"""
+    with ResultsWriter(path) as writer:
+        writer.attrs.update(attrs)
+        writer.write(df)
+
+
+class ResultsStore:
+    """Read-only access to a results store, one column at a time"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.meta = _read_meta(self.path)
+        self.num_rows = self.meta['rows']
+        self.attrs = self.meta.get('attrs', {})
+        self._columns = {col['name']: (i, col) for i, col in enumerate(self.meta['columns'])}
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def __len__(self):
+        return self.num_rows
+
+    def encoding(self, name):
+        """'numpy', 'dict' or 'heap'; only heap columns need decoding"""
+        return self._columns[name][1]['encoding']
+
+    def _map(self, i, ext, dtype):
+        if self.num_rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, f"c{i}.{ext}"), dtype=dtype, mode='r', shape=(self.num_rows,))
+
+    def column(self, name, rows=None):
+        """One column: a memory-mapped array, a Categorical, or decoded text.
+
+        With rows (positions), only those rows are returned, and a text heap
+        decodes only the blocks holding them.
+        """
+        i, column = self._columns[name]
+        if column['encoding'] == 'numpy':
+            values = self._map(i, 'bin', np.dtype(column['dtype']))
+            return values if rows is None else values[rows]
+        if column['encoding'] == 'dict':
+            codes = np.asarray(self._map(i, 'bin', np.int32))
+            return pd.Categorical.from_codes(codes if rows is None else codes[rows], column['categories'])
+
+        nulls = self._map(i, 'nulls', np.bool_)
+        if rows is None:
+            values = np.empty(self.num_rows, dtype=object)
+            for first, texts in self._heap_blocks(i, column, range(self._block_count(column))):
+                values[first:first + len(texts)] = texts
+            values[np.asarray(nulls)] = np.nan
+            return values
+
+        rows = np.asarray(rows, dtype=np.int64)
+        block_rows = HEAP_BLOCK_ROWS if 'blocks' in column else max(1, self.num_rows)
+        values = np.empty(len(rows), dtype=object)
+        for first, texts in self._heap_blocks(i, column, np.unique(rows // block_rows)):
+            inside = (rows >= first) & (rows < first + len(texts))
+            values[inside] = [texts[r - first] for r in rows[inside].tolist()]
+        values[nulls[rows]] = np.nan
+        return values
+
+    def _block_count(self, column):
+        if 'blocks' not in column:
+            return 1 if self.num_rows else 0
+        return len(column['blocks'])
+
+    def _heap_blocks(self, i, column, blocks):
+        """(first row, decoded texts) of the given blocks of a heap column"""
+        block_rows = HEAP_BLOCK_ROWS if 'blocks' in column else self.num_rows
+        byte_starts = column.get('blocks', [0])
+        ends = self._map(i, 'offsets', np.int64)
+        with open(os.path.join(self.path, f"c{i}.bin"), 'rb') as f:
+            for block in blocks:
+                block = int(block)
+                first, last = block * block_rows, min((block + 1) * block_rows, self.num_rows)
+                f.seek(byte_starts[block])
+                size = byte_starts[block + 1] - byte_starts[block] if block + 1 < len(byte_starts) else -1
+                text = f.read(size).decode('utf-8', 'surrogatepass')
+                # Offsets count characters from the start of the heap, not bytes
+                base = int(ends[first - 1]) if first else 0
+                stops = (ends[first:last] - base).tolist()
+                yield first, list(map(text.__getitem__, map(slice, [0] + stops[:-1], stops)))
+
+    def read(self, columns=None):
+        """DataFrame of the given columns (all by default), in store order"""
+        names = self.columns if columns is None else list(columns)
+        return pd.DataFrame({name: self.column(name) for name in names}, copy=False)
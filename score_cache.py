@@ -0,0 +1,150 @@
+"""Memoized message scores keyed by message text and scorer version.
+
+Chat exports repeat the same short messages many times, and forwarded
+messages repeat across devices. ScoreCache keeps the result for each
+distinct message in an in-process LRU, optionally backed by a SQLite file so
+results survive between runs. Every entry is stored under the scorer's
+version fingerprint, so retrained weights or edited lexicons never reuse
+stale scores.
+"""
+import hashlib
+import json
+import sqlite3
+from collections import OrderedDict
+
+DEFAULT_MAXSIZE = 200000
+
+# SQLite limits the number of bound parameters per statement
+_SQL_BATCH = 500
+
+
+def fingerprint(*parts):
+    """Stable short hash of scorer parameters (sets are hashed in sorted order)"""
+    def canonical(value):
+        if isinstance(value, (set, frozenset)):
+            return sorted(canonical(v) for v in value)
+        if isinstance(value, (list, tuple)):
+            return [canonical(v) for v in value]
+        if isinstance(value, dict):
+            return {str(k): canonical(v) for k, v in sorted(value.items())}
+        return value if isinstance(value, (str, int, float, bool, type(None))) else repr(value)
+    payload = json.dumps([canonical(p) for p in parts], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def normalize(message):
+    """Cache key text; surrounding whitespace never changes a score"""
+    return message.strip() if isinstance(message, str) else ''
+
+
+class ScoreCache:
+    """LRU of per-message results with an optional persistent SQLite store.
+
+    compute takes a list of distinct normalized messages and returns one
+    JSON-serializable result per message.
+    """
+
+    def __init__(self, compute, version, maxsize=DEFAULT_MAXSIZE, path=None):
+        self.compute = compute
+        self.version = version
+        self.maxsize = maxsize
+        self.path = path
+        self._memory = OrderedDict()
+        self._db = None
+        if path is not None:
+            # The GUI scores on a worker thread; calls are never concurrent
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS scores ("
+                             "version TEXT, digest BLOB, value TEXT, PRIMARY KEY (version, digest))")
+            self._db.commit()
+        self.lookups = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.computed = 0
+
+    @staticmethod
+    def _digest(text):
+        return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+    def _remember(self, text, value):
+        self._memory[text] = value
+        self._memory.move_to_end(text)
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _load(self, texts):
+        """Fetch texts from the persistent store, returning {text: value}"""
+        found = {}
+        digests = {self._digest(t): t for t in texts}
+        keys = list(digests)
+        for start in range(0, len(keys), _SQL_BATCH):
+            batch = keys[start:start + _SQL_BATCH]
+            rows = self._db.execute(
+                f"SELECT digest, value FROM scores WHERE version = ? AND digest IN ({','.join('?' * len(batch))})",
+                [self.version] + batch)
+            for digest, value in rows:
+                found[digests[digest]] = json.loads(value)
+        return found
+
+    def _store(self, values):
+        self._db.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?, ?)",
+                             [(self.version, self._digest(t), json.dumps(v)) for t, v in values.items()])
+        self._db.commit()
+
+    def map(self, messages, compute=None):
+        """Return the result for every message, computing only unseen ones"""
+        texts = [normalize(m) for m in messages]
+        self.lookups += len(texts)
+
+        results = {}
+        missing = []
+        for text in dict.fromkeys(texts):
+            value = self._memory.get(text)
+            if value is None:
+                missing.append(text)
+            else:
+                self._memory.move_to_end(text)
+                results[text] = value
+
+        if missing and self._db is not None:
+            loaded = self._load(missing)
+            self.disk_hits += len(loaded)
+            results.update(loaded)
+            missing = [t for t in missing if t not in loaded]
+            for text, value in loaded.items():
+                self._remember(text, value)
+
+        if missing:
+            computed = dict(zip(missing, (compute or self.compute)(missing)))
+            self.computed += len(computed)
+            results.update(computed)
+            for text, value in computed.items():
+                self._remember(text, value)
+            if self._db is not None:
+                self._store(computed)
+
+        self.memory_hits = self.lookups - self.disk_hits - self.computed
+        return [results[t] for t in texts]
+
+    def stats(self):
+        """Lookup counters; hit_rate is the share of messages not recomputed"""
+        return {
+            'version': self.version,
+            'lookups': self.lookups,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'computed': self.computed,
+            'hit_rate': 1 - self.computed / self.lookups if self.lookups else 0.0,
+            'entries': len(self._memory),
+        }
+
+    def prune(self):
+        """Delete persistent entries written by other scorer versions"""
+        if self._db is not None:
+            self._db.execute("DELETE FROM scores WHERE version != ?", (self.version,))
+            self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,208 @@
+"""Registry of message scorers that share one featurization pass.
+
+Every scorer declares the shared features it reads and the result columns it
+adds. score_messages() computes the features the enabled scorers need in
+one pass over the messages, lower-casing each message once:
+
+* 'keyword_hits': the chat_core.KEYWORD_MATCHER scan of the lower-cased
+  text. The automaton already holds the GA lexicons next to the heuristic
+  keywords and detector literals, so one scan serves both scorers.
+* 'numbers': the count of number tokens ("50", "5g") per message.
+* 'ga_features': the drug_scorer feature matrix, built from those hits and
+  number counts instead of a second scan.
+
+Each scorer then adds its own columns, so the heuristic score and the GA
+score of the same messages can be compared or combined at the cost of one
+featurization. New scorers are added with register_scorer().
+
+Like chat_core, this module imports only the standard library and numpy.
+"""
+import numpy as np
+
+import drug_scorer
+from chat_core import (FLAG_COLUMNS, KEYWORD_MATCHER, SCORE_DTYPE, SCORER_VERSION, SUSPICION_THRESHOLD,
+                       scan_columns, scan_hits)
+from instrumentation import stage
+from score_cache import DEFAULT_MAXSIZE, ScoreCache, fingerprint
+
+# Shared features and the features each one is computed from
+FEATURES = {
+    'keyword_hits': (),
+    'numbers': (),
+    'ga_features': ('keyword_hits', 'numbers'),
+}
+
+DEFAULT_SCORERS = ('heuristic',)
+
+# The analysis aggregates (chat_stream summaries, conversation windows, the
+# contact graph) are built from this scorer's suspicion_score/is_suspicious
+AGGREGATE_SCORER = 'heuristic'
+
+
+class Scorer:
+    """A registered scorer: the shared features it reads and the columns it adds.
+
+    score takes a FeatureBatch and returns one array per entry of columns.
+    version changes whenever its scores would, and keys cached results.
+    """
+
+    def __init__(self, name, features, columns, score, version):
+        self.name = name
+        self.features = tuple(features)
+        self.columns = dict(columns)
+        self.score = score
+        self.version = version
+
+
+SCORERS = {}
+
+
+def register_scorer(name, features, columns, score, version):
+    """Add a scorer to the registry; returns it"""
+    unknown = [feature for feature in features if feature not in FEATURES]
+    if unknown:
+        raise ValueError(f"Scorer {name!r} needs unknown features {unknown}")
+    SCORERS[name] = Scorer(name, features, columns, score, version)
+    return SCORERS[name]
+
+
+def get_scorers(names=DEFAULT_SCORERS):
+    """Registered scorers by name, in the given order"""
+    missing = [name for name in names if name not in SCORERS]
+    if missing:
+        raise ValueError(f"Unknown scorers {missing}; registered: {sorted(SCORERS)}")
+    return [SCORERS[name] for name in names]
+
+
+def check_analysis_scorers(names):
+    """Raise ValueError unless names can drive an analysis, i.e. include AGGREGATE_SCORER"""
+    get_scorers(names)
+    if AGGREGATE_SCORER not in names:
+        raise ValueError(f"Scorers {','.join(names)} lack {AGGREGATE_SCORER!r}, whose suspicion_score and "
+                         f"is_suspicious the analysis summaries are built from; use e.g. "
+                         f"{','.join((AGGREGATE_SCORER,) + tuple(names))}")
+
+
+def parse_scorers(text):
+    """Scorer names for an analysis from a comma-separated command-line value"""
+    names = tuple(name.strip() for name in text.split(',') if name.strip())
+    check_analysis_scorers(names)
+    return names
+
+
+def result_columns(names=DEFAULT_SCORERS):
+    """dtype of every column the named scorers add, in scorer order"""
+    columns = {}
+    for scorer in get_scorers(names):
+        columns.update(scorer.columns)
+    return columns
+
+
+def result_rows(results, names=DEFAULT_SCORERS):
+    """Per-message tuples of score_messages results, as stored by make_scorers_cache"""
+    return list(zip(*(results[col].tolist() for col in result_columns(names))))
+
+
+def row_columns(rows, names=DEFAULT_SCORERS):
+    """Inverse of result_rows: one numpy array per result column"""
+    columns = result_columns(names)
+    values = zip(*rows) if len(rows) else [()] * len(columns)
+    return {col: np.array(v, dtype=dtype) for (col, dtype), v in zip(columns.items(), values)}
+
+
+def scorers_version(names=DEFAULT_SCORERS):
+    """Fingerprint of the named scorers; changes when any of them changes"""
+    return fingerprint([(scorer.name, scorer.version) for scorer in get_scorers(names)])
+
+
+class FeatureBatch:
+    """The shared features of a list of messages, each computed once"""
+
+    def __init__(self, messages, features):
+        needed = set()
+        pending = list(features)
+        while pending:
+            feature = pending.pop()
+            if feature not in needed:
+                needed.add(feature)
+                pending.extend(FEATURES[feature])
+        self.messages = [m if isinstance(m, str) else '' for m in messages]
+        self.keyword_hits = [] if 'keyword_hits' in needed else None
+        self.numbers = [] if 'numbers' in needed else None
+
+        # One lower-casing and one automaton scan per message, whatever the scorers
+        for message in self.messages:
+            text = message.lower()
+            if self.keyword_hits is not None:
+                self.keyword_hits.append(KEYWORD_MATCHER.scan(text))
+            if self.numbers is not None:
+                self.numbers.append(drug_scorer.count_numbers(text))
+        self.ga_features = (drug_scorer.features_from_hits(self.keyword_hits, self.numbers)
+                            if 'ga_features' in needed else None)
+
+    def __len__(self):
+        return len(self.messages)
+
+
+def score_messages(messages, names=DEFAULT_SCORERS, cache=None, metrics=None):
+    """Score messages with the named scorers; returns one numpy array per result column.
+
+    With a cache from make_scorers_cache for the same names, each distinct
+    message is featurized and scored once.
+    """
+    scorers = get_scorers(names)
+    if cache is not None:
+        return row_columns(cache.map(messages), names)
+
+    with stage(metrics, 'featurize', len(messages)):
+        batch = FeatureBatch(messages, {feature for scorer in scorers for feature in scorer.features})
+    results = {}
+    for scorer in scorers:
+        with stage(metrics, f'score_{scorer.name}', len(batch)):
+            scored = scorer.score(batch)
+        results.update({col: np.asarray(scored[col], dtype=dtype) for col, dtype in scorer.columns.items()})
+    return results
+
+
+def make_scorers_cache(names=DEFAULT_SCORERS, path=None, maxsize=DEFAULT_MAXSIZE):
+    """Cache of score_messages results per message; path adds a persistent SQLite store"""
+    return ScoreCache(lambda messages: result_rows(score_messages(messages, names), names),
+                      scorers_version(names), maxsize, path)
+
+
+def _heuristic(batch):
+    results = scan_columns([scan_hits(message, hits) for message, hits in zip(batch.messages, batch.keyword_hits)])
+    results['is_suspicious'] = results['suspicion_score'] >= SUSPICION_THRESHOLD
+    return results
+
+
+def ga_weights_version(weights, threshold):
+    """Version of the 'ga' scorer with these weights; raises ValueError for the wrong number of weights"""
+    weights = np.array(weights, dtype=float)
+    if weights.shape != (drug_scorer.N_FEATURES,):
+        raise ValueError(f"GA weights need {drug_scorer.N_FEATURES} values, got {weights.size}")
+    return fingerprint(weights.tolist(), float(threshold), drug_scorer.FEATURE_VERSION)
+
+
+def register_ga_weights(weights=drug_scorer.WEIGHTS, threshold=drug_scorer.THRESHOLD):
+    """Register the 'ga' scorer with the given weights, replacing the current ones.
+
+    Batches already running keep the scorer they started with. The version
+    matches drug_scorer.MODEL_VERSION for the weights in drug_scorer.py.
+    """
+    version = ga_weights_version(weights, threshold)
+    weights = np.array(weights, dtype=float)
+    threshold = float(threshold)
+
+    def score(batch):
+        scores, is_drug = drug_scorer.predict_features(batch.ga_features, weights, threshold)
+        return {'ga_score': scores, 'ga_is_drug': is_drug}
+    return register_scorer('ga', ['ga_features'], {'ga_score': np.float32, 'ga_is_drug': np.bool_},
+                           score, version)
+
+
+register_scorer('heuristic', ['keyword_hits'],
+                dict({'suspicion_score': SCORE_DTYPE, 'is_suspicious': np.bool_},
+                     **{col: np.bool_ for col in FLAG_COLUMNS}),
+                _heuristic, SCORER_VERSION)
+register_ga_weights()
@@ -0,0 +1,512 @@
+"""Local scoring service for other tools: HTTP over TCP or a Unix socket.
+
+Messages are scored with the same scorers as the GUI (the keyword heuristic
+with its detectors, and the GA model), without importing Qt, matplotlib or
+pandas. Requests from all connections go into one queue; the batcher
+collects them into micro-batches of up to --max-batch messages, waiting at
+most --max-wait-ms after the first one, and scores each batch with one
+scorers.score_messages call (one shared featurization, one matrix product
+for the GA scores). Batches run in a worker thread, or in --processes
+worker processes to use more cores, so the event loop keeps accepting
+requests while a batch is scored. Repeated messages come from a score cache.
+
+The GA weights are read from ga_weights_report.json at start and reloaded
+when the file changes (or on POST /reload). A reload only replaces the
+weights used by the next batches, so no request fails or waits for it.
+
+    python scoring_service.py serve --port 8765
+    python scoring_service.py serve --unix /tmp/chatanalyzer.sock
+    curl -s localhost:8765/score -d '{"messages": ["ready stock, cod tonight", "hi"]}'
+    python scoring_service.py bench --port 8765 --clients 32 --batch 20
+
+Endpoints:
+
+    POST /score    {"messages": [...]} -> {"model": version, "results": [{column: value, ...}, ...]}
+    POST /reload   reload the weights file now
+    GET  /metrics  request latency percentiles, batch sizes and messages per second
+    GET  /health
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import socket
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import scorers
+from instrumentation import max_rss_mb
+from score_cache import DEFAULT_MAXSIZE
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_WEIGHTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ga_weights_report.json')
+
+SERVICE_SCORERS = ('heuristic', 'ga')
+
+# Messages per micro-batch, and the longest a request waits for others to join its batch
+DEFAULT_MAX_BATCH = 4096
+DEFAULT_MAX_WAIT_MS = 5.0
+
+# Seconds between checks of the weights file
+RELOAD_INTERVAL = 2.0
+
+# Requests whose latencies the percentiles are computed from, and the throughput window
+LATENCY_SAMPLES = 10000
+THROUGHPUT_WINDOW = 10.0
+
+MAX_BODY_BYTES = 64 << 20
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+def load_weights(path):
+    """(weights, threshold) from a ga_trainer report; raises ValueError when unusable"""
+    with open(path, encoding='utf-8') as f:
+        report = json.load(f)
+    feature_order = report.get('feature_order')
+    if feature_order is not None and feature_order != [name for name, _ in scorers.drug_scorer.LEXICONS] + [
+            'numbers', 'bias']:
+        raise ValueError(f"{path} was trained on features {feature_order}")
+    try:
+        return [float(w) for w in report['weights']], float(report['threshold'])
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"{path} has no usable weights/threshold: {e}") from None
+
+
+# Worker side. These run in the worker thread or in each worker process,
+# one batch at a time per worker, so the cache needs no lock. Only workers
+# register GA weights, so the weights a batch is scored with always belong
+# to the version its responses carry.
+
+_cache = None
+
+
+def _use_model(model):
+    global _cache
+    version, weights, threshold = model
+    if scorers.SCORERS['ga'].version != version:
+        scorers.register_ga_weights(weights, threshold)
+    if _cache is None or _cache.version != scorers.scorers_version(SERVICE_SCORERS):
+        _cache = scorers.make_scorers_cache(SERVICE_SCORERS, maxsize=DEFAULT_MAXSIZE)
+
+
+def score_batch(messages, sizes, model):
+    """Score one micro-batch; returns the JSON response body of each request.
+
+    sizes are the message counts of the batched requests, in order. model
+    is (version, weights, threshold) of the GA weights to use.
+    """
+    _use_model(model)
+    results = scorers.score_messages(messages, SERVICE_SCORERS, cache=_cache)
+    columns = list(results)
+    rows = zip(*(results[col].tolist() for col in columns))
+    bodies = []
+    for size in sizes:
+        chunk = [dict(zip(columns, next(rows))) for _ in range(size)]
+        bodies.append(json.dumps({'model': model[0], 'results': chunk}).encode('utf-8'))
+    return bodies
+
+
+class ServiceMetrics:
+    """Bounded latency and throughput statistics of a running service"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.counters = dict.fromkeys(['requests', 'messages', 'batches', 'errors', 'reloads', 'reload_errors'], 0)
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.batch_times = deque(maxlen=LATENCY_SAMPLES)
+        self.batch_sizes = deque(maxlen=LATENCY_SAMPLES)
+        # (finish time, messages) of recent batches for the current rate
+        self.recent = deque()
+
+    def record_batch(self, requests, messages, seconds):
+        now = time.monotonic()
+        self.counters['batches'] += 1
+        self.counters['requests'] += requests
+        self.counters['messages'] += messages
+        self.batch_times.append(seconds)
+        self.batch_sizes.append(messages)
+        self.recent.append((now, messages))
+        while self.recent and self.recent[0][0] < now - THROUGHPUT_WINDOW:
+            self.recent.popleft()
+
+    def record_latency(self, seconds):
+        self.latencies.append(seconds)
+
+    @staticmethod
+    def _percentiles(values):
+        if not values:
+            return {}
+        ordered = sorted(values)
+        pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+        return {'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99), 'max': pick(1.0)}
+
+    def snapshot(self, queue_depth=0):
+        uptime = time.monotonic() - self.started
+        window = min(THROUGHPUT_WINDOW, uptime) or 1.0
+        return dict(self.counters,
+                    uptime_s=round(uptime, 1),
+                    messages_per_second=round(sum(n for _, n in self.recent) / window, 1),
+                    mean_messages_per_second=round(self.counters['messages'] / (uptime or 1.0), 1),
+                    mean_batch_messages=round(sum(self.batch_sizes) / len(self.batch_sizes), 1)
+                    if self.batch_sizes else 0,
+                    request_latency_ms=self._percentiles(self.latencies),
+                    batch_ms=self._percentiles(self.batch_times),
+                    queue_depth=queue_depth,
+                    max_rss_mb=max_rss_mb())
+
+
+class ScoringService:
+    """Micro-batching scorer behind an asyncio HTTP/1.1 server"""
+
+    def __init__(self, weights_path=DEFAULT_WEIGHTS, max_batch=DEFAULT_MAX_BATCH,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS, processes=0):
+        self.weights_path = weights_path
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.processes = processes
+        self.metrics = ServiceMetrics()
+        self.model = None
+        self.weights_mtime = None
+        self.queue = None
+        self.executor = None
+        self._tasks = []
+        self._servers = []
+
+    # Weights
+
+    def reload(self):
+        """Load the weights file if present; a bad file keeps the current weights.
+
+        Only the model tuple is swapped here. The scorer registry is updated
+        by the worker that scores the next batch (see _use_model), so a batch
+        never mixes the weights of one version with the label of another.
+        """
+        loaded = False
+        try:
+            # A file that fails to load is retried only once it changes again
+            self.weights_mtime = os.stat(self.weights_path).st_mtime_ns
+            weights, threshold = load_weights(self.weights_path)
+            version = scorers.ga_weights_version(weights, threshold)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            self.metrics.counters['reload_errors'] += 1
+            print(f"Keeping current weights: {e}", file=sys.stderr)
+        else:
+            if self.model is not None and self.model[0] != version:
+                self.metrics.counters['reloads'] += 1
+            self.model = (version, weights, threshold)
+            loaded = True
+        if self.model is None:
+            weights, threshold = scorers.drug_scorer.WEIGHTS.tolist(), scorers.drug_scorer.THRESHOLD
+            self.model = (scorers.ga_weights_version(weights, threshold), weights, threshold)
+        return loaded
+
+    async def _watch_weights(self):
+        while True:
+            await asyncio.sleep(RELOAD_INTERVAL)
+            try:
+                mtime = os.stat(self.weights_path).st_mtime_ns
+            except OSError:
+                continue
+            if mtime != self.weights_mtime:
+                self.reload()
+
+    # Batching
+
+    async def score(self, messages):
+        """JSON response body for one request, scored in the next micro-batch"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((messages, future, time.perf_counter()))
+        return await future
+
+    async def _batcher(self):
+        loop = asyncio.get_running_loop()
+        # One batch per worker in flight; the next batch collects meanwhile
+        slots = asyncio.Semaphore(max(1, self.processes))
+        while True:
+            items = [await self.queue.get()]
+            count = len(items[0][0])
+            deadline = loop.time() + self.max_wait
+            while count < self.max_batch:
+                if self.queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self.queue.get_nowait()
+                items.append(item)
+                count += len(item[0])
+            await slots.acquire()
+            task = loop.create_task(self._run_batch(items, count))
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _run_batch(self, items, count):
+        messages = [message for item in items for message in item[0]]
+        started = time.perf_counter()
+        try:
+            bodies = await asyncio.get_running_loop().run_in_executor(
+                self.executor, score_batch, messages, [len(item[0]) for item in items], self.model)
+        except Exception as e:
+            self.metrics.counters['errors'] += 1
+            for _, future, _ in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finished = time.perf_counter()
+        self.metrics.record_batch(len(items), count, finished - started)
+        for (_, future, queued), body in zip(items, bodies):
+            self.metrics.record_latency(finished - queued)
+            if not future.done():
+                future.set_result(body)
+
+    # HTTP
+
+    async def dispatch(self, method, path, body):
+        """(status, JSON body bytes) of one request"""
+        path = path.split('?', 1)[0]
+        if path == '/score':
+            if method != 'POST':
+                return 405, _json({'error': "use POST"})
+            try:
+                messages = json.loads(body)['messages']
+            except (ValueError, KeyError, TypeError):
+                return 400, _json({'error': 'expected a JSON object {"messages": [...]}'})
+            if not isinstance(messages, list):
+                return 400, _json({'error': '"messages" must be a list'})
+            if not messages:
+                return 200, _json({'model': self.model[0], 'results': []})
+            return 200, await self.score([m if isinstance(m, str) else json.dumps(m) for m in messages])
+        if path == '/metrics':
+            return 200, _json(dict(self.metrics.snapshot(self.queue.qsize()), model=self.model[0],
+                                   max_batch=self.max_batch, max_wait_ms=self.max_wait * 1000,
+                                   processes=self.processes))
+        if path == '/health':
+            return 200, _json({'status': 'ok', 'model': self.model[0]})
+        if path == '/reload':
+            if method != 'POST':
+                return 405, _json({'error': "use POST"})
+            reloaded = self.reload()
+            return 200, _json({'reloaded': reloaded, 'model': self.model[0]})
+        return 404, _json({'error': f"no such endpoint {path}"})
+
+    async def handle(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection, keeping it alive between them"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY_BYTES:
+                    writer.write(_response(413, _json({'error': "request too large"}), False))
+                    break
+                body = await reader.readexactly(length) if length else b''
+                try:
+                    status, payload = await self.dispatch(method, path, body)
+                except Exception as e:
+                    status, payload = 500, _json({'error': str(e)})
+                keep_alive = (version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                              or headers.get('connection', '').lower() == 'keep-alive')
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+        """Start serving; returns the bound address"""
+        self.reload()
+        self.queue = asyncio.Queue()
+        self.executor = (ProcessPoolExecutor(max_workers=self.processes) if self.processes
+                         else ThreadPoolExecutor(max_workers=1))
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._batcher()), loop.create_task(self._watch_weights())]
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.remove(unix_path)
+            server = await asyncio.start_unix_server(self.handle, path=unix_path)
+            address = unix_path
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+            address = server.sockets[0].getsockname()[:2]
+        self._servers.append(server)
+        return address
+
+    async def stop(self):
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        for task in self._tasks:
+            task.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _json(value):
+    return json.dumps(value).encode('utf-8')
+
+
+def _response(status, body, keep_alive):
+    head = (f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+
+# Client side
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=30):
+        super().__init__('localhost', timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+class ScoringClient:
+    """Blocking client for other tools; keeps one connection open"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, timeout=30):
+        self.connection = (_UnixHTTPConnection(unix_path, timeout) if unix_path
+                           else http.client.HTTPConnection(host, port, timeout=timeout))
+
+    def _request(self, method, path, payload=None):
+        body = None if payload is None else json.dumps(payload).encode('utf-8')
+        self.connection.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+        response = self.connection.getresponse()
+        data = json.loads(response.read())
+        if response.status != 200:
+            raise RuntimeError(f"{path} failed ({response.status}): {data.get('error')}")
+        return data
+
+    def score(self, messages):
+        """One result dict per message: suspicion_score, flags, ga_score and ga_is_drug"""
+        return self._request('POST', '/score', {'messages': list(messages)})['results']
+
+    def metrics(self):
+        return self._request('GET', '/metrics')
+
+    def reload(self):
+        return self._request('POST', '/reload')
+
+    def close(self):
+        self.connection.close()
+
+
+async def _bench_client(host, port, unix_path, messages, batch, deadline, latencies):
+    if unix_path:
+        reader, writer = await asyncio.open_unix_connection(unix_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    sent = 0
+    try:
+        while time.perf_counter() < deadline:
+            start = (sent * batch) % max(1, len(messages) - batch)
+            body = _json({'messages': messages[start:start + batch]})
+            started = time.perf_counter()
+            writer.write(f"POST /score HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+            await writer.drain()
+            status = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':')[1])
+            await reader.readexactly(length)
+            if not status.startswith(b'HTTP/1.1 200'):
+                raise RuntimeError(f"Request failed: {status!r}")
+            latencies.append(time.perf_counter() - started)
+            sent += 1
+    finally:
+        writer.close()
+    return sent * batch
+
+
+async def run_bench(host, port, unix_path, messages, clients, batch, duration):
+    """Load the service from concurrent keep-alive clients; returns messages/s and latencies"""
+    latencies = []
+    started = time.perf_counter()
+    counts = await asyncio.gather(*[_bench_client(host, port, unix_path, messages, batch,
+                                                  started + duration, latencies) for _ in range(clients)])
+    elapsed = time.perf_counter() - started
+    return {'messages': sum(counts), 'requests': len(latencies),
+            'messages_per_second': round(sum(counts) / elapsed, 1),
+            'request_latency_ms': ServiceMetrics._percentiles(latencies)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local message scoring service")
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve = commands.add_parser('serve', help="Run the service")
+    bench = commands.add_parser('bench', help="Load a running service and report its throughput")
+    for command in (serve, bench):
+        command.add_argument('--host', default=DEFAULT_HOST, help="Address to bind / connect to")
+        command.add_argument('--port', type=int, default=DEFAULT_PORT, help="TCP port")
+        command.add_argument('--unix', help="Unix socket path instead of TCP")
+    serve.add_argument('--weights', default=DEFAULT_WEIGHTS, help="ga_trainer report to load and watch")
+    serve.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH, help="Messages per micro-batch")
+    serve.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                       help="Longest a request waits for its batch to fill")
+    serve.add_argument('--processes', type=int, default=0,
+                       help="Worker processes scoring batches in parallel (default: one worker thread)")
+    bench.add_argument('--input', default='whatsapp_drug_chats.csv', help="CSV export whose messages are sent")
+    bench.add_argument('--clients', type=int, default=32, help="Concurrent connections")
+    bench.add_argument('--batch', type=int, default=20, help="Messages per request")
+    bench.add_argument('--duration', type=float, default=10.0, help="Seconds to run")
+    args = parser.parse_args(argv)
+
+    if args.command == 'bench':
+        from chat_core import detect_platform, standardize_columns
+        from export_readers import load_export
+        df = load_export(args.input)
+        messages = standardize_columns(df, detect_platform(df.columns))['message'].astype(str).tolist()
+        result = asyncio.run(run_bench(args.host, args.port, args.unix, messages, args.clients, args.batch,
+                                       args.duration))
+        print(json.dumps(result, indent=2))
+        return 0
+
+    async def serve_forever():
+        service = ScoringService(args.weights, args.max_batch, args.max_wait_ms, args.processes)
+        address = await service.start(args.host, args.port, args.unix)
+        print(f"Scoring service on {address} (model {service.model[0]})", file=sys.stderr)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await service.stop()
+
+    try:
+        asyncio.run(serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
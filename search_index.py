@@ -0,0 +1,309 @@
+"""Inverted index for full-text search over scored messages.
+
+Messages are split into words exactly as the scorers split them
+(drug_scorer.tokenize: single CJK characters and runs of ASCII letters and
+digits, lower-cased). Exports repeat many messages, so the index is built
+over the distinct texts ("documents"): each term has a sorted postings list
+of document ids, and a second CSR maps every document to its rows.
+
+A query intersects the postings of its terms, smallest first, and expands
+the surviving documents to rows, so its cost follows the size of the
+postings involved, not the number of messages. Phrases are checked against
+the text of the documents that contain all their words; prefixes take the
+union of the postings of every term in their range of the sorted
+vocabulary. Sender, score and time filters apply to the matching rows only.
+
+Query syntax, all parts combined with AND:
+
+    ready stock          both words, anywhere in the message
+    "barang sampai"      the words in this order, next to each other
+    meth*                any word starting with "meth"
+    from:Ali to:Ben      sender / receiver
+    score>=5             heuristic suspicion score
+    after:2025-01-01 before:2025-02-01
+
+The index is saved inside a results store (search.* files), so reopening a
+case does not rebuild it; writing rows to the store drops it.
+
+    python search_index.py case.results '"ready stock" score>=3'
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from chat_stream import chunk_epoch_ms
+from contact_graph import csr_indptr, csr_slots
+from drug_scorer import TOKEN_PATTERN, tokenize
+from timestamps import EPOCH_MISSING
+
+INDEX_FORMAT = 'chatanalyzer-search'
+INDEX_VERSION = 1
+INDEX_META = 'search.json'
+
+# Distinct messages tokenized per regex call while building
+BUILD_BATCH = 200000
+
+# Separates the messages of a batch; never part of a token
+_SEPARATOR = '\x00'
+_BATCH_TOKEN = re.compile(TOKEN_PATTERN + '|' + _SEPARATOR)
+
+_QUERY_PART = re.compile(r'(?:(from|to|after|before):|(score)\s*>=\s*)?(?:"([^"]*)"?|(\S+))')
+
+_ARRAYS = ('term_indptr', 'postings', 'row_docs', 'doc_indptr', 'doc_rows')
+
+
+def parse_query(query):
+    """Parts of a query string: words, phrases and prefixes, plus the filters given"""
+    parsed = {'terms': [], 'phrases': [], 'prefixes': []}
+    for match in _QUERY_PART.finditer(query or ''):
+        field, score, quoted, word = match.groups()
+        value = quoted if quoted is not None else word
+        if field:
+            parsed['sender' if field == 'from' else 'receiver' if field == 'to' else field] = value
+            continue
+        if score:
+            try:
+                parsed['min_score'] = int(value)
+            except ValueError:
+                raise ValueError(f"score>= needs a whole number, not {value!r}") from None
+            continue
+        tokens = tokenize(value)
+        if not tokens:
+            continue
+        if quoted is None and value.endswith('*'):
+            # Only the last word of "rm5*" or "k粉*" is a prefix
+            parsed['prefixes'].append(tokens[-1])
+            parsed['terms'].extend(tokens[:-1])
+        elif len(tokens) == 1:
+            parsed['terms'].append(tokens[0])
+        else:
+            parsed['phrases'].append(tokens)
+    return parsed
+
+
+def _epoch_ms(value):
+    try:
+        return pd.Timestamp(value).value // 1000000
+    except ValueError:
+        raise ValueError(f"Not a date: {value!r}") from None
+
+
+def _contains_phrase(tokens, phrase):
+    text = _SEPARATOR + _SEPARATOR.join(tokens) + _SEPARATOR
+    return (_SEPARATOR + _SEPARATOR.join(phrase) + _SEPARATOR) in text
+
+
+class SearchIndex:
+    """Term -> document postings and document -> row lists of a scored frame"""
+
+    def __init__(self, terms, term_indptr, postings, row_docs, doc_indptr, doc_rows):
+        # Vocabulary in sorted order, as an object array for searchsorted
+        self.terms = terms
+        self.term_indptr = term_indptr
+        self.postings = postings
+        self.row_docs = row_docs
+        self.doc_indptr = doc_indptr
+        self.doc_rows = doc_rows
+
+    @property
+    def num_rows(self):
+        return len(self.row_docs)
+
+    @property
+    def num_docs(self):
+        return len(self.doc_indptr) - 1
+
+    @classmethod
+    def build(cls, messages, batch_size=BUILD_BATCH):
+        """Index a message column (Series or array); missing messages match nothing"""
+        row_docs, docs = pd.factorize(pd.Series(messages, copy=False).astype(object))
+        docs = np.asarray(docs, dtype=object)
+        term_ids = {}
+        keys = []
+        for start in range(0, len(docs), batch_size):
+            batch = [str(doc) for doc in docs[start:start + batch_size]]
+            joined = _SEPARATOR.join(batch)
+            if joined.count(_SEPARATOR) != len(batch) - 1:
+                joined = _SEPARATOR.join(doc.replace(_SEPARATOR, ' ') for doc in batch)
+            # One regex pass and one hash pass per batch instead of per message
+            codes, words = pd.factorize(np.array(_BATCH_TOKEN.findall(joined.lower()), dtype=object))
+            ids = np.array([term_ids.setdefault(word, len(term_ids)) if word != _SEPARATOR else -1
+                            for word in words], dtype=np.int64)[codes]
+            separator = ids < 0
+            doc_of_token = start + np.cumsum(separator)[~separator]
+            keys.append(np.unique((ids[~separator] << 32) | doc_of_token))
+
+        # Renumber terms in sorted order so prefixes are contiguous ranges
+        words = np.array(list(term_ids), dtype=object)
+        order = np.argsort(words, kind='stable')
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        keys = np.concatenate(keys) if keys else np.zeros(0, dtype=np.int64)
+        keys = (rank[keys >> 32] << 32) | (keys & 0xFFFFFFFF)
+        keys.sort()
+
+        present = np.flatnonzero(row_docs >= 0)
+        by_doc = present[np.argsort(row_docs[present], kind='stable')]
+        return cls(words[order], csr_indptr(keys >> 32, len(order)), (keys & 0xFFFFFFFF).astype(np.int32),
+                   row_docs.astype(np.int32), csr_indptr(row_docs[by_doc], len(docs)), by_doc.astype(np.int64))
+
+    def save(self, path):
+        """Write the index into the results store directory at path"""
+        meta_path = os.path.join(path, INDEX_META)
+        # Without its metadata a half-written index is never loaded
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        for name in _ARRAYS:
+            np.save(os.path.join(path, f"search.{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, 'search.terms'), 'w', encoding='utf-8', newline='\n') as f:
+            f.write('\n'.join(self.terms))
+        meta = {'format': INDEX_FORMAT, 'version': INDEX_VERSION, 'tokens': TOKEN_PATTERN,
+                'rows': self.num_rows, 'terms': len(self.terms)}
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    @classmethod
+    def load(cls, path, num_rows=None):
+        """The index saved in a results store, or None when missing or stale"""
+        try:
+            with open(os.path.join(path, INDEX_META), encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (meta.get('format') != INDEX_FORMAT or meta.get('version') != INDEX_VERSION
+                or meta.get('tokens') != TOKEN_PATTERN or (num_rows is not None and meta['rows'] != num_rows)):
+            return None
+        with open(os.path.join(path, 'search.terms'), encoding='utf-8', newline='\n') as f:
+            text = f.read()
+        terms = np.array(text.split('\n') if meta['terms'] else [], dtype=object)
+        arrays = [np.load(os.path.join(path, f"search.{name}.npy"), mmap_mode='r') for name in _ARRAYS]
+        return cls(terms, *arrays)
+
+    # Lookups
+
+    def _term_range(self, lo, hi):
+        return self.term_indptr[lo], self.term_indptr[hi]
+
+    def term_docs(self, term):
+        """Sorted ids of the documents containing term"""
+        i = np.searchsorted(self.terms, term)
+        if i == len(self.terms) or self.terms[i] != term:
+            return np.zeros(0, dtype=np.int32)
+        start, end = self._term_range(i, i + 1)
+        return np.asarray(self.postings[start:end])
+
+    def prefix_docs(self, prefix):
+        """Sorted ids of the documents with a word starting with prefix"""
+        lo = np.searchsorted(self.terms, prefix)
+        hi = np.searchsorted(self.terms, prefix + '\U0010ffff')
+        if lo == hi:
+            return np.zeros(0, dtype=np.int32)
+        if hi == lo + 1:
+            return self.term_docs(self.terms[lo])
+        start, end = self._term_range(lo, hi)
+        return np.unique(self.postings[start:end])
+
+    def doc_positions(self, docs):
+        """Row positions of the given documents, ascending"""
+        rows = np.asarray(self.doc_rows)[csr_slots(np.asarray(self.doc_indptr), np.asarray(docs, dtype=np.int64))]
+        rows.sort()
+        return rows
+
+    def search(self, query, results, sender=None, receiver=None, min_score=None, after=None, before=None):
+        """Row positions in results matching query and the filters, ascending.
+
+        results is the indexed frame; the keyword filters add to those in the
+        query. Raises ValueError for malformed filter values.
+        """
+        parsed = parse_query(query)
+        for name, value in (('sender', sender), ('receiver', receiver), ('min_score', min_score),
+                            ('after', after), ('before', before)):
+            if value is not None:
+                parsed[name] = value
+
+        # Every word must occur; the rarest words cut the candidates first
+        postings = [self.term_docs(term) for term in parsed['terms']]
+        postings += [self.term_docs(term) for phrase in parsed['phrases'] for term in phrase]
+        postings += [self.prefix_docs(prefix) for prefix in parsed['prefixes']]
+        if postings:
+            postings.sort(key=len)
+            docs = postings[0]
+            for other in postings[1:]:
+                if not len(docs):
+                    break
+                docs = np.intersect1d(docs, other, assume_unique=True)
+            if parsed['phrases'] and len(docs):
+                first_rows = np.asarray(self.doc_rows)[np.asarray(self.doc_indptr)[docs]]
+                texts = results['message'].iloc[first_rows]
+                keep = [all(_contains_phrase(tokenize(text if isinstance(text, str) else ''), phrase)
+                            for phrase in parsed['phrases']) for text in texts]
+                docs = docs[np.asarray(keep, dtype=bool)]
+            rows = self.doc_positions(docs)
+        else:
+            rows = np.arange(len(results))
+        return self._filter(rows, results, parsed)
+
+    def _filter(self, rows, results, parsed):
+        if not len(rows):
+            return rows
+        keep = np.ones(len(rows), dtype=bool)
+        for name, col in (('sender', 'sender'), ('receiver', 'receiver')):
+            if name in parsed:
+                if col not in results.columns:
+                    return rows[:0]
+                keep &= (results[col].iloc[rows] == parsed[name]).to_numpy(dtype=bool, na_value=False)
+        if 'min_score' in parsed:
+            keep &= results['suspicion_score'].to_numpy()[rows] >= parsed['min_score']
+        if 'after' in parsed or 'before' in parsed:
+            epoch = chunk_epoch_ms(results)
+            if epoch is None:
+                return rows[:0]
+            times = epoch[rows]
+            keep &= times != EPOCH_MISSING
+            if 'after' in parsed:
+                keep &= times >= _epoch_ms(parsed['after'])
+            if 'before' in parsed:
+                keep &= times < _epoch_ms(parsed['before'])
+        return rows[keep]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Full-text search over scored messages")
+    parser.add_argument('input', help="Results store, scored CSV or raw chat export")
+    parser.add_argument('query', help="Words, \"phrases\", prefixes* and from:/to:/score>=/after:/before: filters")
+    parser.add_argument('--limit', type=int, default=20, help="Matching messages to print")
+    parser.add_argument('--rebuild', action='store_true', help="Rebuild the index saved in a results store")
+    args = parser.parse_args(argv)
+
+    from conversations import load_scored
+    from results_store import is_store_path
+
+    results = load_scored(args.input)
+    started = time.perf_counter()
+    index = None if args.rebuild or not is_store_path(args.input) else SearchIndex.load(args.input, len(results))
+    if index is None:
+        index = SearchIndex.build(results['message'])
+        if is_store_path(args.input):
+            index.save(args.input)
+        print(f"Indexed {index.num_docs} distinct messages, {len(index.terms)} terms "
+              f"in {time.perf_counter() - started:.1f}s")
+    started = time.perf_counter()
+    try:
+        rows = index.search(args.query, results)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"{len(rows)} matching messages in {(time.perf_counter() - started) * 1000:.1f} ms")
+    columns = [col for col in ('timestamp', 'sender', 'receiver', 'suspicion_score', 'message') if col in results.columns]
+    print(results.iloc[rows[:args.limit]][columns].to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""Per-sender row index and aggregates for the sender drill-down.
+
+Built once per analysis: every row position is grouped by sender and
+ordered by suspicion score within the group, and the per-sender aggregates
+come from a single groupby. Looking up a sender afterwards is a slice of
+the position array, independent of the size of the export.
+"""
+import numpy as np
+import pandas as pd
+
+
+class SenderIndex:
+    """Row positions and aggregate stats of every sender in a scored frame.
+
+    count_columns are the boolean columns summed per sender.
+    """
+
+    def __init__(self, results_df, count_columns):
+        codes, senders = pd.factorize(results_df['sender'], use_na_sentinel=False)
+        self.senders = list(senders)
+        scores = results_df['suspicion_score'].to_numpy()
+
+        # Rows grouped by sender, most suspicious first, file order among ties
+        self.order = np.lexsort((-scores, codes))
+        counts = np.bincount(codes, minlength=len(self.senders))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        # All aggregates in one pass, in the same order as self.senders
+        self.stats = results_df.groupby(codes).agg(
+            messages=('suspicion_score', 'size'),
+            suspicion_score=('suspicion_score', 'mean'),
+            **{col: (col, 'sum') for col in count_columns}
+        )
+        self.stats.index = pd.Index(self.senders, name='sender')
+
+    def __len__(self):
+        return len(self.senders)
+
+    def positions(self, i):
+        """Row positions of the i-th sender, most suspicious first"""
+        return self.order[self.offsets[i]:self.offsets[i + 1]]
+
+    def sender_stats(self, i):
+        """Aggregates of the i-th sender as a dict"""
+        return self.stats.iloc[i].to_dict()
+
+    def ranked(self):
+        """Aggregates of all senders, most suspicious on average first"""
+        return self.stats.sort_values('suspicion_score', ascending=False)
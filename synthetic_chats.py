@@ -0,0 +1,133 @@
+"""Seeded generator of synthetic multilingual WhatsApp chats.
+
+The output has the columns of whatsapp_drug_chats.csv, Label included.
+Normal messages are everyday Malay/English/Chinese phrases; drug messages
+combine entries from the drug_scorer lexicons and the chatAnalyzer
+keywords with emoji, money and quantity tokens, so both scorers and all
+detectors get exercised. Rows are built with numpy in chunks and written as
+they are made, so 10M-row files can be generated in bounded memory.
+
+    python synthetic_chats.py -n 1000000 -o synthetic_chats.csv --seed 0
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import drug_scorer
+from chat_core import DRUG_KEYWORDS
+
+COLUMNS = ['Direction', 'From', 'To', 'Time (UTC)', 'Time (local)', 'Message',
+           'Profile', 'Origin path', 'Is deleted', 'Label']
+
+NORMAL_PHRASES = [
+    'family dinner', 'apa khabar?', 'catch up later', 'on the way', 'ok see you tomorrow',
+    'meeting at 3pm', 'exam coming soon', 'football match best', 'assignment siap?', 'jalan-jalan',
+    'game tonight', 'lunch break', 'later go movie', 'see you at mall', 'jom makan', 'drive safe',
+    'good night', 'working late', 'holiday plan', 'how are you?', 'shopping', 'call me when free',
+    'dah sampai rumah', 'terima kasih', 'nanti kita jumpa', 'happy birthday!', '吃饭了吗', '明天见',
+    '好的', '谢谢', '周末有空吗', 'send me the notes', 'traffic jam teruk', 'hujan lebat',
+]
+FILLERS = ['bro', 'boss', 'ok', 'lah', 'ya', 'now', 'tonight', 'later', 'esok', '今天', 'pls', '?']
+DRUG_TERMS = sorted(drug_scorer.MALAY | drug_scorer.CHINESE | drug_scorer.ENGLISH) + DRUG_KEYWORDS
+EXTRA_TERMS = sorted(drug_scorer.EMOJI | drug_scorer.MONEY | drug_scorer.SECRECY | drug_scorer.QTY)
+AMOUNTS = ['$50', '$100', 'rm50', 'rm 200', '100 bucks', '3g', '5 g', '1 oz', 'half g', '10g']
+
+FIRST_NAMES = ['Aiman', 'Siti', 'Wei', 'Mei', 'Ravi', 'Priya', 'John', 'Sarah', 'Hafiz', 'Nurul',
+               'Jun', 'Ling', 'Ahmad', 'Chris', 'Daniel', 'Aisyah']
+LAST_NAMES = ['Tan', 'Lim', 'Abdullah', 'Wong', 'Kumar', 'Lee', 'Ismail', 'Ng', 'Smith', 'Rahman']
+
+DEFAULT_CHUNK_SIZE = 200000
+START = np.datetime64('2025-01-01T00:00')
+SPAN_MINUTES = 90 * 24 * 60
+LOCAL_OFFSET = np.timedelta64(8, 'h')
+
+
+def _join(*parts):
+    """Element-wise join of object string arrays with single spaces, skipping empty parts"""
+    out = parts[0]
+    for part in parts[1:]:
+        out = np.where(part == '', out, out + ' ' + part)
+    return out
+
+
+def _pick(rng, values, n, empty_share=0.0):
+    """n random entries of values, with empty_share of them replaced by ''"""
+    picked = np.asarray(values, dtype=object)[rng.integers(0, len(values), n)]
+    if empty_share:
+        picked[rng.random(n) < empty_share] = ''
+    return picked
+
+
+def contacts(n, seed=0):
+    """n distinct contact names"""
+    rng = np.random.default_rng(seed)
+    first = _pick(rng, FIRST_NAMES, n)
+    last = _pick(rng, LAST_NAMES, n)
+    return (first + ' ' + last + ' ' + np.arange(n).astype(str).astype(object)).tolist()
+
+
+def time_labels(offset=np.timedelta64(0, 'm')):
+    """Formatted timestamp of every minute in the generated span, shifted by offset"""
+    minutes = START + offset + np.arange(SPAN_MINUTES).astype('timedelta64[m]')
+    return pd.Series(minutes).dt.strftime('%m/%d/%Y %H:%M').to_numpy(dtype=object)
+
+
+def generate_chunk(rng, n, people, drug_share=0.4, labels=None):
+    """One DataFrame of n synthetic rows; labels are the (UTC, local) time_labels tables"""
+    is_drug = rng.random(n) < drug_share
+    normal = _join(_pick(rng, NORMAL_PHRASES, n), _pick(rng, FILLERS, n, 0.6))
+    drug = _join(_pick(rng, FILLERS, n, 0.7), _pick(rng, DRUG_TERMS, n), _pick(rng, EXTRA_TERMS, n, 0.4),
+                 _pick(rng, AMOUNTS, n, 0.5), _pick(rng, DRUG_TERMS, n, 0.7))
+    messages = np.where(is_drug, drug, normal)
+
+    # Deals happen among a small group of contacts, normal chats among everyone
+    people = np.asarray(people, dtype=object)
+    dealers = max(2, len(people) // 20)
+    senders = np.where(is_drug, rng.integers(0, dealers, n), rng.integers(0, len(people), n))
+    receivers = (senders + rng.integers(1, len(people), n)) % len(people)
+    # Timestamps are drawn as minutes into the span and looked up preformatted
+    minute = rng.integers(0, SPAN_MINUTES, n)
+    utc_labels, local_labels = labels or (time_labels(), time_labels(LOCAL_OFFSET))
+
+    return pd.DataFrame({
+        'Direction': np.where(rng.random(n) < 0.5, 'Outgoing', 'Incoming'),
+        'From': people[senders],
+        'To': people[receivers],
+        'Time (UTC)': utc_labels[minute],
+        'Time (local)': local_labels[minute],
+        'Message': messages,
+        'Profile': '',
+        'Origin path': '',
+        'Is deleted': False,
+        'Label': np.where(is_drug, 'drug', 'normal'),
+    }, columns=COLUMNS)
+
+
+def generate(rows, seed=0, drug_share=0.4, chunk_size=DEFAULT_CHUNK_SIZE, people=None):
+    """Yield DataFrame chunks adding up to rows synthetic rows, reproducible from seed"""
+    rng = np.random.default_rng(seed)
+    people = people or contacts(max(10, min(100000, rows // 50)), seed)
+    labels = time_labels(), time_labels(LOCAL_OFFSET)
+    for start in range(0, rows, chunk_size):
+        yield generate_chunk(rng, min(chunk_size, rows - start), people, drug_share, labels)
+
+
+def write_csv(path, rows, seed=0, drug_share=0.4, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Write a synthetic export to path chunk by chunk"""
+    first = True
+    for chunk in generate(rows, seed, drug_share, chunk_size):
+        chunk.to_csv(path, mode='w' if first else 'a', header=first, index=False, encoding='utf-8')
+        first = False
+    if first:
+        pd.DataFrame(columns=COLUMNS).to_csv(path, index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic multilingual WhatsApp export")
+    parser.add_argument('-n', '--rows', type=int, default=7000, help="Rows to generate")
+    parser.add_argument('-o', '--output', default='synthetic_chats.csv', help="CSV file to write")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    parser.add_argument('--drug-share', type=float, default=0.4, help="Share of drug-related messages")
+    args = parser.parse_args()
+    write_csv(args.output, args.rows, seed=args.seed, drug_share=args.drug_share)
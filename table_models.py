@@ -0,0 +1,143 @@
+"""Virtualized table models for the results views.
+
+The views ask the model only for the cells currently on screen, so a table
+of millions of scored messages opens instantly. Rows are exposed to the view
+in batches as it scrolls, and sorting and filtering reorder an index array
+over the column arrays instead of copying the data.
+"""
+import numpy as np
+import pandas as pd
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+# Rows handed to the view per fetchMore call
+FETCH_BATCH = 5000
+
+
+def _yes_no(value):
+    return "Yes" if value else "No"
+
+
+class ResultsTableModel(QAbstractTableModel):
+    """Read-only view of DataFrame columns with sorting, filtering and highlighting.
+
+    headers renames the columns, yes_no columns show booleans as Yes/No,
+    cell_colors maps a column to the background of its true cells,
+    row_color is a (column, color) pair highlighting whole rows, and rows
+    restricts the model to those row positions, shown in the given order.
+    """
+
+    def __init__(self, df, columns=None, headers=None, yes_no=(), cell_colors=None, row_color=None,
+                 rows=None, parent=None):
+        super().__init__(parent)
+        self.column_names = list(columns if columns is not None else df.columns)
+        self.headers = list(headers if headers is not None else self.column_names)
+        # The frame's own arrays are indexed per cell; nothing is converted up front
+        self.arrays = [df[col].array for col in self.column_names]
+        self.formatters = [_yes_no if col in yes_no else str for col in self.column_names]
+        self.cell_colors = [(cell_colors or {}).get(col) for col in self.column_names]
+        self.row_flags, self.row_brush = None, None
+        if row_color is not None:
+            self.row_flags = df[row_color[0]].to_numpy(dtype=bool)
+            self.row_brush = row_color[1]
+
+        self.base_rows = np.arange(len(df)) if rows is None else np.asarray(rows)
+        self.total_rows = len(self.base_rows)
+        self.text_filter = ''
+        self.filter_column = 'message' if 'message' in df.columns else None
+        self.filter_values = df[self.filter_column] if self.filter_column else None
+        self.required = None
+        self.sort_column, self.sort_order = -1, Qt.AscendingOrder
+        self.order = self.base_rows
+        self.loaded = min(FETCH_BATCH, self.total_rows)
+
+    # Qt model interface
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.column_names)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.loaded < len(self.order)
+
+    def fetchMore(self, parent=QModelIndex()):
+        count = min(FETCH_BATCH, len(self.order) - self.loaded)
+        if parent.isValid() or count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.order[index.row()]
+        col = index.column()
+        if role == Qt.DisplayRole:
+            return self.formatters[col](self.arrays[col][row])
+        if role == Qt.BackgroundRole:
+            if self.cell_colors[col] is not None and self.arrays[col][row]:
+                return self.cell_colors[col]
+            if self.row_flags is not None and self.row_flags[row]:
+                return self.row_brush
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.headers[section]
+        return str(section + 1)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sort_column, self.sort_order = column, order
+        self.beginResetModel()
+        self.order = self._sorted(self.order)
+        self.loaded = min(FETCH_BATCH, len(self.order))
+        self.endResetModel()
+
+    # Filtering
+
+    def set_filter(self, text='', required=None):
+        """Show rows whose message contains text (case-insensitive) and whose required column is true"""
+        self.text_filter, self.required = text, required
+        rows = self.base_rows
+        mask = np.ones(len(rows), dtype=bool)
+        if text and self.filter_values is not None:
+            values = self.filter_values.iloc[rows]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # Match every distinct message once and look rows up by their code
+                hits = values.cat.categories.astype(str).str.contains(text, case=False, regex=False)
+                codes = values.cat.codes.to_numpy()
+                mask &= (codes >= 0) & np.asarray(hits, dtype=bool)[codes]
+            else:
+                matches = values.astype(str).str.contains(text, case=False, regex=False)
+                mask &= matches.to_numpy(dtype=bool)
+        if required is not None:
+            mask &= np.asarray(self.arrays[self.column_names.index(required)], dtype=bool)[rows]
+        self.beginResetModel()
+        self.order = self._sorted(rows[mask])
+        self.loaded = min(FETCH_BATCH, len(self.order))
+        self.endResetModel()
+
+    def row_position(self, view_row):
+        """Position in the frame of the row shown at view_row"""
+        return int(self.order[view_row])
+
+    def visible_rows(self):
+        """Number of rows passing the current filter"""
+        return len(self.order)
+
+    def _sorted(self, rows):
+        """Rows reordered by the current sort column; given order when unsorted"""
+        if self.sort_column < 0:
+            return rows
+        keys = pd.Series(self.arrays[self.sort_column][rows])
+        ascending = self.sort_order == Qt.AscendingOrder
+        try:
+            positions = keys.sort_values(ascending=ascending, kind='stable', na_position='last').index
+        except TypeError:
+            # Mixed types in one column: fall back to comparing text
+            positions = keys.astype(str).sort_values(ascending=ascending, kind='stable').index
+        return rows[positions.to_numpy()]
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# The modules live at the repository root rather than in a package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import synthetic_chats  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def sample_messages():
+    """Messages of the bundled WhatsApp sample plus seeded synthetic ones"""
+    sample = pd.read_csv(os.path.join(ROOT, 'whatsapp_drug_chats.csv'), encoding='utf-8')
+    synthetic = next(synthetic_chats.generate(5000, seed=1, chunk_size=5000))
+    return sample['Message'].astype(str).tolist() + synthetic['Message'].astype(str).tolist()
+
+
+@pytest.fixture
+def export_csv(tmp_path):
+    """A synthetic WhatsApp export of 3000 rows (UTF-8)"""
+    path = tmp_path / 'chats.csv'
+    synthetic_chats.write_csv(path, 3000, seed=2)
+    return path
@@ -0,0 +1,84 @@
+import pandas as pd
+
+from case_state import CaseState
+from chat_stream import stream_analyze
+from scorers import scorers_version
+
+
+def analysis_snapshot(analysis):
+    return (analysis.summary(), analysis.flag_counts, analysis.sender_stats(),
+            analysis.daily_counts, analysis.daily_suspicious)
+
+
+def assert_same_analysis(actual, expected):
+    (summary, flags, senders, daily, daily_suspicious) = analysis_snapshot(actual)
+    (exp_summary, exp_flags, exp_senders, exp_daily, exp_daily_suspicious) = analysis_snapshot(expected)
+    assert summary == exp_summary
+    assert flags == exp_flags
+    pd.testing.assert_frame_equal(senders.sort_index(), exp_senders.sort_index(), check_dtype=False)
+    pd.testing.assert_series_equal(daily.sort_index(), exp_daily.sort_index(), check_dtype=False)
+    pd.testing.assert_series_equal(daily_suspicious.sort_index(), exp_daily_suspicious.sort_index(),
+                                   check_dtype=False)
+
+
+def test_incremental_runs_match_a_full_run(tmp_path, export_csv):
+    df = pd.read_csv(export_csv, encoding='utf-8')
+    first_export = tmp_path / 'first.csv'
+    df.iloc[:1800].to_csv(first_export, index=False)
+
+    full = stream_analyze(export_csv, chunk_size=500, encoding='utf-8')
+
+    # The first extraction, then the re-extracted device with new messages appended
+    state_path = tmp_path / 'case.state'
+    state = CaseState.load(state_path)
+    stream_analyze(first_export, chunk_size=500, encoding='utf-8', state=state)
+    state.save(state_path)
+    state = CaseState.load(state_path)
+    assert state.analysis.total_messages == 1800
+    incremental = stream_analyze(export_csv, chunk_size=500, encoding='utf-8', state=state)
+
+    assert_same_analysis(incremental, full)
+    pd.testing.assert_frame_equal(incremental.top_rows.reset_index(drop=True)[['suspicion_score']],
+                                  full.top_rows.reset_index(drop=True)[['suspicion_score']])
+
+
+def test_rerun_scores_nothing_new(tmp_path, export_csv):
+    state_path = tmp_path / 'case.state'
+    state = CaseState(keep_rows=True)
+    stream_analyze(export_csv, chunk_size=700, encoding='utf-8', state=state)
+    state.save(state_path)
+    rows = len(state.history())
+    before = state.analysis.summary()
+
+    state = CaseState.load(state_path, keep_rows=True)
+    stream_analyze(export_csv, chunk_size=700, encoding='utf-8', state=state)
+    assert len(state.history()) == rows
+    assert state.analysis.summary() == before
+
+
+def test_incremental_csv_output_matches_full_output(tmp_path, export_csv):
+    df = pd.read_csv(export_csv, encoding='utf-8')
+    first_export = tmp_path / 'first.csv'
+    df.iloc[:1200].to_csv(first_export, index=False)
+
+    full_output = tmp_path / 'full.csv'
+    stream_analyze(export_csv, full_output, chunk_size=500, encoding='utf-8')
+
+    output = tmp_path / 'case.csv'
+    state_path = tmp_path / 'case.state'
+    state = CaseState()
+    stream_analyze(first_export, output, chunk_size=500, encoding='utf-8', state=state)
+    state.save(state_path)
+    stream_analyze(export_csv, output, chunk_size=500, encoding='utf-8', state=CaseState.load(state_path))
+    pd.testing.assert_frame_equal(pd.read_csv(output), pd.read_csv(full_output))
+
+
+def test_state_of_other_scorers_starts_afresh(tmp_path, export_csv):
+    state_path = tmp_path / 'case.state'
+    state = CaseState()
+    stream_analyze(export_csv, chunk_size=1000, encoding='utf-8', state=state)
+    state.save(state_path)
+
+    assert CaseState.load(state_path).analysis.total_messages == 3000
+    other = CaseState.load(state_path, version=scorers_version(('heuristic', 'ga')))
+    assert other.analysis.total_messages == 0
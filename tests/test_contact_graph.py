@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from contact_graph import ContactGraph
+
+# (sender, receiver, suspicion_score); scores of 5 and up are suspicious
+MESSAGES = [
+    ('ali', 'bob', 6), ('bob', 'ali', 0), ('ali', 'bob', 7),
+    ('bob', 'cy@s.whatsapp.net', 5), ('cy', 'ali', 8),
+    ('dee', 'eve', 1), ('eve', 'dee', 0),
+    ('eve', 'fay', 9),
+    ('gus', 'gus', 10),
+    ('hal', None, 3),
+]
+
+
+def scored(messages):
+    df = pd.DataFrame(messages, columns=['sender', 'receiver', 'suspicion_score'])
+    df['is_suspicious'] = df['suspicion_score'] >= 5
+    return df
+
+
+@pytest.fixture
+def graph():
+    graph = ContactGraph()
+    graph.update(scored(MESSAGES[:4]))
+    graph.update(scored(MESSAGES[4:]))
+    return graph
+
+
+def dense_pagerank(graph, weight='score_sum', damping=0.85, iterations=200):
+    """PageRank by dense matrix iteration over the undirected summed weights"""
+    n = len(graph)
+    matrix = np.zeros((n, n))
+    for src, dst, w in zip(graph.src, graph.dst, graph.weights[weight]):
+        matrix[src, dst] += w
+        matrix[dst, src] += w
+    strength = matrix.sum(axis=1)
+    transition = np.divide(matrix, strength[:, None], out=np.zeros_like(matrix), where=strength[:, None] > 0)
+    rank = np.full(n, 1.0 / n)
+    for _ in range(iterations):
+        rank = (1 - damping) / n + damping * (transition.T @ rank + rank[strength == 0].sum() / n)
+    return pd.Series(rank, index=graph.names)
+
+
+def test_edges_are_aggregated_per_directed_pair(graph):
+    # gus -> gus and the row without a receiver add no edge; cy's JID is cy
+    assert sorted(graph.names) == ['ali', 'bob', 'cy', 'dee', 'eve', 'fay', 'gus']
+    assert graph.degrees().loc['gus', 'neighbors'] == 0
+    assert graph.num_edges == 7
+    indptr, receivers, weights = graph.out_edges()
+    ali = graph.node('ali')
+    slots = slice(indptr[ali], indptr[ali + 1])
+    assert [graph.names[i] for i in receivers[slots]] == ['bob']
+    assert [weights[col][slots].tolist() for col in ('messages', 'score_sum', 'suspicious')] == [[2], [13], [2]]
+
+
+def test_neighbors_degrees_and_hops(graph):
+    neighbors = graph.neighbors('bob')
+    assert neighbors.index.tolist() == ['ali', 'cy']
+    assert neighbors.loc['ali'].tolist() == [3, 13, 2]
+
+    degrees = graph.degrees()
+    assert degrees.loc['ali', ['out_degree', 'in_degree', 'neighbors']].tolist() == [1, 2, 2]
+    assert degrees['messages'].sum() == 2 * 8
+
+    assert graph.k_hop('dee', 2)['hops'].to_dict() == {'eve': 1, 'fay': 2}
+    assert graph.k_hop('dee', 2, suspicious_only=True).empty
+    assert graph.k_hop('cy@s.whatsapp.net', 1).index.tolist() == ['ali', 'bob']
+    with pytest.raises(KeyError):
+        graph.node('nobody')
+
+
+@pytest.mark.parametrize('weight', ['score_sum', 'messages'])
+def test_pagerank_matches_dense_iteration(graph, weight):
+    centrality = graph.centrality(weight=weight, tol=1e-12, iterations=500)
+    assert centrality.sum() == pytest.approx(1.0)
+    expected = dense_pagerank(graph, weight)
+    np.testing.assert_allclose(centrality.sort_index(), expected.sort_index(), atol=1e-9)
+
+
+def test_components_and_clusters(graph):
+    labels = dict(zip(graph.names, graph.components(min_suspicious=1)))
+    assert labels['ali'] == labels['bob'] == labels['cy']
+    assert labels['eve'] == labels['fay'] != labels['ali']
+    # dee only exchanged unsuspicious messages
+    assert labels['dee'] not in (labels['ali'], labels['eve'])
+    all_edges = dict(zip(graph.names, graph.components(min_suspicious=0)))
+    assert all_edges['dee'] == all_edges['eve'] == all_edges['fay']
+
+    clusters = graph.suspicious_clusters(min_size=3)
+    assert len(clusters) == 1
+    cluster = clusters.iloc[0]
+    assert sorted(cluster['members']) == ['ali', 'bob', 'cy']
+    assert (cluster['size'], cluster['edges'], cluster['density']) == (3, 3, 1.0)
+    assert cluster['score_sum'] == 26
+
+
+def test_merge_and_save_round_trip(graph, tmp_path):
+    merged = ContactGraph()
+    merged.update(scored(MESSAGES[:4]))
+    other = ContactGraph()
+    other.update(scored(MESSAGES[4:]))
+    merged.merge(other)
+    pd.testing.assert_frame_equal(merged.degrees().sort_index(), graph.degrees().sort_index())
+
+    path = tmp_path / 'case.graph'
+    graph.save(path)
+    loaded = ContactGraph.load(path)
+    assert loaded.names == graph.names
+    pd.testing.assert_series_equal(loaded.centrality(), graph.centrality())
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conversations import SIGNAL_BONUS, score_windows, thread_codes, top_windows, window_rows
+from timestamps import EPOCH_MISSING
+
+WINDOW_MINUTES = 30
+
+
+def scored_frame(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    people = np.array(['ali', 'bob', 'cy', 'dee'])
+    epoch = 1736500000000 + rng.integers(0, 6 * 3600, n) * 1000
+    epoch[rng.random(n) < 0.05] = EPOCH_MISSING
+    # Bursts of messages at the same second are common in real exports
+    epoch[10:20] = epoch[10]
+    score = rng.integers(0, 11, n)
+    return pd.DataFrame({
+        'sender': rng.choice(people, n),
+        'receiver': rng.choice(people, n),
+        'epoch_ms': epoch,
+        'suspicion_score': score,
+        'is_suspicious': score >= 5,
+        'has_transaction': rng.random(n) < 0.2,
+        'has_location': rng.random(n) < 0.2,
+        'ga_score': rng.random(n).astype(np.float32),
+    })
+
+
+def brute_force_windows(df, window_minutes):
+    """The window ending at every timed message, found by comparing every pair"""
+    window_ms = window_minutes * 60000
+    threads = [frozenset((s, r)) for s, r in zip(df['sender'], df['receiver'])]
+    epoch = df['epoch_ms'].to_numpy()
+    timed = [i for i in range(len(df)) if epoch[i] != EPOCH_MISSING]
+    order = sorted(timed, key=lambda i: (sorted(threads[i]), epoch[i], i))
+    rows = []
+    for pos, i in enumerate(order):
+        members = [k for k in order[:pos + 1] if threads[k] == threads[i] and epoch[k] >= epoch[i] - window_ms]
+        window = df.iloc[members]
+        kinds = sum(int(signal) for signal in (window['suspicion_score'].sum() > 0,
+                                               window['has_transaction'].any(), window['has_location'].any()))
+        rows.append({'row': i, 'messages': len(members),
+                     'score_sum': int(window['suspicion_score'].sum()),
+                     'suspicious': int(window['is_suspicious'].sum()),
+                     'transactions': int(window['has_transaction'].sum()),
+                     'locations': int(window['has_location'].sum()),
+                     'ga_mean': float(window['ga_score'].astype(np.float64).mean()),
+                     'signal_kinds': kinds,
+                     'risk': int(window['suspicion_score'].sum()) + (SIGNAL_BONUS * kinds if kinds >= 2 else 0),
+                     'first': members[0]})
+    return pd.DataFrame(rows)
+
+
+@pytest.mark.parametrize('window_minutes', [1, WINDOW_MINUTES, 240])
+def test_windows_match_brute_force(window_minutes):
+    df = scored_frame()
+    windows = score_windows(df, window_minutes).sort_values('row').reset_index(drop=True)
+    expected = brute_force_windows(df, window_minutes).sort_values('row').reset_index(drop=True)
+    assert windows['row'].tolist() == expected['row'].tolist()
+    for col in ('messages', 'score_sum', 'suspicious', 'transactions', 'locations', 'signal_kinds', 'risk'):
+        assert windows[col].tolist() == expected[col].tolist(), col
+    np.testing.assert_allclose(windows['ga_mean'], expected['ga_mean'], rtol=1e-5)
+
+
+def test_window_rows_are_the_window_members():
+    df = scored_frame(seed=1)
+    windows = score_windows(df, WINDOW_MINUTES)
+    expected = brute_force_windows(df, WINDOW_MINUTES).set_index('row')
+    for i in range(0, len(windows), 17):
+        members = window_rows(windows, i)
+        assert members[-1] == windows['row'].iloc[i]
+        assert len(members) == expected.loc[members[-1], 'messages']
+        assert members[0] == expected.loc[members[-1], 'first']
+
+
+def test_threads_are_unordered_pairs_or_one_thread():
+    df = pd.DataFrame({'sender': ['a', 'b', 'a', 'c'], 'receiver': ['b', 'a', 'c', None]})
+    codes, labels = thread_codes(df)
+    assert codes[0] == codes[1] != codes[2] != codes[3]
+    assert len(labels) == 3
+    codes, labels = thread_codes(df[['sender']])
+    assert codes.tolist() == [0, 0, 0, 0] and labels == ['all messages']
+
+
+def test_top_windows_keep_one_window_per_thread_and_bucket():
+    windows = score_windows(scored_frame(seed=2), WINDOW_MINUTES)
+    top = top_windows(windows, top_n=1000, window_minutes=WINDOW_MINUTES)
+    bucket = top['timestamp'].to_numpy().view(np.int64) // (WINDOW_MINUTES * 60000)
+    assert not pd.DataFrame({'thread': top['thread'], 'bucket': bucket}).duplicated().any()
+    assert (top['risk'] > 0).all()
+    assert top['risk'].is_monotonic_decreasing
+
+
+def test_windows_need_timestamps():
+    with pytest.raises(ValueError):
+        score_windows(pd.DataFrame({'sender': ['a'], 'suspicion_score': [1]}))
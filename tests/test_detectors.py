@@ -0,0 +1,66 @@
+import random
+import re
+
+import pytest
+
+import chat_core
+
+# The keyword scorer and detectors before the fused pass, as in the original chatAnalyzer.py
+BASELINE_PATTERNS = [(r'\$\d+', 3), (r'\b\d+\s*(g|mg|oz|gram|ounce)\b', 4),
+                     (r'\bmeet\b.*\b(later|tonight|tomorrow)\b', 3), (r'\b(text|call|pm|dm)\b', 2)]
+TRANSACTION = [r'\$\d+', r'\d+\s*(dollars|bucks)', r'pay\s*(you|me)', r'venmo', r'cash\s*app',
+               r'zelle', r'wire\s*transfer', r'bitcoin', r'crypto', r'payment', r'send\s*money']
+LOCATION = [r'\b(at|in|to|from|near)\s+[A-Z][a-z]+', r'\b(street|ave|avenue|road|rd|boulevard|blvd)\b',
+            r'\b(park|mall|plaza|center|store|shop)\b', r'\d+\s*(miles|blocks|minutes)\b']
+PERSONAL_INFO = [r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b', r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+                 r'\b\d{4}\s?\d{4}\s?\d{4}\s?\d{4}\b', r'\b\d{3}-\d{2}-\d{4}\b',
+                 r'\b(birth|born|age|dob)\b.*\b(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})\b']
+
+# The original applied [A-Z] to the lower-cased text, so it never matched;
+# the fused detector checks the capital in the original text
+PLACE_NAME = re.compile(r'\b(?i:at|in|to|from|near)\s+[A-Z][a-z]+')
+
+
+def baseline_scan(message):
+    lower = message.lower()
+    score = 5 * sum(1 for keyword in chat_core.DRUG_KEYWORDS if keyword in lower)
+    score += sum(s for pattern, s in BASELINE_PATTERNS if re.search(pattern, lower))
+    found = lambda patterns: any(re.search(p, lower) for p in patterns)
+    return (min(score, 10), found(TRANSACTION),
+            found(LOCATION) or bool(PLACE_NAME.search(message)), found(PERSONAL_INFO))
+
+
+def detector_mixes(n, seed=0):
+    """Random strings of keywords, detector literals, numbers and place names"""
+    vocab = chat_core.DRUG_KEYWORDS + [
+        '$20', '5 g', '10mg', '3oz', 'meet', 'later', 'tonight', 'text', 'call me', 'dm', '40 bucks',
+        'pay you', 'venmo', 'cash app', 'send money', 'at', 'in', 'Near', 'Maybank', 'home', 'Kl',
+        'main street', 'mall', '5 minutes', '012-345-6789', 'a.b@mail.com', '1234 5678 9012 3456',
+        '123-45-6789', 'born', '1/2/1990', 'hello', '']
+    rng = random.Random(seed)
+    return [' '.join(rng.choice(vocab) for _ in range(rng.randint(0, 7))) for _ in range(n)]
+
+
+def test_fused_scan_matches_baseline(sample_messages):
+    messages = sample_messages + detector_mixes(5000)
+    for message in messages:
+        assert chat_core.scan_message(message) == baseline_scan(message), message
+
+
+def test_scan_messages_matches_scan_message(sample_messages):
+    messages = sample_messages[:2000] + detector_mixes(1000, seed=1)
+    columns = chat_core.scan_messages(messages)
+    expected = [chat_core.scan_message(m) for m in messages]
+    assert list(zip(*(columns[c].tolist() for c in ['suspicion_score'] + chat_core.FLAG_COLUMNS))) == expected
+
+
+@pytest.mark.parametrize('message, location', [
+    ('meet me at Maybank', True),
+    ('AT Maybank later', True),
+    ('drop it near Pavilion', True),
+    ('at home now', False),
+    ('at maybank', False),
+    ('going to HOME', False),
+])
+def test_place_names_need_a_capital(message, location):
+    assert chat_core.detect_location(message) is location
@@ -0,0 +1,115 @@
+import io
+import json
+
+import pandas as pd
+import pytest
+
+import export_readers
+import timestamps
+from chat_core import detect_platform, standardize_columns
+from export_readers import iter_json_array, load_export, read_export
+
+STANDARD = ['sender', 'message', 'timestamp', 'epoch_ms']
+
+FACEBOOK_MESSAGES = [
+    ('Ali', 1736526840000, 'ready stock 冰毒 💊'),
+    ('Siti Nurhaliza', 1736526900000, 'ok [1, 2] {"x": "]"}'),
+    ('Ali', 1736527000000, 'café, 5g\nlater'),
+    ('王小明', 1736527100000, ''),
+]
+
+WHATSAPP_ROWS = [
+    ('Ali', '2021-01-09 16:44:00', 'ready stock\ncod tonight'),
+    ('Bob', '2021-01-09 16:45:00', 'ok 冰毒 💊'),
+    ('Ali', '2021-12-25 09:05:00', 'line one\n\nline three: with a colon'),
+]
+
+
+@pytest.fixture(autouse=True)
+def fresh_format_cache():
+    timestamps.clear_format_cache()
+    yield
+    timestamps.clear_format_cache()
+
+
+def facebook_escaped(text):
+    """Text as Facebook writes it: every UTF-8 byte escaped as a \\u00XX code point"""
+    return text.encode('utf-8').decode('latin-1')
+
+
+def write_facebook_json(path, messages):
+    document = {
+        'participants': [{'name': facebook_escaped(name)} for name in ('Ali', 'Siti Nurhaliza', '王小明')],
+        'title': facebook_escaped('Ali & 王小明'),
+        'messages': [{'sender_name': facebook_escaped(sender), 'timestamp_ms': ms,
+                      'content': facebook_escaped(text),
+                      'reactions': [{'reaction': facebook_escaped('👍'), 'actor': 'Ali'}],
+                      'photos': [{'uri': 'photos/1.jpg', 'sizes': [[1, 2], [3, [4]]]}]}
+                     for sender, ms, text in messages],
+        'thread_path': 'inbox/ali_1',
+    }
+    path.write_text(json.dumps(document, indent=1), encoding='utf-8')
+
+
+def standardized(df, platform):
+    standardize_columns(df, platform)
+    return df[STANDARD].reset_index(drop=True)
+
+
+def test_iter_json_array_across_block_boundaries():
+    items = [{'a': [1, [2, ']']], 'b': 'x' * n} for n in range(40)]
+    text = json.dumps({'head': {'messages_not': [0]}, 'messages': items, 'tail': [1]})
+    for block_size in (1, 7, 64, 1 << 20):
+        assert list(iter_json_array(io.StringIO(text), 'messages', block_size)) == items
+
+
+def test_iter_json_array_errors():
+    assert list(iter_json_array(io.StringIO('{"other": [1]}'), 'messages')) == []
+    with pytest.raises(ValueError, match='Unterminated'):
+        list(iter_json_array(io.StringIO('{"messages": [1, 2'), 'messages', 4))
+    with pytest.raises(ValueError, match='Malformed'):
+        list(iter_json_array(io.StringIO('{"messages": [1, {"a": }]}'), 'messages', 4))
+
+
+def test_facebook_json_matches_csv(tmp_path):
+    thread = tmp_path / 'ali_1'
+    thread.mkdir()
+    write_facebook_json(thread / 'message_1.json', FACEBOOK_MESSAGES[:2])
+    write_facebook_json(thread / 'message_2.json', FACEBOOK_MESSAGES[2:])
+    csv_path = tmp_path / 'facebook.csv'
+    pd.DataFrame(FACEBOOK_MESSAGES, columns=export_readers.FACEBOOK_COLUMNS).to_csv(csv_path, index=False)
+
+    native = load_export(thread)
+    assert native['content'].tolist() == [text for _, _, text in FACEBOOK_MESSAGES]
+    assert detect_platform(native.columns) == 'Facebook'
+    chunks = list(export_readers.read_facebook_json(thread, chunk_size=3, block_size=16))
+    assert [len(c) for c in chunks] == [3, 1]
+
+    expected = standardized(load_export(csv_path, encoding='utf-8'), 'Facebook')
+    expected['message'] = expected['message'].fillna('')
+    pd.testing.assert_frame_equal(standardized(native, 'Facebook'), expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('lines', [
+    # Android, month-first with a 12-hour clock
+    ['1/9/21, 4:44 PM - Messages and calls are end-to-end encrypted.',
+     '1/9/21, 4:44 PM - Ali: ready stock', 'cod tonight',
+     '1/9/21, 4:45 PM - Bob: ok 冰毒 💊',
+     '1/9/21, 4:45 PM - Ali added Bob',
+     '12/25/21, 9:05 AM - Ali: line one', '', 'line three: with a colon'],
+    # iOS, day-first with a 24-hour clock and seconds
+    ['‎[09/01/2021, 16:44:00] Ali: ready stock', 'cod tonight',
+     '[09/01/2021, 16:45:00] Bob: ok 冰毒 💊',
+     '[25/12/2021, 09:05:00] Ali: line one', '', 'line three: with a colon'],
+])
+def test_whatsapp_txt_matches_csv(tmp_path, lines):
+    txt_path = tmp_path / 'WhatsApp Chat with Ali.txt'
+    txt_path.write_text('\r\n'.join(lines) + '\r\n', encoding='utf-8-sig')
+    csv_path = tmp_path / 'whatsapp.csv'
+    pd.DataFrame(WHATSAPP_ROWS, columns=export_readers.WHATSAPP_TXT_COLUMNS).to_csv(csv_path, index=False)
+
+    native = load_export(txt_path)
+    assert native['Message'].tolist() == [text for _, _, text in WHATSAPP_ROWS]
+    assert [len(c) for c in read_export(txt_path, 2)] == [2, 1]
+    pd.testing.assert_frame_equal(standardized(native, 'WhatsApp'),
+                                  standardized(load_export(csv_path, encoding='utf-8'), 'WhatsApp'))
@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+import pytest
+
+import ga_trainer
+from conftest import ROOT
+
+SAMPLE = os.path.join(ROOT, 'whatsapp_drug_chats.csv')
+CHINESE = ga_trainer.FEATURE_ORDER.index('chinese')
+
+
+def brute_force_auc(scores, pos, neg):
+    wins = [p * n * (1.0 if a > b else 0.5 if a == b else 0.0)
+            for a, p in zip(scores, pos) for b, n in zip(scores, neg)]
+    return sum(wins) / (pos.sum() * neg.sum())
+
+
+def test_sample_features_keep_cjk_messages(tmp_path):
+    X, y = ga_trainer.load_features(SAMPLE, cache_path=str(tmp_path / 'f.npz'))
+    assert (X[:, CHINESE] > 0).sum() > 100
+    assert len(np.unique(X, axis=0)) > 3
+
+    report = ga_trainer.train(X, y, generations=5)
+    assert report['val_auc'] >= 0.7
+    assert report['current_val_auc'] >= 0.7
+
+
+def test_auc_counts_ties_across_rows_as_half():
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        rows = int(rng.integers(2, 10))
+        pos = rng.integers(0, 4, rows).astype(float)
+        neg = rng.integers(0, 4, rows).astype(float)
+        if not pos.sum() * neg.sum():
+            continue
+        scores = rng.integers(0, 3, (rows, 4)).astype(float)
+        auc = ga_trainer.auc_batch(scores, pos, neg)
+        np.testing.assert_allclose(auc, [brute_force_auc(scores[:, c], pos, neg) for c in range(4)])
+        order = rng.permutation(rows)
+        np.testing.assert_allclose(ga_trainer.auc_batch(scores[order], pos[order], neg[order]), auc)
+
+
+def test_write_scorer_keeps_better_current_weights(tmp_path):
+    path = tmp_path / 'drug_scorer.py'
+    source = 'WEIGHTS=np.array([1.0],dtype=float)\nTHRESHOLD=0.5\n'
+    path.write_text(source, encoding='utf-8')
+    report = {'weights': [2.0], 'threshold': 0.3, 'val_auc': 0.6, 'current_val_auc': 0.7}
+    with pytest.raises(ValueError, match='below the current'):
+        ga_trainer.write_scorer(report, str(path))
+    assert path.read_text(encoding='utf-8') == source
+
+    ga_trainer.write_scorer(report, str(path), force=True)
+    assert path.read_text(encoding='utf-8') == 'WEIGHTS=np.array([2.0],dtype=float)\nTHRESHOLD=0.3\n'
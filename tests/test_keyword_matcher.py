@@ -0,0 +1,79 @@
+import random
+import re
+
+import numpy as np
+import pytest
+
+import drug_scorer
+import scorers
+from keyword_matcher import KeywordMatcher
+
+
+def token_split_features(msg):
+    """The GA featurization before the automaton: lexicon lookups on a token split"""
+    text = (msg or "").lower()
+    emoji_cnt = sum(text.count(e) for e in drug_scorer.EMOJI)
+    tokens = re.findall(r"[\u4e00-\u9fff]|[a-zA-Z0-9]+", text)
+
+    def count_in(tok, v):
+        return sum(1 for t in tok if t in v)
+    chinese_chars = "".join(drug_scorer.CHINESE)
+    return np.array([
+        count_in(tokens, drug_scorer.MALAY),
+        count_in(tokens, drug_scorer.CHINESE) + sum(1 for t in tokens if re.match(r"[\u4e00-\u9fff]", t)
+                                                    and t in chinese_chars),
+        count_in(tokens, drug_scorer.ENGLISH),
+        emoji_cnt,
+        count_in(tokens, drug_scorer.MONEY),
+        count_in(tokens, drug_scorer.SECRECY),
+        count_in(tokens, drug_scorer.QTY),
+        len(re.findall(r"\b\d+g?\b", text)),
+        1.0,
+    ], dtype=float)
+
+
+def lexicon_mixes(n, seed=0):
+    """Random strings of lexicon entries, multi-token entries and separators"""
+    vocab = [w for _, lexicon in drug_scorer.LEXICONS for w in lexicon]
+    vocab += ['low key', 'urusan senyap', 'K粉', '安全', 'hello', 'x1', '5g', '100', '50g', '']
+    rng = random.Random(seed)
+    return [''.join(rng.choice(vocab) + rng.choice(['', ' ', ',', 'x', '1', 'é', '🤫'])
+                    for _ in range(rng.randint(0, 8)))
+            for _ in range(n)]
+
+
+def test_featurize_batch_matches_token_split(sample_messages):
+    messages = sample_messages + lexicon_mixes(5000)
+    expected = np.array([token_split_features(m) for m in messages])
+    np.testing.assert_array_equal(drug_scorer.featurize_batch(messages), expected)
+
+
+def test_shared_featurization_matches_token_split(sample_messages):
+    messages = sample_messages + lexicon_mixes(2000, seed=1)
+    expected = np.array([token_split_features(m) for m in messages])
+    batch = scorers.FeatureBatch(messages, ['ga_features'])
+    np.testing.assert_array_equal(batch.ga_features, expected)
+
+
+def test_score_message_matches_batch(sample_messages):
+    messages = sample_messages[:500]
+    scores, is_drug = drug_scorer.batch_predict(messages)
+    np.testing.assert_allclose(scores, [drug_scorer.score_message(m) for m in messages])
+    assert is_drug.tolist() == [drug_scorer.is_drug(m) for m in messages]
+
+
+def test_whole_word_matches_use_token_boundaries():
+    matcher = KeywordMatcher().add('ice', 'ice', whole_word=True).add('ice', 'any').build()
+    hits = matcher.scan('ice, iceberg nice ice1 ice 冰ice')
+    assert hits == {'ice': 3, 'any': 6}
+
+
+def test_phrases_and_overlaps_all_count():
+    matcher = KeywordMatcher().add('pil kuda', 'phrase').add('kuda', 'word').add('aa', 'pair').build()
+    assert matcher.scan('pil kuda aaa') == {'phrase': 1, 'word': 1, 'pair': 2}
+
+
+def test_add_after_build_is_rejected():
+    matcher = KeywordMatcher().add('x', 'x').build()
+    with pytest.raises(RuntimeError):
+        matcher.add('y', 'y')
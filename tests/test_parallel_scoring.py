@@ -0,0 +1,78 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import drug_scorer
+import scorers
+from chat_core import make_score_cache, scan_messages, score_frame, standardize_columns
+from parallel_scoring import parallel_score, parallel_score_frame
+
+BOTH = ('heuristic', 'ga')
+
+
+@pytest.fixture(scope='module')
+def executor():
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        yield pool
+
+
+def assert_results_equal(actual, expected):
+    assert list(actual) == list(expected)
+    for col in expected:
+        np.testing.assert_array_equal(np.asarray(actual[col]), np.asarray(expected[col]), err_msg=col)
+
+
+def test_shared_featurization_matches_separate_scorers(sample_messages):
+    results = scorers.score_messages(sample_messages, BOTH)
+    heuristic = scan_messages(sample_messages)
+    scores, is_drug = drug_scorer.batch_predict(sample_messages)
+    for col, values in heuristic.items():
+        np.testing.assert_array_equal(results[col], values)
+    np.testing.assert_allclose(results['ga_score'], scores.astype(np.float32))
+    np.testing.assert_array_equal(results['ga_is_drug'], is_drug)
+
+
+def test_scorers_cache_matches_uncached(sample_messages):
+    cache = scorers.make_scorers_cache(BOTH)
+    expected = scorers.score_messages(sample_messages, BOTH)
+    assert_results_equal(scorers.score_messages(sample_messages, BOTH, cache=cache), expected)
+    # Second pass is served from the cache
+    assert_results_equal(scorers.score_messages(sample_messages, BOTH, cache=cache), expected)
+
+
+def test_parallel_score_matches_serial(sample_messages, executor):
+    expected = scorers.score_messages(sample_messages, BOTH)
+    actual = parallel_score(sample_messages, chunk_size=997, executor=executor, scorers=BOTH)
+    assert_results_equal(actual, expected)
+
+
+def test_parallel_score_frame_matches_score_frame(export_csv, executor):
+    df = pd.read_csv(export_csv, encoding='utf-8')
+    standardize_columns(df, 'WhatsApp')
+    expected = score_frame(df)
+    actual = parallel_score_frame(df, chunk_size=701, executor=executor)
+    pd.testing.assert_frame_equal(actual, expected)
+
+    expected = score_frame(df, scorers=BOTH)
+    actual = parallel_score_frame(df, chunk_size=701, executor=executor, scorers=BOTH)
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_parallel_score_frame_with_cache(export_csv, executor):
+    df = pd.read_csv(export_csv, encoding='utf-8')
+    standardize_columns(df, 'WhatsApp')
+    expected = score_frame(df)
+    cache = make_score_cache()
+    for _ in range(2):
+        actual = parallel_score_frame(df, chunk_size=701, executor=executor, cache=cache)
+        pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_analysis_scorers_must_include_the_heuristic():
+    assert scorers.parse_scorers('heuristic, ga') == BOTH
+    with pytest.raises(ValueError, match="lack 'heuristic'"):
+        scorers.parse_scorers('ga')
+    with pytest.raises(ValueError, match='Unknown scorers'):
+        scorers.parse_scorers('heuristic,bogus')
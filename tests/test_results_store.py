@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+from chat_stream import stream_analyze
+from results_store import ResultsStore, ResultsWriter, write_results
+
+
+def assert_column(actual, expected):
+    """Values equal, NaN/NaT positions equal, whatever the returned container"""
+    actual = pd.Series(np.asarray(actual, dtype=object))
+    expected = pd.Series(np.asarray(expected, dtype=object))
+    assert actual.isna().tolist() == expected.isna().tolist()
+    known = expected.notna()
+    assert actual[known].tolist() == expected[known].tolist()
+
+
+def test_round_trip(tmp_path):
+    df = pd.DataFrame({
+        'sender': ['a', 'b', 'a', None, 'b', 'a'],
+        'message': ['ready stock', '冰毒 💊', '', None, 'x' * 300, 'plain'],
+        'timestamp': pd.to_datetime(['2025-01-01', None, '2025-01-03', '2025-01-04', '2025-01-05', '2025-01-06']),
+        'suspicion_score': np.array([0, 5, 10, 3, 1, 0], dtype=np.int8),
+        'ga_score': np.array([0.1, np.nan, 0.9, 0.5, 0.2, 0.3], dtype=np.float32),
+        'is_suspicious': [False, True, True, False, False, False],
+    })
+    path = tmp_path / 'case.results'
+    write_results(df, path, platform='WhatsApp')
+
+    store = ResultsStore(path)
+    assert len(store) == len(df)
+    assert store.attrs == {'platform': 'WhatsApp'}
+    assert store.encoding('sender') == 'dict'
+    assert store.encoding('message') == 'heap'
+    read = store.read()
+    assert list(read.columns) == list(df.columns)
+    for col in ('suspicion_score', 'ga_score', 'is_suspicious', 'timestamp'):
+        assert read[col].dtype == df[col].dtype
+        np.testing.assert_array_equal(read[col].to_numpy(), df[col].to_numpy())
+    assert_column(read['sender'], df['sender'])
+    assert_column(read['message'], df['message'])
+
+
+def test_append_keeps_categories(tmp_path):
+    path = tmp_path / 'case.results'
+    first = pd.DataFrame({'sender': ['a', 'a', 'b', 'a'], 'score': [1, 2, 3, 4]})
+    second = pd.DataFrame({'sender': ['c', 'a', 'c', 'c'], 'score': [5, 6, 7, 8]})
+    write_results(first, path)
+    with ResultsWriter(path, append=True) as writer:
+        writer.write(second)
+
+    read = ResultsStore(path).read()
+    assert read['sender'].astype(str).tolist() == ['a', 'a', 'b', 'a', 'c', 'a', 'c', 'c']
+    assert read['score'].tolist() == list(range(1, 9))
+
+
+def write_chunks(path, chunks):
+    with ResultsWriter(path) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+    return ResultsStore(path).read()
+
+
+def test_text_after_all_missing_chunk(tmp_path):
+    chunks = [pd.DataFrame({'Profile': [np.nan] * 4}),
+              pd.DataFrame({'Profile': ['phone-owner', None, 'phone-owner', 'other']})]
+    read = write_chunks(tmp_path / 'a.results', chunks)
+    assert_column(read['Profile'], [None] * 4 + ['phone-owner', None, 'phone-owner', 'other'])
+
+
+def test_int_and_bool_columns_gain_missing_values(tmp_path):
+    chunks = [pd.DataFrame({'count': [1, 2], 'deleted': [True, False]}),
+              pd.DataFrame({'count': pd.Series([None, 4], dtype=object),
+                            'deleted': pd.Series([None, True], dtype=object)})]
+    read = write_chunks(tmp_path / 'a.results', chunks)
+    assert read['count'].dtype == np.float64
+    assert_column(read['count'], [1.0, 2.0, None, 4.0])
+    assert_column(read['deleted'], [1.0, 0.0, None, 1.0])
+
+
+def test_missing_chunk_keeps_float_and_datetime_columns(tmp_path):
+    chunks = [pd.DataFrame({'t': pd.to_datetime(['2025-01-01']), 'x': [0.5]}),
+              pd.DataFrame({'t': [np.nan], 'x': [np.nan]})]
+    read = write_chunks(tmp_path / 'a.results', chunks)
+    assert read['t'].dtype.kind == 'M'
+    assert read['x'].dtype == np.float64
+    assert read['t'].isna().tolist() == [False, True]
+    assert read['x'].isna().tolist() == [False, True]
+
+
+def test_numbers_after_text_and_text_after_numbers(tmp_path):
+    chunks = [pd.DataFrame({'a': ['x', 'y'], 'b': [1.5, 2.5]}),
+              pd.DataFrame({'a': [1, 2], 'b': ['oops', None]})]
+    read = write_chunks(tmp_path / 'a.results', chunks)
+    assert read['a'].astype(str).tolist() == ['x', 'y', '1', '2']
+    assert_column(read['b'], ['1.5', '2.5', 'oops', None])
+
+
+def test_stream_analyze_with_drifting_columns(tmp_path, export_csv):
+    df = pd.read_csv(export_csv, encoding='utf-8')
+    df['Profile'] = np.where(np.arange(len(df)) < 1000, None, 'phone-owner')
+    count = np.arange(len(df)).astype(object)
+    count[1500:1510] = None
+    df['Count'] = count
+    drift_csv = tmp_path / 'drift.csv'
+    df.to_csv(drift_csv, index=False)
+
+    path = tmp_path / 'drift.results'
+    analysis = stream_analyze(drift_csv, path, chunk_size=1000, encoding='utf-8')
+    read = ResultsStore(path).read()
+    assert analysis.total_messages == len(read) == len(df)
+    assert_column(read['Profile'], df['Profile'])
+    assert_column(read['Count'], [None if v is None else float(v) for v in count])
+
+
+def test_heap_blocks_and_row_reads(tmp_path, monkeypatch):
+    monkeypatch.setattr('results_store.HEAP_BLOCK_ROWS', 4)
+    messages = [None if i % 7 == 3 else f"{i} 冰毒 💊 " + 'x' * (i % 5) for i in range(23)]
+    chunks = [pd.DataFrame({'message': messages[a:b], 'n': list(range(a, b))})
+              for a, b in [(0, 3), (3, 11), (11, 12), (12, 23)]]
+    path = tmp_path / 'a.results'
+    read = write_chunks(path, chunks)
+
+    store = ResultsStore(path)
+    assert store.encoding('message') == 'heap'
+    assert len(store.meta['columns'][0]['blocks']) == 6
+    assert_column(read['message'], messages)
+    rows = np.array([22, 0, 3, 9, 9, 16])
+    assert_column(store.column('message', rows), [messages[r] for r in rows])
+    assert store.column('n', rows).tolist() == rows.tolist()
+
+
+def test_heap_widened_from_numbers_has_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr('results_store.HEAP_BLOCK_ROWS', 2)
+    chunks = [pd.DataFrame({'a': [1.5, 2.5, 3.5]}), pd.DataFrame({'a': ['p', 'q', 'r', 's', 't']})]
+    read = write_chunks(tmp_path / 'a.results', chunks)
+    assert read['a'].tolist() == ['1.5', '2.5', '3.5', 'p', 'q', 'r', 's', 't']
+    assert ResultsStore(tmp_path / 'a.results').column('a', [6, 2]).tolist() == ['s', '3.5']
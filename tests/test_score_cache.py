@@ -0,0 +1,125 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import drug_scorer
+import synthetic_chats
+from batch_cli import run_batch
+from chat_core import SCORER_VERSION
+from score_cache import ScoreCache, fingerprint, normalize
+from scorers import ga_weights_version
+
+
+class CountingCompute:
+    """A compute function recording the messages it was asked to score"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, messages):
+        self.calls.append(list(messages))
+        return [{'length': len(m), 'text': m} for m in messages]
+
+
+def test_normalize():
+    assert normalize('  ready stock \n') == 'ready stock'
+    assert normalize('冰毒 💊') == '冰毒 💊'
+    for value in (None, float('nan'), 42):
+        assert normalize(value) == ''
+
+
+def test_memory_hits_and_lru_eviction():
+    compute = CountingCompute()
+    cache = ScoreCache(compute, 'v1', maxsize=2)
+    assert cache.map(['a', ' a', 'b', None]) == [{'length': 1, 'text': 'a'}] * 2 + [
+        {'length': 1, 'text': 'b'}, {'length': 0, 'text': ''}]
+    assert compute.calls == [['a', 'b', '']]
+    assert cache.stats()['entries'] == 2
+
+    # 'a' was evicted when '' arrived; 'b' is still held
+    cache.map(['b', 'a'])
+    assert compute.calls[-1] == ['a']
+    stats = cache.stats()
+    assert (stats['lookups'], stats['memory_hits'], stats['computed']) == (6, 2, 4)
+    assert stats['hit_rate'] == pytest.approx(2 / 6)
+
+
+def test_sqlite_round_trip(tmp_path):
+    path = str(tmp_path / 'scores.sqlite')
+    first = ScoreCache(CountingCompute(), 'v1', path=path)
+    expected = first.map(['ready stock', '冰毒', 'ok'])
+    first.close()
+
+    compute = CountingCompute()
+    second = ScoreCache(compute, 'v1', path=path)
+    assert second.map(['ok', '冰毒', 'ready stock', 'new']) == expected[::-1] + [{'length': 3, 'text': 'new'}]
+    assert compute.calls == [['new']]
+    assert (second.stats()['disk_hits'], second.stats()['computed']) == (3, 1)
+    second.close()
+
+
+def test_new_version_recomputes_and_prune(tmp_path):
+    path = str(tmp_path / 'scores.sqlite')
+    old = ScoreCache(CountingCompute(), 'v1', path=path)
+    old.map(['a', 'b'])
+    old.close()
+
+    compute = CountingCompute()
+    new = ScoreCache(compute, 'v2', path=path)
+    new.map(['a', 'b'])
+    assert compute.calls == [['a', 'b']]
+    new.prune()
+    with sqlite3.connect(path) as db:
+        assert db.execute("SELECT DISTINCT version FROM scores").fetchall() == [('v2',)]
+    new.close()
+
+
+def test_model_version_follows_weights_and_features(monkeypatch, tmp_path):
+    assert ga_weights_version(drug_scorer.WEIGHTS, drug_scorer.THRESHOLD) == drug_scorer.MODEL_VERSION
+    assert ga_weights_version(drug_scorer.WEIGHTS * 2, drug_scorer.THRESHOLD) != drug_scorer.MODEL_VERSION
+    # A featurization change alone changes the model version too
+    monkeypatch.setattr(drug_scorer, 'FEATURE_VERSION', fingerprint('other features'))
+    assert ga_weights_version(drug_scorer.WEIGHTS, drug_scorer.THRESHOLD) != drug_scorer.MODEL_VERSION
+    monkeypatch.undo()
+
+    path = str(tmp_path / 'ga.sqlite')
+    messages = ['ready stock 冰毒', 'see you at the mall', 'ready stock 冰毒']
+    cache = drug_scorer.make_cache(path)
+    expected = drug_scorer.batch_score(messages, cache).tolist()
+    cache.close()
+
+    cache = drug_scorer.make_cache(path)
+    assert drug_scorer.batch_score(messages, cache).tolist() == expected
+    assert cache.stats()['computed'] == 0
+    cache.close()
+
+    monkeypatch.setattr(drug_scorer, 'MODEL_VERSION', fingerprint('retrained'))
+    cache = drug_scorer.make_cache(path)
+    drug_scorer.batch_score(messages, cache)
+    assert cache.stats()['computed'] == 2
+    cache.close()
+
+
+def test_batch_workers_share_one_sqlite_file(tmp_path):
+    inputs = []
+    for seed in range(4):
+        path = tmp_path / f'export_{seed}.csv'
+        synthetic_chats.write_csv(path, 1500, seed=seed)
+        inputs.append(path)
+    cache_path = str(tmp_path / 'scores.sqlite')
+
+    plain = run_batch(inputs, tmp_path / 'plain', jobs=4, chunk_size=400)
+    cached = run_batch(inputs, tmp_path / 'cached', jobs=4, chunk_size=400, cache_path=cache_path)
+    assert (cached['status'] == 'ok').all()
+    for shard in plain['shard']:
+        name = shard.split('/')[-1]
+        pd.testing.assert_frame_equal(pd.read_csv(tmp_path / 'cached' / name), pd.read_csv(shard))
+
+    with sqlite3.connect(cache_path) as db:
+        versions = db.execute("SELECT version, COUNT(*) FROM scores GROUP BY version").fetchall()
+    messages = pd.concat(pd.read_csv(path, encoding='utf-8')['Message'] for path in inputs)
+    assert versions == [(SCORER_VERSION, messages.map(normalize).nunique())]
+
+    again = run_batch(inputs, tmp_path / 'again', jobs=4, chunk_size=400, cache_path=cache_path)
+    assert (again['cache_hit_rate'] == 1.0).all()
@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+import drug_scorer
+import scorers
+from scoring_service import ScoringClient, ScoringService
+
+MESSAGES = ['ready stock, cod tonight 5g', 'hi', '冰毒 💊 私聊', 'meet later $50']
+
+
+def run_with_service(weights_path, calls, **options):
+    """Start a service on a free localhost port and run calls(client) against it in a thread"""
+    async def main():
+        service = ScoringService(str(weights_path), **options)
+        host, port = await service.start(port=0)
+        client = ScoringClient(host, port)
+        try:
+            return await asyncio.to_thread(calls, client, service)
+        finally:
+            client.close()
+            await service.stop()
+    return asyncio.run(main())
+
+
+def write_report(path, weights=drug_scorer.WEIGHTS, threshold=drug_scorer.THRESHOLD):
+    path.write_text(json.dumps({'weights': list(weights), 'threshold': threshold}), encoding='utf-8')
+
+
+def test_scores_match_score_messages(tmp_path):
+    weights_path = tmp_path / 'weights.json'
+    write_report(weights_path)
+    results = run_with_service(weights_path, lambda client, service: client.score(MESSAGES))
+    expected = scorers.score_messages(MESSAGES, ('heuristic', 'ga'))
+    for col, values in expected.items():
+        np.testing.assert_allclose([r[col] for r in results], values.tolist())
+
+
+def test_malformed_weights_at_start_fall_back_to_built_in_weights(tmp_path):
+    weights_path = tmp_path / 'weights.json'
+    weights_path.write_text('{bad', encoding='utf-8')
+
+    def calls(client, service):
+        return client.metrics(), client.score(MESSAGES[:1])
+    metrics, results = run_with_service(weights_path, calls)
+    assert metrics['model'] == drug_scorer.MODEL_VERSION
+    assert metrics['reload_errors'] == 1
+    assert results[0]['ga_score'] == pytest.approx(drug_scorer.score_message(MESSAGES[0]), rel=1e-6)
+
+
+def test_reload_switches_weights_and_version(tmp_path):
+    weights_path = tmp_path / 'weights.json'
+    write_report(weights_path)
+
+    def calls(client, service):
+        before = client.score(MESSAGES[:1])[0]
+        write_report(weights_path, threshold=0.99)
+        reloaded = client.reload()
+        after = client.score(MESSAGES[:1])[0]
+        return before, reloaded, after
+    before, reloaded, after = run_with_service(weights_path, calls)
+    assert before['ga_is_drug'] and not after['ga_is_drug']
+    assert reloaded['reloaded'] and reloaded['model'] == scorers.ga_weights_version(drug_scorer.WEIGHTS, 0.99)
+
+
+def test_bad_requests(tmp_path):
+    weights_path = tmp_path / 'weights.json'
+    write_report(weights_path)
+
+    def calls(client, service):
+        errors = []
+        for method, path, body in [('POST', '/score', b'not json'), ('GET', '/score', None),
+                                   ('GET', '/nope', None), ('POST', '/score', b'{"messages": 3}')]:
+            client.connection.request(method, path, body=body)
+            response = client.connection.getresponse()
+            response.read()
+            errors.append(response.status)
+        return errors
+    assert run_with_service(weights_path, calls) == [400, 405, 404, 400]
@@ -0,0 +1,109 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from chat_core import score_frame, standardize_columns
+from conftest import ROOT
+from results_store import ResultsWriter, write_results
+from search_index import SearchIndex
+
+_ASCII = re.compile(r'[a-z0-9]+')
+_GAP = r'[^a-z0-9一-鿿]'
+
+
+def token_regex(tokens, prefix=False):
+    """A regex for str.contains matching tokens as consecutive whole words of the lower-cased text"""
+    parts = []
+    for i, token in enumerate(tokens):
+        if i:
+            both_ascii = _ASCII.fullmatch(tokens[i - 1]) and _ASCII.fullmatch(token)
+            parts.append(_GAP + ('+' if both_ascii else '*'))
+        parts.append(re.escape(token))
+    pattern = ''.join(parts)
+    if _ASCII.fullmatch(tokens[0]):
+        pattern = '(?<![a-z0-9])' + pattern
+    if _ASCII.fullmatch(tokens[-1]) and not prefix:
+        pattern += '(?![a-z0-9])'
+    return pattern
+
+
+def brute_force(results, words=(), phrases=(), prefixes=(), min_score=None, sender=None):
+    """Row positions matching every part, found with str.contains over all messages"""
+    text = results['message'].fillna('').astype(str).str.lower()
+    keep = pd.Series(True, index=results.index)
+    for tokens in [[w] for w in words] + list(phrases):
+        keep &= text.str.contains(token_regex(tokens), regex=True)
+    for prefix in prefixes:
+        keep &= text.str.contains(token_regex([prefix], prefix=True), regex=True)
+    if min_score is not None:
+        keep &= results['suspicion_score'] >= min_score
+    if sender is not None:
+        keep &= results['sender'] == sender
+    return np.flatnonzero(keep.to_numpy())
+
+
+@pytest.fixture
+def results(export_csv):
+    frames = []
+    for path in (f"{ROOT}/whatsapp_drug_chats.csv", export_csv):
+        df = pd.read_csv(path, encoding='utf-8')
+        frames.append(score_frame(standardize_columns(df, 'WhatsApp')))
+    extra = pd.DataFrame({'sender': ['x', 'y', 'z'], 'receiver': ['y', 'x', 'x'],
+                          'message': [None, 'READY-stock!! 冰毒 now', 'meth2 ready\nstock']})
+    frames.append(score_frame(extra))
+    return pd.concat(frames, ignore_index=True)
+
+
+QUERIES = [
+    ('stuff', dict(words=['stuff'])),
+    ('see you', dict(words=['see', 'you'])),
+    ('"see you"', dict(phrases=[['see', 'you']])),
+    ('"you see"', dict(phrases=[['you', 'see']])),
+    ('ready stock', dict(words=['ready', 'stock'])),
+    ('"ready stock"', dict(phrases=[['ready', 'stock']])),
+    ('jalan-jalan', dict(phrases=[['jalan', 'jalan']])),
+    ('meth*', dict(prefixes=['meth'])),
+    ('jal* makan', dict(prefixes=['jal'], words=['makan'])),
+    ('冰', dict(words=['冰'])),
+    ('冰毒', dict(phrases=[['冰', '毒']])),
+    ('毒冰', dict(phrases=[['毒', '冰']])),
+    ('k粉*', dict(words=['k'], prefixes=['粉'])),
+    ('smoke score>=5', dict(words=['smoke'], min_score=5)),
+    ('score>=8', dict(min_score=8)),
+    ('nosuchword', dict(words=['nosuchword'])),
+]
+
+
+@pytest.mark.parametrize('query, parts', QUERIES)
+def test_search_matches_brute_force(results, query, parts):
+    index = SearchIndex.build(results['message'], batch_size=997)
+    expected = brute_force(results, **parts)
+    np.testing.assert_array_equal(index.search(query, results), expected)
+
+
+def test_sender_filter(results):
+    index = SearchIndex.build(results['message'])
+    sender = results['sender'].iloc[0]
+    np.testing.assert_array_equal(index.search('see*', results, sender=sender),
+                                  brute_force(results, prefixes=['see'], sender=sender))
+    assert index.search('from:nobody', results).tolist() == []
+
+
+def test_save_load_round_trip(results, tmp_path):
+    path = tmp_path / 'case.results'
+    write_results(results, path)
+    index = SearchIndex.build(results['message'])
+    index.save(str(path))
+
+    loaded = SearchIndex.load(str(path), len(results))
+    assert loaded.terms.tolist() == index.terms.tolist()
+    for query, _ in QUERIES:
+        np.testing.assert_array_equal(loaded.search(query, results), index.search(query, results))
+    assert SearchIndex.load(str(path), len(results) + 1) is None
+
+    # Writing rows to the store drops the index
+    with ResultsWriter(path, append=True) as writer:
+        writer.write(results.iloc[:2])
+    assert SearchIndex.load(str(path)) is None
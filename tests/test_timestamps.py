@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import timestamps
+from chat_core import standardize_columns
+from instrumentation import PipelineMetrics
+
+
+@pytest.fixture(autouse=True)
+def fresh_format_cache():
+    timestamps.clear_format_cache()
+    yield
+    timestamps.clear_format_cache()
+
+
+def parsed(values, name='Time (local)', metrics=None):
+    epoch_ms = timestamps.parse_timestamps(pd.Series(values, dtype=object), name=name, metrics=metrics)
+    return timestamps.as_datetime64(epoch_ms)
+
+
+def dt(*values):
+    return np.array([np.datetime64(v, 'ms') if v else np.datetime64('NaT', 'ms') for v in values])
+
+
+def test_month_first_export():
+    # Chats.csv style: single-digit fields, no day above 12 in the first rows
+    values = ['1/9/2021 4:44', '1/9/2021 3:01', '12/25/2021 16:05']
+    np.testing.assert_array_equal(parsed(values), dt('2021-01-09T04:44', '2021-01-09T03:01', '2021-12-25T16:05'))
+
+
+def test_day_first_export():
+    values = ['25/12/2021 16:05', '13/01/2022 09:00', '01/02/2022 10:00']
+    np.testing.assert_array_equal(parsed(values), dt('2021-12-25T16:05', '2022-01-13T09:00', '2022-02-01T10:00'))
+
+
+def test_exports_with_the_same_layout_but_other_field_order():
+    np.testing.assert_array_equal(parsed(['12/25/2021 16:05', '1/2/2022 10:00']),
+                                  dt('2021-12-25T16:05', '2022-01-02T10:00'))
+    # The cached month-first format reads under half of these, so the layout is sniffed again
+    np.testing.assert_array_equal(parsed(['25/12/2021 16:05', '13/1/2022 10:00', '1/2/2022 10:00']),
+                                  dt('2021-12-25T16:05', '2022-01-13T10:00', '2022-02-01T10:00'))
+
+
+def test_twelve_and_twenty_four_hour_clocks():
+    np.testing.assert_array_equal(parsed(['1/9/2021 4:44 PM', '1/9/2021 11:05 AM', '12/31/2021 12:00 AM']),
+                                  dt('2021-01-09T16:44', '2021-01-09T11:05', '2021-12-31T00:00'))
+    np.testing.assert_array_equal(parsed(['2025-01-10 16:34:00', '2025-01-11 00:02:03'], name='Timestamp'),
+                                  dt('2025-01-10T16:34', '2025-01-11T00:02:03'))
+
+
+def test_unparsable_values_become_missing():
+    epoch_ms = timestamps.parse_timestamps(
+        pd.Series(['01/10/2025 16:34', 'not a date', '', None, '01/11/2025 00:34'], dtype=object), name='t')
+    assert epoch_ms[[1, 2, 3]].tolist() == [timestamps.EPOCH_MISSING] * 3
+    assert np.isnat(timestamps.as_datetime64(epoch_ms)).tolist() == [False, True, True, True, False]
+
+
+def test_outliers_fall_back_to_other_formats():
+    values = ['01/10/2025 16:34'] * 5 + ['2025-01-12 08:00:00', '12 March 2025 10:00']
+    np.testing.assert_array_equal(parsed(values)[-2:], dt('2025-01-12T08:00', '2025-03-12T10:00'))
+
+
+def test_layout_is_sniffed_once_per_export():
+    metrics = PipelineMetrics()
+    for chunk in (['01/10/2025 16:34', '01/11/2025 00:34'], ['02/03/2025 09:15', '02/04/2025 10:00']):
+        parsed(chunk, metrics=metrics)
+    parsed(['2025-02-03 09:15'], name='Time (local)', metrics=metrics)
+    assert metrics.counters['timestamp_formats_sniffed'] == 2
+
+
+def test_numeric_epochs_in_seconds_and_milliseconds():
+    seconds = timestamps.parse_timestamps(pd.Series([1736526840, 1736526900]))
+    millis = timestamps.parse_timestamps(pd.Series([1736526840000.0, np.nan]))
+    assert seconds.tolist() == [1736526840000, 1736526900000]
+    assert millis.tolist() == [1736526840000, timestamps.EPOCH_MISSING]
+
+
+def test_standardize_columns_adds_epoch_ms():
+    df = pd.DataFrame({'From': ['a', 'b', 'a'], 'To': ['b', 'a', 'b'], 'Message': ['x', 'y', 'z'],
+                       'Time (local)': ['01/11/2025 00:34', 'junk', '01/15/2025 14:26']})
+    standardize_columns(df, 'WhatsApp')
+    assert df['epoch_ms'].dtype == np.int64
+    assert df['timestamp'].dtype == 'datetime64[ms]'
+    np.testing.assert_array_equal(df['timestamp'].to_numpy(), dt('2025-01-11T00:34', None, '2025-01-15T14:26'))
+    assert (df['epoch_ms'] == timestamps.EPOCH_MISSING).tolist() == [False, True, False]
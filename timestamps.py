@@ -0,0 +1,178 @@
+"""Timestamp parsing with the format sniffed once per export layout.
+
+Letting pandas infer the format of every value is slow and ambiguous
+(Chats.csv has ``1/9/2021 4:44``, the sample ``01/10/2025 16:34``). Here the
+format is guessed from a sample of the column, checked against the whole
+sample, and remembered under the column's layout (its name plus the shape of
+its values with the digits taken out), so every later chunk of the same
+export is parsed with an explicit format in one vectorized call over its
+distinct values. Only values that format cannot read are tried with the
+other candidates and finally one by one.
+
+Timestamps are returned as int64 milliseconds since the epoch, with
+EPOCH_MISSING (numpy's NaT) for values that could not be parsed. The same
+array viewed as datetime64[ms] is the timestamp column, so timelines and
+windows work on the integers without parsing again.
+"""
+import re
+import threading
+import warnings
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+EPOCH_MISSING = np.iinfo(np.int64).min
+
+# Values checked when a format is sniffed
+SNIFF_SAMPLE = 500
+
+# Formats tried after the guessed ones; month-first before day-first, as in
+# the WhatsApp exports this tool was written for
+COMMON_FORMATS = [
+    '%m/%d/%Y %H:%M', '%m/%d/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y %H:%M:%S',
+    '%m/%d/%y %H:%M', '%d/%m/%y %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M',
+    '%Y-%m-%dT%H:%M:%S', '%d.%m.%Y %H:%M', '%m/%d/%Y', '%d/%m/%Y', '%Y-%m-%d',
+]
+
+_DIGITS = re.compile(r'\d+')
+
+# layout -> format, shared by every chunk and file parsed in this process
+_formats = {}
+_formats_lock = threading.Lock()
+
+
+def layout_of(name, sample):
+    """Cache key of a column: its name and the most common shape of its values"""
+    shapes = Counter(_DIGITS.sub('9', value) for value in sample)
+    return name, shapes.most_common(1)[0][0] if shapes else ''
+
+
+def candidate_formats(sample):
+    """Formats worth trying on sample, guessed ones first"""
+    guessed = []
+    with warnings.catch_warnings():
+        # pandas warns when a guess contradicts dayfirst; both orders are wanted here
+        warnings.simplefilter('ignore', UserWarning)
+        for value in sample[:20]:
+            for dayfirst in (False, True):
+                fmt = guess_datetime_format(value, dayfirst=dayfirst)
+                if fmt is not None and fmt not in guessed:
+                    guessed.append(fmt)
+    return guessed + [fmt for fmt in COMMON_FORMATS if fmt not in guessed]
+
+
+def _parse_with(values, fmt):
+    """values parsed with fmt as epoch milliseconds; EPOCH_MISSING where it fails"""
+    parsed = pd.to_datetime(values, format=fmt, errors='coerce')
+    return np.asarray(parsed, dtype='datetime64[ms]').view(np.int64)
+
+
+def sniff_format(sample):
+    """The format reading the most values of sample; the earlier candidate on ties"""
+    best, best_count = None, 0
+    for fmt in candidate_formats(sample):
+        count = int((_parse_with(sample, fmt) != EPOCH_MISSING).sum())
+        if count > best_count:
+            best, best_count = fmt, count
+            if count == len(sample):
+                break
+    return best
+
+
+def _sample(unique):
+    """Up to SNIFF_SAMPLE of the distinct values, spread over the column"""
+    if len(unique) > SNIFF_SAMPLE:
+        unique = unique[np.linspace(0, len(unique) - 1, SNIFF_SAMPLE).astype(np.int64)]
+    return list(unique)
+
+
+def _numeric_epoch_ms(values):
+    """Numeric epochs in seconds or milliseconds, told apart by their size"""
+    numbers = values.astype('float64')
+    finite = np.isfinite(numbers)
+    # Seconds since 1970 stay below 1e11 until the year 5138
+    scale = 1000 if finite.any() and np.nanmax(np.abs(numbers[finite])) < 1e11 else 1
+    out = np.full(len(numbers), EPOCH_MISSING, dtype=np.int64)
+    out[finite] = (numbers[finite] * scale).astype(np.int64)
+    return out
+
+
+def parse_timestamps(series, name=None, metrics=None):
+    """Epoch milliseconds (int64) of a column of timestamps.
+
+    Strings are parsed with the format cached for their layout, sniffed
+    from a sample the first time the layout is seen or when the cached
+    format reads less than half of them. Datetime and numeric (epoch s or ms)
+    columns are converted directly. metrics counts the layouts sniffed and
+    the values parsed one by one.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return np.asarray(series.dt.tz_localize(None) if series.dt.tz is not None else series,
+                          dtype='datetime64[ms]').view(np.int64).copy()
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return _numeric_epoch_ms(series.to_numpy())
+
+    # Chats repeat timestamps (minute resolution), so each distinct value is parsed once
+    codes, uniques = pd.factorize(series)
+    out = np.full(len(codes), EPOCH_MISSING, dtype=np.int64)
+    if not len(uniques):
+        return out
+    text = np.asarray(uniques, dtype=object).astype(str).astype(object)
+
+    sample = _sample(text)
+    layout = layout_of(name if name is not None else series.name, sample)
+    with _formats_lock:
+        fmt = _formats.get(layout)
+    parsed = _parse_with(text, fmt) if fmt is not None else None
+    if parsed is None or (parsed != EPOCH_MISSING).sum() * 2 < len(text):
+        fmt = sniff_format(sample)
+        if metrics is not None:
+            metrics.count('timestamp_formats_sniffed')
+        if fmt is not None:
+            with _formats_lock:
+                _formats[layout] = fmt
+            parsed = _parse_with(text, fmt)
+        else:
+            parsed = np.full(len(text), EPOCH_MISSING, dtype=np.int64)
+
+    failed = np.flatnonzero(parsed == EPOCH_MISSING)
+    if len(failed):
+        # Outliers: the other candidate formats first, then one value at a time
+        for other in candidate_formats(_sample(text[failed])):
+            if other == fmt:
+                continue
+            parsed[failed] = _parse_with(text[failed], other)
+            failed = failed[parsed[failed] == EPOCH_MISSING]
+            if not len(failed):
+                break
+        if metrics is not None and len(failed):
+            metrics.count('timestamp_values_parsed_singly', len(failed))
+        for i in failed:
+            try:
+                value = pd.Timestamp(str(text[i]))
+            except (ValueError, OverflowError):
+                continue
+            if value is not pd.NaT:
+                parsed[i] = np.datetime64(value.tz_localize(None) if value.tz else value, 'ms').view(np.int64)
+    present = codes >= 0
+    out[present] = parsed[codes[present]]
+    return out
+
+
+def as_datetime64(epoch_ms):
+    """The datetime64[ms] view of epoch milliseconds; EPOCH_MISSING becomes NaT"""
+    return np.asarray(epoch_ms, dtype=np.int64).view('datetime64[ms]')
+
+
+def epoch_days(epoch_ms):
+    """Whole days since the epoch; EPOCH_MISSING stays EPOCH_MISSING"""
+    epoch_ms = np.asarray(epoch_ms, dtype=np.int64)
+    return np.where(epoch_ms == EPOCH_MISSING, EPOCH_MISSING, epoch_ms // 86400000)
+
+
+def clear_format_cache():
+    """Forget the sniffed formats, e.g. before parsing an export known to differ"""
+    with _formats_lock:
+        _formats.clear()